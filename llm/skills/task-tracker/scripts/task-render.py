@@ -2,21 +2,47 @@
 """
 Render tasks to human-readable markdown.
 
-Reads .claude/tasks/ directory and outputs formatted markdown
-grouped by status.
+Reads the tasks in .claude/tasks/ (from either storage backend) and
+outputs formatted markdown grouped by status.
+
+With --watch, keeps the tasks in memory and rewrites --output whenever a
+change to them changes the document. Changes are noticed with inotify on
+Linux, else by polling every --interval seconds; only tasks whose stamp
+changed (see TaskStore.stamps) are read again, and only tasks whose shown
+fields changed are rendered again.
 """
 
 from __future__ import annotations
 
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
 import sys
+import time
 from collections import defaultdict
 from pathlib import Path
+from typing import Collection, Iterable
 
 from task_fs import (
+    STORE_DB,
     find_tasks_root,
-    walk_tasks,
     Task,
+    TaskError,
 )
+from task_store import TaskStore, open_store, sort_key
+
+# Render in priority order
+STATUS_ORDER = ["in_progress", "pending", "blocked", "complete", "wont_do"]
+STATUS_TITLES = {
+    "in_progress": "In Progress",
+    "pending": "Pending",
+    "blocked": "Blocked",
+    "complete": "Completed",
+    "wont_do": "Won't Do",
+}
 
 
 def format_deps(task: Task) -> str:
@@ -61,47 +87,267 @@ def render_task_line(task_id: str, task: Task, indent: int = 0) -> list[str]:
     return lines
 
 
+def render_document(tasks: Iterable[tuple[str, str, list[str]]]) -> str:
+    """Render the document from (task_id, status, task lines) in walk order."""
+    # Group by status
+    by_status: dict[str, list[list[str]]] = defaultdict(list)
+    for _, status, task_lines in tasks:
+        by_status[status].append(task_lines)
+
+    if not by_status:
+        return "# Tasks\n\n_No tasks._"
+
+    lines = ["# Tasks", ""]
+    for status in STATUS_ORDER:
+        grouped = by_status.get(status, [])
+        if grouped:
+            lines.append(f"## {STATUS_TITLES[status]}")
+            for task_lines in grouped:
+                lines.extend(task_lines)
+            lines.append("")
+
+    return "\n".join(lines).rstrip()
+
+
+def task_lines(task_id: str, task: Task) -> list[str]:
+    """render_task_line, indented by the task's depth."""
+    return render_task_line(task_id, task, indent=task_id.count("/"))
+
+
+def write_output(path: Path, text: str) -> None:
+    """Replace path with text atomically, so viewers never see half a file."""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(text + "\n")
+    os.replace(tmp_path, path)
+
+
+# =============================================================================
+# Watch Mode
+# =============================================================================
+
+
+def render_key(task: Task) -> tuple:
+    """Everything render_task_line shows of a task."""
+    return (
+        task.status, task.title, tuple(task.deps), task.blocked_reason, task.approach,
+        tuple(task.criteria), tuple(task.files), tuple(note.text for note in task.notes),
+    )
+
+
+class RenderedTree:
+    """
+    Each task's rendered lines, kept up to date from the store's stamps.
+
+    Tasks are only read again when their stamp changes, and only rendered
+    again when what they show changes.
+    """
+
+    def __init__(self, store: TaskStore):
+        self.store = store
+        self.stamps: dict[str, object] = {}
+        # task id -> (render_key, status, lines)
+        self.rendered: dict[str, tuple[tuple, str, list[str]]] = {}
+        self.order: list[str] = []  # Task IDs in walk order
+        self.renders = 0
+
+    def refresh(self) -> bool:
+        """Catch up with the store. Returns whether the document changed."""
+        changed = reordered = False
+        with self.store.transaction():
+            stamps = dict(self.store.stamps())
+            for task_id in self.stamps.keys() - stamps.keys():
+                del self.stamps[task_id]
+                del self.rendered[task_id]
+                changed = reordered = True
+            for task_id, stamp in stamps.items():
+                if stamp is not None and self.stamps.get(task_id) == stamp:
+                    continue
+                try:
+                    task = self.store.load(task_id)
+                except TaskError:
+                    continue  # Removed since the stamps were read
+                self.stamps[task_id] = stamp
+                key = render_key(task)
+                previous = self.rendered.get(task_id)
+                if previous is not None and previous[0] == key:
+                    continue
+                self.rendered[task_id] = (key, task.status, task_lines(task_id, task))
+                self.renders += 1
+                changed = True
+                reordered |= previous is None
+        if reordered:
+            self.order = sorted(self.rendered, key=sort_key)
+        return changed
+
+    def render(self) -> str:
+        return render_document(
+            (task_id, *self.rendered[task_id][1:]) for task_id in self.order
+        )
+
+
+# inotify(7) event masks
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_IGNORED = 0x8000  # The watch is gone, with its directory
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF
+)
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then the name
+
+# Changes made in a burst (one command's commit) are picked up together
+SETTLE_SECONDS = 0.05
+
+
+class PollWatcher:
+    """Wakes up every interval seconds."""
+
+    def __init__(self, root: Path, interval: float):
+        self.interval = interval
+
+    def wait(self) -> None:
+        time.sleep(self.interval)
+
+
+class InotifyWatcher:
+    """
+    Wakes up when anything changes under root, via inotify (Linux only).
+
+    Dot directories (locks, the archive) are not watched. Other dotfiles
+    are caches, logs and temporary files, so they are ignored too, except
+    the ones in dotfiles (the SQLite database, for that backend).
+    """
+
+    def __init__(self, root: Path, dotfiles: Collection[str] = ()):
+        self.root = root
+        self.dotfiles = set(dotfiles)
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: dict[int, Path] = {}
+        self._watch_tree()
+
+    def _watch_tree(self) -> None:
+        # Every directory there now, whatever was watched before: watching a
+        # directory again returns its wd, and one deleted and made again at
+        # the same path (a task demoted, then promoted) gets a new wd
+        for directory, dirnames, _ in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            path = Path(directory)
+            wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd >= 0:  # Else removed meanwhile
+                self.watches[wd] = path
+
+    def _read_events(self) -> bool:
+        """Read pending events. Returns whether any could matter."""
+        data = os.read(self.fd, 64 * 1024)
+        relevant, new_dirs = False, False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode()
+            offset += length
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                # A moved directory is watched again at its new path
+                if mask & IN_MOVE_SELF and self.watches.pop(wd, None) is not None:
+                    self._rm_watch(self.fd, wd)
+                self.watches.pop(wd, None)
+                relevant = True
+                continue
+            if name.startswith(".") and name not in self.dotfiles:
+                continue
+            relevant = True
+            new_dirs |= bool(mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO))
+        if new_dirs:
+            self._watch_tree()
+        return relevant
+
+    def wait(self) -> None:
+        while True:
+            select.select([self.fd], [], [])
+            relevant = self._read_events()
+            # Let the rest of a commit land, then take its events too
+            time.sleep(SETTLE_SECONDS)
+            while select.select([self.fd], [], [], 0)[0]:
+                relevant |= self._read_events()
+            if relevant:
+                return
+
+
+def open_watcher(store: TaskStore, interval: float, poll: bool) -> PollWatcher | InotifyWatcher:
+    """inotify if it is available (and not poll), else polling."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            # A SQLite commit writes the write-ahead log, and in time the database
+            return InotifyWatcher(store.root, dotfiles=(STORE_DB, f"{STORE_DB}-wal"))
+        except (OSError, AttributeError):
+            pass  # No usable inotify: poll
+    return PollWatcher(store.root, interval)
+
+
+def watch(root: Path, output: Path, interval: float, poll: bool) -> None:
+    """Rewrite output whenever the rendered document changes, until interrupted."""
+    store = open_store(root)
+    tree = RenderedTree(store)
+    watcher = open_watcher(store, interval, poll)
+    last = None
+    while True:
+        if tree.refresh() or last is None:
+            text = tree.render()
+            if text != last:
+                write_output(output, text)
+                last = text
+        watcher.wait()
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Render tasks to readable markdown")
+    parser.add_argument("--output", "-o", type=Path, help="Write to this file instead of stdout")
+    parser.add_argument(
+        "--watch", action="store_true", help="Keep --output up to date as tasks change"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=1.0,
+        help="Seconds between checks when polling (default: 1)",
+    )
+    parser.add_argument("--poll", action="store_true", help="Poll even where inotify works")
+    args = parser.parse_args()
+
     root = find_tasks_root()
     if not root:
         print("No .claude/tasks/ found.", file=sys.stderr)
         sys.exit(1)
 
-    # Collect all tasks
-    all_tasks: list[tuple[str, Task]] = list(walk_tasks(root))
-
-    if not all_tasks:
-        print("# Tasks\n\n_No tasks._")
+    if args.watch:
+        if args.output is None:
+            parser.error("--watch needs --output")
+        try:
+            watch(root, args.output, args.interval, args.poll)
+        except KeyboardInterrupt:
+            pass
         return
 
-    # Group by status
-    by_status: dict[str, list[tuple[str, Task]]] = defaultdict(list)
-    for task_id, task in all_tasks:
-        by_status[task.status].append((task_id, task))
-
-    lines = ["# Tasks", ""]
-
-    # Render in priority order
-    status_order = ["in_progress", "pending", "blocked", "complete", "wont_do"]
-    status_titles = {
-        "in_progress": "In Progress",
-        "pending": "Pending",
-        "blocked": "Blocked",
-        "complete": "Completed",
-        "wont_do": "Won't Do",
-    }
-
-    for status in status_order:
-        tasks = by_status.get(status, [])
-        if tasks:
-            lines.append(f"## {status_titles[status]}")
-            for task_id, task in tasks:
-                # Calculate indent based on path depth
-                depth = task_id.count("/")
-                lines.extend(render_task_line(task_id, task, indent=depth))
-            lines.append("")
-
-    print("\n".join(lines).rstrip())
+    text = render_document(
+        (task_id, task.status, task_lines(task_id, task))
+        for task_id, task in open_store(root).walk()
+    )
+    if args.output is None:
+        print(text)
+    else:
+        write_output(args.output, text)
 
 
 if __name__ == "__main__":
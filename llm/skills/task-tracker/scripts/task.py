@@ -9,15 +9,20 @@ All output is JSON for machine consumption.
 from __future__ import annotations
 
 import argparse
+import base64
+import heapq
+import itertools
 import json
-import shutil
+import os
 import sys
 from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Collection, Iterable, Iterator
 
 from task_fs import (
     TASKS_DIR,
-    INDEX_FILE,
+    JOBS_ENV,
     VALID_STATUSES,
     Task,
     Note,
@@ -25,18 +30,17 @@ from task_fs import (
     find_tasks_root,
     require_tasks_root,
     slugify,
-    next_prefix,
-    get_task_path,
-    get_task_id,
-    is_leaf,
-    parse_task,
-    render_task,
-    walk_tasks,
-    promote_to_parent,
-    demote_to_leaf,
-    deps_satisfied,
+    read_body,
     now_iso,
+    parse_timestamp,
 )
+from task_archive import Archive, archivable
+from task_graph import TaskGraph, find_cycle, is_within, rename_id
+from task_profile import PROFILE_ENV, phase
+from task_search import SEARCH_FIELDS, SearchIndex, search_path
+from task_store import BACKEND_ENV, BACKENDS, TaskStore, copy_tasks, open_store, sort_key
+import task_profile
+import task_server
 
 
 # =============================================================================
@@ -44,70 +48,288 @@ from task_fs import (
 # =============================================================================
 
 
+class Params(argparse.Namespace):
+    """Command arguments from JSON; options that were not sent read as None."""
+
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return None
+
+
 def output_success(data: dict) -> None:
     """Print success response and exit 0."""
     print(json.dumps({"ok": True, **data}, default=str))
     sys.exit(0)
 
 
-def output_error(message: str) -> None:
+def output_error(message: str, **extra) -> None:
     """Print error response and exit 1."""
-    print(json.dumps({"ok": False, "error": message}))
+    print(json.dumps({"ok": False, "error": message, **extra}, default=str))
     sys.exit(1)
 
 
-def task_to_dict(task: Task) -> dict:
-    """Convert Task to JSON-serializable dict."""
-    d = asdict(task)
-    # Convert Note objects to dicts
-    d["notes"] = [asdict(n) if hasattr(n, "__dataclass_fields__") else n for n in task.notes]
+class BatchError(TaskError):
+    """
+    A batch operation failed. Carries the results of the ones before it,
+    which stay applied.
+    """
+
+    def __init__(self, message: str, results: list[dict]):
+        super().__init__(message)
+        self.results = results
+
+
+TASK_FIELDS = tuple(Task.__dataclass_fields__)
+NOTE_FIELDS = ("task_id", "task_title", "text", "created")
+OUTPUT_FORMATS = ("json", "jsonl")
+
+
+def task_to_dict(task: Task, fields: Collection[str] | None = None) -> dict:
+    """
+    Convert Task to JSON-serializable dict, of only fields if given.
+
+    Values are the task's own, not copies: only notes are converted, and
+    only when they are asked for.
+    """
+    d = {}
+    for name in TASK_FIELDS:
+        if fields is not None and name not in fields:
+            continue
+        if name == "notes":
+            d[name] = [{"text": n.text, "created": n.created} for n in task.notes]
+        else:
+            d[name] = getattr(task, name)
     return d
 
 
+def check_fields(fields: list[str] | None, valid: tuple[str, ...]) -> set[str] | None:
+    """The --fields to output, or None for all of them."""
+    if not fields:
+        return None
+    unknown = [name for name in fields if name not in valid]
+    if unknown:
+        raise TaskError(f"Unknown field: {unknown[0]}. Valid: {', '.join(valid)}")
+    return set(fields)
+
+
+def page(records: Iterable[dict], key: str, args: argparse.Namespace) -> dict:
+    """
+    Apply --offset and --limit to records and return them as result[key].
+
+    With --format jsonl, each record is printed as a JSON line as soon as it
+    is made instead, and the result only says how many there were. Records
+    past the page are never made. With --limit, `more` says whether there
+    are more after it.
+    """
+    offset = args.offset or 0
+    if offset < 0 or (args.limit or 0) < 0:
+        raise TaskError("--offset and --limit can't be negative")
+    records = iter(records)
+    if offset:
+        next(itertools.islice(records, offset, offset), None)
+    selected = records if args.limit is None else itertools.islice(records, args.limit)
+
+    if args.format == "jsonl":
+        n = 0
+        for record in selected:
+            print(json.dumps(record, default=str))
+            n += 1
+        result = {"count": n}
+    else:
+        selected = list(selected)
+        result = {key: selected, "count": len(selected)}
+    if args.limit is not None:
+        result["more"] = next(records, None) is not None
+    return result
+
+
+def read_deps(task_id: str, store: TaskStore) -> list[str]:
+    """Read a task's deps from its header ([] for a missing task)."""
+    try:
+        return store.load(task_id, header_only=True).deps
+    except TaskError:
+        return []
+
+
+def incomplete_deps(task: Task, store: TaskStore) -> list[str]:
+    """
+    Return the deps of task that are not complete, reading only their headers.
+
+    Deps no longer in the tree are looked up in the archive; missing ones
+    count as incomplete.
+    """
+    archive = None
+    incomplete = []
+    for dep_id in task.deps:
+        try:
+            status = store.load(dep_id, header_only=True).status
+        except TaskError:
+            if archive is None:
+                archive = Archive(store.root)
+            status = archive.status(dep_id)
+        if status != "complete":
+            incomplete.append(dep_id)
+    return incomplete
+
+
+def check_deps(deps: list[str], store: TaskStore) -> list[str]:
+    """Return deps, or raise TaskError naming the first that does not exist."""
+    archive = Archive(store.root)
+    for dep in deps:
+        try:
+            store.resolve(dep)
+        except TaskError:
+            if archive.status(dep) is None:
+                raise TaskError(f"Dependency not found: {dep}") from None
+    return list(deps)
+
+
+def next_prefix(store: TaskStore, parent_id: str = "") -> str:
+    """The next NN- prefix among parent_id's children, archived ones included."""
+    return max(
+        store.next_prefix(parent_id), Archive(store.root).next_prefix(parent_id), key=int
+    )
+
+
+def walk_all(
+    store: TaskStore,
+    status: str | None = None,
+    include_archived: bool = False,
+    fields: Collection[str] | None = None,
+    since: str | None = None,
+):
+    """store.walk(...), merged in depth-first order with archived tasks if asked."""
+    tasks = store.walk(fields=fields, status=status, since=since)
+    if not include_archived:
+        return tasks
+    archived = Archive(store.root).walk(status)
+    return heapq.merge(tasks, archived, key=lambda item: sort_key(item[0]))
+
+
+class _Newest(str):
+    """A timestamp that sorts before earlier ones, for a newest-first heap."""
+
+    def __lt__(self, other: str) -> bool:
+        return str.__gt__(self, other)
+
+
+def note_timeline(
+    tasks: Iterable[tuple[str, Task]],
+    since: str | None = None,
+    until: str | None = None,
+    newest_first: bool = False,
+) -> Iterator[tuple[str, Task, Note]]:
+    """
+    Yield (task id, task, note) for notes created between since and until.
+
+    A heap merges the tasks' notes, which each task keeps in time order. A
+    task's notes fall between its created and updated times, so it joins
+    the merge only when its bound could hold the next note: tasks may come
+    header-only, and their notes are only read once they are needed. Stop
+    early and the rest are never read.
+    """
+    order = []
+    for task_id, task in tasks:
+        if (since and task.updated < since) or (until and task.created > until):
+            continue
+        # A task written by hand may lack them: then its notes could be anywhere
+        if newest_first:
+            bound = _Newest(task.updated or "9999")
+        else:
+            bound = task.created
+        order.append((bound, len(order), task_id, task))
+    order.sort()
+
+    def stream(task: Task) -> Iterator[Note]:
+        notes = reversed(task.notes) if newest_first else iter(task.notes)
+        for note in notes:
+            if (since and note.created < since) or (until and note.created > until):
+                continue
+            yield note
+
+    heap: list[tuple] = []
+    pending = iter(order)
+    upcoming = next(pending, None)
+    while True:
+        # Admit every task whose notes could come before the next one
+        while upcoming is not None and (not heap or not heap[0][0] < upcoming[0]):
+            _, seq, task_id, task = upcoming
+            notes = stream(task)
+            note = next(notes, None)
+            if note is not None:
+                key = _Newest(note.created) if newest_first else note.created
+                heapq.heappush(heap, (key, seq, note, notes, task_id, task))
+            upcoming = next(pending, None)
+        if not heap:
+            return
+        _, seq, note, notes, task_id, task = heap[0]
+        yield task_id, task, note
+        following = next(notes, None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            key = _Newest(following.created) if newest_first else following.created
+            heapq.heapreplace(heap, (key, seq, following, notes, task_id, task))
+
+
+def lock_for_update(store: TaskStore, task_id: str, if_updated: str | None = None) -> str:
+    """
+    Lock a task for a read-modify-write and return its ID.
+
+    Holds the tree lock shared (no move or remove can run meanwhile) and the
+    task's own lock until the command commits; read the task after this.
+    With if_updated, fails unless the task's `updated` still matches it.
+    """
+    store.lock_tree()
+    task_id = store.resolve(task_id)
+    store.lock(task_id)
+    if if_updated is not None:
+        updated = store.load(task_id, header_only=True).updated
+        if updated != if_updated:
+            raise TaskError(
+                f"Task {task_id} was updated at {updated}, not {if_updated}"
+            )
+    return task_id
+
+
 # =============================================================================
 # Commands
 # =============================================================================
 
 
-def cmd_init(args: argparse.Namespace) -> None:
+def cmd_init(args: argparse.Namespace) -> dict:
     """Initialize a new tasks directory."""
     tasks_dir = Path.cwd() / TASKS_DIR
     if tasks_dir.exists():
-        output_error(f"{tasks_dir} already exists")
+        raise TaskError(f"{tasks_dir} already exists")
 
     tasks_dir.mkdir(parents=True)
-    output_success({"message": f"Created {tasks_dir}", "path": str(tasks_dir)})
+    return {"message": f"Created {tasks_dir}", "path": str(tasks_dir)}
 
 
-def cmd_add(args: argparse.Namespace) -> None:
+def cmd_add(args: argparse.Namespace) -> dict:
     """Add a new task or subtask."""
-    root = require_tasks_root()
+    store = open_store()
+    store.lock_tree(exclusive=True)
 
-    # Determine target directory
+    # Determine parent
     if args.parent:
-        parent_id = args.parent
-        parent_file = root / f"{parent_id}.md"
-        parent_dir = root / parent_id
-
-        # Promote leaf to directory if needed
-        if parent_file.exists() and not parent_dir.exists():
-            promote_to_parent(parent_id, root)
-
-        if not parent_dir.exists():
-            output_error(f"Parent task not found: {parent_id}")
-
-        target_dir = parent_dir
+        try:
+            parent_id = store.resolve(args.parent)
+        except TaskError:
+            raise TaskError(f"Parent task not found: {args.parent}") from None
+        # Promote leaf to parent if needed
+        store.promote(parent_id)
         task_id_prefix = f"{parent_id}/"
     else:
-        target_dir = root
+        parent_id = ""
         task_id_prefix = ""
 
     # Create task
     slug = slugify(args.title)
-    prefix = next_prefix(target_dir)
-    task_name = f"{prefix}-{slug}"
-    task_path = target_dir / f"{task_name}.md"
-    task_id = f"{task_id_prefix}{task_name}"
+    prefix = next_prefix(store, parent_id)
+    task_id = f"{task_id_prefix}{prefix}-{slug}"
 
     task = Task(
         id=task_id,
@@ -121,62 +343,34 @@ def cmd_add(args: argparse.Namespace) -> None:
 
     # Handle dependencies
     if args.deps:
-        dep_ids = []
-        for dep in args.deps:
-            try:
-                get_task_path(dep, root)  # Validate exists
-                dep_ids.append(dep)
-            except TaskError:
-                output_error(f"Dependency not found: {dep}")
+        dep_ids = check_deps(args.deps, store)
+        cycle = find_cycle(task_id, dep_ids, lambda dep_id: read_deps(dep_id, store))
+        if cycle:
+            raise TaskError(f"Dependency cycle: {' -> '.join(cycle)}")
         task.deps = dep_ids
 
-    task_path.write_text(render_task(task))
-    output_success({"task": task_to_dict(task), "id": task_id})
+    store.save(task)
+    return {"task": task_to_dict(task), "id": task_id}
 
 
-def cmd_remove(args: argparse.Namespace) -> None:
+def cmd_remove(args: argparse.Namespace) -> dict:
     """Remove a task or subtask."""
-    root = require_tasks_root()
+    store = open_store()
+    store.lock_tree(exclusive=True)
 
-    try:
-        task_path = get_task_path(args.id, root)
-    except TaskError as e:
-        output_error(str(e))
-
-    task = parse_task(task_path, root)
-    task_id = task.id
-
-    if task_path.name == INDEX_FILE:
-        # Parent task - remove entire directory
-        shutil.rmtree(task_path.parent)
-    else:
-        # Leaf task - just unlink
-        task_path.unlink()
-
-        # Check if parent should demote
-        parent_dir = task_path.parent
-        if parent_dir != root:
-            children = [f for f in parent_dir.iterdir() if f.name != INDEX_FILE]
-            if not children:
-                parent_id = str(parent_dir.relative_to(root))
-                try:
-                    demote_to_leaf(parent_id, root)
-                except TaskError:
-                    pass  # If demotion fails, leave as empty parent
+    task = store.load(args.id)
+    store.remove(task.id)
 
-    output_success({"removed": task_id, "task": task_to_dict(task)})
+    return {"removed": task.id, "task": task_to_dict(task)}
 
 
-def cmd_update(args: argparse.Namespace) -> None:
+def cmd_update(args: argparse.Namespace) -> dict:
     """Update a task's fields."""
-    root = require_tasks_root()
+    store = open_store()
 
-    try:
-        task_path = get_task_path(args.id, root)
-    except TaskError as e:
-        output_error(str(e))
+    task_id = lock_for_update(store, args.id, args.if_updated)
 
-    task = parse_task(task_path, root)
+    task = store.load(task_id)
 
     if args.title:
         task.title = args.title
@@ -190,111 +384,168 @@ def cmd_update(args: argparse.Namespace) -> None:
         task.files = args.files
     if args.status:
         if args.status not in VALID_STATUSES:
-            output_error(f"Invalid status: {args.status}. Valid: {', '.join(VALID_STATUSES)}")
+            raise TaskError(f"Invalid status: {args.status}. Valid: {', '.join(VALID_STATUSES)}")
         task.status = args.status
     if args.deps is not None:
-        dep_ids = []
-        for dep in args.deps:
-            try:
-                get_task_path(dep, root)
-                dep_ids.append(dep)
-            except TaskError:
-                output_error(f"Dependency not found: {dep}")
+        dep_ids = check_deps(args.deps, store)
+        cycle = find_cycle(task.id, dep_ids, lambda dep_id: read_deps(dep_id, store))
+        if cycle:
+            raise TaskError(f"Dependency cycle: {' -> '.join(cycle)}")
         task.deps = dep_ids
 
     task.updated = now_iso()
-    task_path.write_text(render_task(task))
-    output_success({"task": task_to_dict(task), "id": task.id})
+    store.save(task)
+    return {"task": task_to_dict(task), "id": task.id}
 
 
-def cmd_list(args: argparse.Namespace) -> None:
+def cmd_list(args: argparse.Namespace) -> dict:
     """List all tasks."""
-    root = require_tasks_root()
+    store = open_store()
+    fields = check_fields(args.fields, TASK_FIELDS)
 
-    tasks = []
-    for task_id, task in walk_tasks(root):
-        if args.status and task.status != args.status:
-            continue
-        tasks.append({"id": task_id, **task_to_dict(task)})
+    archive = Archive(store.root)
 
-    output_success({"tasks": tasks, "count": len(tasks)})
+    def tasks():
+        for task_id, task in walk_all(store, args.status, args.include_archived, fields):
+            data = {"id": task_id, **task_to_dict(task, fields)}
+            if args.include_archived and task_id in archive.index:
+                data["archived"] = True
+            yield data
 
+    return page(tasks(), "tasks", args)
 
-def cmd_show(args: argparse.Namespace) -> None:
+
+def cmd_show(args: argparse.Namespace) -> dict:
     """Show a single task."""
-    root = require_tasks_root()
+    store = open_store()
 
     try:
-        task_path = get_task_path(args.id, root)
-    except TaskError as e:
-        output_error(str(e))
+        task_id = store.resolve(args.id)
+    except TaskError:
+        task = Archive(store.root).load(args.id)
+        if task is None:
+            raise
+        return {"task": task_to_dict(task), "id": task.id, "archived": True}
 
-    task = parse_task(task_path, root)
-    satisfied, incomplete = deps_satisfied(task, root)
+    task = store.load(task_id)
+    incomplete = incomplete_deps(task, store)
 
     result = {
         "task": task_to_dict(task),
-        "id": task.id,
-        "deps_satisfied": satisfied,
+        "id": task_id,
+        "deps_satisfied": not incomplete,
     }
-    if not satisfied:
+    if incomplete:
         result["incomplete_deps"] = incomplete
 
-    output_success(result)
+    return result
 
 
-def cmd_next(args: argparse.Namespace) -> None:
+def cmd_next(args: argparse.Namespace) -> dict:
     """Get the next task to work on (depth-first, deps satisfied)."""
-    root = require_tasks_root()
+    graph = TaskGraph.load(open_store())
+    with phase("graph"):
+        ready = graph.next_ready()
+    if ready is None:
+        result = {"task": None, "reason": "no available tasks"}
+        with phase("graph"):
+            cycles = graph.cycles()
+        if cycles:
+            result["cycles"] = cycles  # Tasks that can never become ready
+        return result
+
+    task_id, reason = ready
+    return {
+        "task": task_to_dict(graph.tasks[task_id]),
+        "id": task_id,
+        "reason": reason,
+    }
 
-    # First, find in_progress tasks and check for pending children
-    for task_id, task in walk_tasks(root, depth_first=True):
-        if task.status == "in_progress" and task.children:
-            # Check children for pending tasks
-            for child_id in task.children:
-                try:
-                    child_path = get_task_path(child_id, root)
-                    child = parse_task(child_path, root)
-                    if child.status == "pending":
-                        satisfied, _ = deps_satisfied(child, root)
-                        if satisfied:
-                            output_success({
-                                "task": task_to_dict(child),
-                                "id": child_id,
-                                "reason": "pending child of in_progress task",
-                            })
-                except TaskError:
-                    continue
-
-    # No in_progress with pending children - find first pending with satisfied deps
-    for task_id, task in walk_tasks(root, depth_first=True):
-        if task.status == "pending":
-            satisfied, _ = deps_satisfied(task, root)
-            if satisfied:
-                output_success({
-                    "task": task_to_dict(task),
-                    "id": task_id,
-                    "reason": "first pending task with satisfied dependencies",
-                })
-
-    output_success({"task": None, "reason": "no available tasks"})
-
-
-def cmd_start(args: argparse.Namespace) -> None:
+
+def cmd_ready(args: argparse.Namespace) -> dict:
+    """Claim up to N ready tasks that can be worked on in parallel."""
+    store = open_store()
+    workers = 1 if args.workers is None else args.workers
+    if workers < 1:
+        raise TaskError("--workers must be at least 1")
+
+    # Nobody else can claim (or add, or move) tasks until this commits
+    if not args.no_claim:
+        store.lock_tree(exclusive=True)
+    graph = TaskGraph.load(store)
+    with phase("graph"):
+        frontier = graph.frontier()
+        picked = graph.pick_parallel(workers)
+
+    if not args.no_claim:
+        now = now_iso()
+        for task_id in picked:
+            task = graph.tasks[task_id]
+            task.status = "in_progress"
+            task.updated = now
+            if not task.started:
+                task.started = now
+            store.save(task)
+
+    return {
+        "tasks": [task_to_dict(graph.tasks[task_id]) for task_id in picked],
+        "ids": picked,
+        "count": len(picked),
+        "claimed": not args.no_claim,
+        "frontier": frontier,
+    }
+
+
+def cmd_graph(args: argparse.Namespace) -> dict:
+    """Analyze the dependency graph: cycles, order, critical path."""
+    graph = TaskGraph.load(open_store())
+    with phase("graph"):
+        components = graph.components()
+        cycles = graph.cycles()
+        return {
+            "tasks": len(graph.tasks),
+            "edges": sum(len(task.deps) for task in graph.tasks.values()),
+            "acyclic": not cycles,
+            "cycles": cycles,
+            "order": [task_id for component in components for task_id in component],
+            "critical_path": graph.longest_chain(),
+            "pending_chain": graph.longest_chain(
+                lambda task: task.status not in ("complete", "wont_do")
+            ),
+        }
+
+
+def cmd_progress(args: argparse.Namespace) -> dict:
+    """Status counts and dates for a task's subtree, or the whole tree."""
+    store = open_store()
+    task_id = store.resolve(args.id) if args.id else ""
+    with phase("rollup"):
+        rollup = store.rollup(task_id)
+    counts = {status: rollup["counts"].get(status, 0) for status in VALID_STATUSES}
+    total = sum(counts.values())
+    finished = counts["complete"] + counts["wont_do"]
+    return {
+        "id": task_id or None,
+        "total": total,
+        "counts": counts,
+        "percent_complete": round(100 * finished / total, 1) if total else 100.0,
+        "started": rollup["started"] or None,
+        "completed": rollup["completed"] or None,
+    }
+
+
+def cmd_start(args: argparse.Namespace) -> dict:
     """Start working on a task (set to in_progress)."""
-    root = require_tasks_root()
+    store = open_store()
 
-    try:
-        task_path = get_task_path(args.id, root)
-    except TaskError as e:
-        output_error(str(e))
+    task_id = lock_for_update(store, args.id, args.if_updated)
 
-    task = parse_task(task_path, root)
+    task = store.load(task_id, header_only=True)
 
     # Check dependencies (soft blocking - warn but allow)
-    satisfied, incomplete = deps_satisfied(task, root)
+    incomplete = incomplete_deps(task, store)
     warnings = []
-    if not satisfied:
+    if incomplete:
         warnings.append(f"Starting with incomplete dependencies: {', '.join(incomplete)}")
 
     task.status = "in_progress"
@@ -302,203 +553,523 @@ def cmd_start(args: argparse.Namespace) -> None:
     if not task.started:
         task.started = now_iso()
 
-    task_path.write_text(render_task(task))
+    store.save(task)
 
     result = {"task": task_to_dict(task), "id": task.id}
     if warnings:
         result["warnings"] = warnings
-    output_success(result)
+    return result
 
 
-def cmd_done(args: argparse.Namespace) -> None:
+def cmd_done(args: argparse.Namespace) -> dict:
     """Mark a task complete."""
-    root = require_tasks_root()
+    store = open_store()
 
     if args.id:
-        try:
-            task_path = get_task_path(args.id, root)
-        except TaskError as e:
-            output_error(str(e))
+        task_id = lock_for_update(store, args.id, args.if_updated)
     else:
         # Find current in_progress task (deepest first)
-        task_path = None
-        for task_id, task in walk_tasks(root, depth_first=True):
-            if task.status == "in_progress":
-                task_path = get_task_path(task_id, root)
-                break
+        task_id = None
+        store.lock_tree()
+        for in_progress_id, _ in store.walk(fields=("status",), status="in_progress"):
+            task_id = lock_for_update(store, in_progress_id, args.if_updated)
+            break
 
-        if not task_path:
-            output_error("No in_progress task found. Specify an ID.")
+        if not task_id:
+            raise TaskError("No in_progress task found. Specify an ID.")
 
-    task = parse_task(task_path, root)
+    task = store.load(task_id)
     task.status = "complete"
     task.completed = now_iso()
     task.updated = now_iso()
 
-    task_path.write_text(render_task(task))
-    output_success({"task": task_to_dict(task), "id": task.id})
+    store.save(task)
+    return {"task": task_to_dict(task), "id": task.id}
 
 
-def cmd_block(args: argparse.Namespace) -> None:
+def cmd_block(args: argparse.Namespace) -> dict:
     """Block a task with optional reason."""
-    root = require_tasks_root()
+    store = open_store()
 
-    try:
-        task_path = get_task_path(args.id, root)
-    except TaskError as e:
-        output_error(str(e))
+    task_id = lock_for_update(store, args.id, args.if_updated)
 
-    task = parse_task(task_path, root)
+    task = store.load(task_id)
     task.status = "blocked"
     task.updated = now_iso()
     if args.reason:
         task.blocked_reason = args.reason
 
-    task_path.write_text(render_task(task))
-    output_success({"task": task_to_dict(task), "id": task.id})
+    store.save(task)
+    return {"task": task_to_dict(task), "id": task.id}
 
 
-def cmd_unblock(args: argparse.Namespace) -> None:
+def cmd_unblock(args: argparse.Namespace) -> dict:
     """Unblock a task (set back to pending)."""
-    root = require_tasks_root()
+    store = open_store()
 
-    try:
-        task_path = get_task_path(args.id, root)
-    except TaskError as e:
-        output_error(str(e))
+    task_id = lock_for_update(store, args.id, args.if_updated)
 
-    task = parse_task(task_path, root)
+    task = store.load(task_id)
     task.status = "pending"
     task.blocked_reason = ""
     task.updated = now_iso()
 
-    task_path.write_text(render_task(task))
-    output_success({"task": task_to_dict(task), "id": task.id})
+    store.save(task)
+    return {"task": task_to_dict(task), "id": task.id}
 
 
-def cmd_note(args: argparse.Namespace) -> None:
+def cmd_note(args: argparse.Namespace) -> dict:
     """Add a note to a task."""
-    root = require_tasks_root()
-
-    try:
-        task_path = get_task_path(args.id, root)
-    except TaskError as e:
-        output_error(str(e))
+    store = open_store()
 
-    task = parse_task(task_path, root)
+    task_id = lock_for_update(store, args.id, args.if_updated)
 
     note = Note(text=args.text, created=now_iso())
-    task.notes.append(note)
-    task.updated = now_iso()
-
-    task_path.write_text(render_task(task))
+    note_count = store.append_note(task_id, note)
 
-    output_success({
-        "task_id": task.id,
+    return {
+        "task_id": task_id,
         "note": asdict(note),
-        "note_count": len(task.notes),
-    })
+        "note_count": note_count,
+    }
 
 
-def cmd_notes(args: argparse.Namespace) -> None:
-    """List all notes chronologically."""
-    root = require_tasks_root()
+def cmd_notes(args: argparse.Namespace) -> dict:
+    """List notes chronologically, merged across tasks."""
+    store = open_store()
+    fields = check_fields(args.fields, NOTE_FIELDS)
+    since = parse_timestamp(args.since) if args.since else None
+    until = parse_timestamp(args.until) if args.until else None
+    if args.tail is not None and args.tail < 0:
+        raise TaskError("--tail can't be negative")
+    subtrees = [store.resolve(task_id) for task_id in args.task or []]
+
+    # Headers first: only tasks whose notes are reached get their body read
+    tasks = walk_all(
+        store, include_archived=args.include_archived,
+        fields=("title", "created", "updated"), since=since,
+    )
+    if subtrees:
+        tasks = (
+            (task_id, task) for task_id, task in tasks
+            if any(is_within(task_id, subtree) for subtree in subtrees)
+        )
+    if args.tail is not None:
+        newest = note_timeline(tasks, since, until, newest_first=True)
+        timeline = reversed(list(itertools.islice(newest, args.tail)))
+    else:
+        timeline = note_timeline(tasks, since, until)
 
-    all_notes = []
-    for task_id, task in walk_tasks(root):
-        for note in task.notes:
-            all_notes.append({
+    def notes():
+        for task_id, task, note in timeline:
+            record = {
                 "task_id": task_id,
                 "task_title": task.title,
                 "text": note.text,
                 "created": note.created,
-            })
+            }
+            if fields is not None:
+                record = {k: v for k, v in record.items() if k == "task_id" or k in fields}
+            yield record
 
-    all_notes.sort(key=lambda n: n["created"])
-    output_success({"notes": all_notes, "count": len(all_notes)})
+    return page(notes(), "notes", args)
 
 
-def cmd_move(args: argparse.Namespace) -> None:
-    """Move a task to a new location."""
-    root = require_tasks_root()
+# A write can take its timestamp before a cursor is made and commit after,
+# so the next call with the cursor looks back this far (and may repeat tasks)
+CURSOR_OVERLAP = timedelta(seconds=2)
+
 
+def encode_cursor(since: str, backend: str, position: int) -> str:
+    """An opaque cursor for `changes --since`."""
+    data = json.dumps({"since": since, "backend": backend, "position": position})
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(value: str) -> dict | None:
+    """The fields of a cursor from encode_cursor(), or None if it is not one."""
     try:
-        src_path = get_task_path(args.id, root)
-    except TaskError as e:
-        output_error(str(e))
+        data = json.loads(base64.urlsafe_b64decode(value.encode()))
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or {"since", "backend", "position"} - data.keys():
+        return None
+    return data
+
+
+def cmd_changes(args: argparse.Namespace) -> dict:
+    """List tasks and notes changed, and tasks removed or moved, since a point."""
+    store = open_store()
+    # Taken before reading any task, so the next call sees every later write
+    next_since = (datetime.now(timezone.utc) - CURSOR_OVERLAP).isoformat()
+
+    since, after = "", None
+    if args.since:
+        try:
+            since = parse_timestamp(args.since)
+        except TaskError:
+            cursor = decode_cursor(args.since)
+            if cursor is None:
+                raise TaskError(
+                    f"Invalid --since: {args.since} (expected ISO8601 or a cursor)"
+                ) from None
+            since = cursor["since"]
+            if cursor["backend"] == store.name:
+                after = cursor["position"]
+
+    changes = []
+    for task_id, task in store.walk(since=since or None):
+        data = task_to_dict(task)
+        data["notes"] = [n for n in data["notes"] if n["created"] >= since]
+        changes.append({
+            "op": "created" if task.created >= since else "updated",
+            "id": task_id,
+            "at": task.updated,
+            "task": data,
+        })
+    # Read the log after the tasks: a move made in between is reported now,
+    # and the moved task with the next call
+    logged, position = store.changes(since, after)
+    changes.extend(logged)
+    changes.sort(key=lambda c: c["at"])
+
+    return {
+        "changes": changes,
+        "count": len(changes),
+        "cursor": encode_cursor(next_since, store.name, position),
+    }
+
+
+def cmd_search(args: argparse.Namespace) -> dict:
+    """Search titles, descriptions, approaches, criteria and notes."""
+    store = open_store()
+    limit = 20 if args.limit is None else args.limit
+    if limit < 1:
+        raise TaskError("--limit must be at least 1")
+    since = parse_timestamp(args.since) if args.since else None
+    query = " ".join(args.query) if isinstance(args.query, list) else args.query
+
+    index = SearchIndex.open(store)
+    reindexed = index.refresh(store)
+    index.save()
+    hits = index.search(query, fields=args.field, since=since, status=args.status)
+
+    results = []
+    for score, task_id, sections in hits[:limit]:
+        doc = index.docs[task_id]
+        result = {
+            "id": task_id,
+            "title": doc["title"],
+            "status": doc["status"],
+            "score": round(score, 3),
+            "fields": sorted({s.partition(":")[0] for s in sections}, key=SEARCH_FIELDS.index),
+        }
+        note_indexes = [int(s.partition(":")[2]) for s in sections if s.startswith("note:")]
+        if note_indexes:
+            notes = store.load(task_id).notes
+            result["notes"] = [asdict(notes[i]) for i in note_indexes]
+        results.append(result)
+
+    return {"results": results, "count": len(hits), "reindexed": reindexed}
+
+
+def cmd_move(args: argparse.Namespace) -> dict:
+    """Move a task to a new location."""
+    store = open_store()
+    store.lock_tree(exclusive=True)
 
-    task = parse_task(src_path, root)
-    old_id = task.id
+    old_id = store.resolve(args.id)
+    graph = TaskGraph.load(store)
+    task = graph.get(old_id)
+
+    # Rewrite the moved task and every task that depends on anything in
+    # the moved subtree. Read their bodies now, before the tasks move.
+    rewrite = {old_id: task}
+    for other_id in graph.dependants_of(old_id, subtree=True):
+        rewrite[other_id] = graph.tasks[other_id]
+    for other_task in rewrite.values():
+        read_body(other_task)
 
     # Determine destination
     if args.parent:
-        dest_parent = args.parent
-        dest_parent_file = root / f"{dest_parent}.md"
-        dest_parent_dir = root / dest_parent
+        try:
+            dest_parent = store.resolve(args.parent)
+        except TaskError:
+            raise TaskError(f"Destination parent not found: {args.parent}") from None
+        if is_within(dest_parent, old_id):
+            raise TaskError(f"Cannot move {old_id} under itself")
 
         # Promote destination parent if needed
-        if dest_parent_file.exists() and not dest_parent_dir.exists():
-            promote_to_parent(dest_parent, root)
-
-        if not dest_parent_dir.exists():
-            output_error(f"Destination parent not found: {dest_parent}")
-
-        dest_dir = dest_parent_dir
+        store.promote(dest_parent)
         new_id_prefix = f"{dest_parent}/"
     else:
-        dest_dir = root
+        dest_parent = ""
         new_id_prefix = ""
 
     # Calculate new name
-    old_name = Path(old_id).name
+    old_name = old_id.rpartition("/")[2]
     # Extract slug from old name (remove prefix)
     if "-" in old_name:
         old_slug = old_name.split("-", 1)[1]
     else:
         old_slug = old_name
 
-    new_prefix = next_prefix(dest_dir)
-    new_name = f"{new_prefix}-{old_slug}"
-    new_id = f"{new_id_prefix}{new_name}"
+    new_prefix = next_prefix(store, dest_parent)
+    new_id = f"{new_id_prefix}{new_prefix}-{old_slug}"
 
-    # Move file or directory
-    if src_path.name == INDEX_FILE:
-        # Moving a parent task
-        src_dir = src_path.parent
-        dest_path = dest_dir / new_name
-        shutil.move(str(src_dir), str(dest_path))
-    else:
-        # Moving a leaf task
-        dest_path = dest_dir / f"{new_name}.md"
-        shutil.move(str(src_path), str(dest_path))
-
-        # Check if old parent should demote
-        old_parent_dir = src_path.parent
-        if old_parent_dir != root:
-            children = [f for f in old_parent_dir.iterdir() if f.name != INDEX_FILE]
-            if not children:
-                old_parent_id = str(old_parent_dir.relative_to(root))
-                try:
-                    demote_to_leaf(old_parent_id, root)
-                except TaskError:
-                    pass
-
-    # Update task ID in the moved file
-    new_task_path = get_task_path(new_id, root)
-    task = parse_task(new_task_path, root)
-    task.id = new_id
+    store.move(old_id, new_id)
+
+    # Tasks inside the moved subtree now live under new_id
     task.updated = now_iso()
-    new_task_path.write_text(render_task(task))
+    for other_id, other_task in rewrite.items():
+        graph.set_deps(other_id, [rename_id(d, old_id, new_id) for d in other_task.deps])
+        other_task.id = rename_id(other_id, old_id, new_id)
+        other_task.updated = task.updated
+        store.save(other_task)
+    task.children = [rename_id(child, old_id, new_id) for child in task.children]
+
+    return {"old_id": old_id, "new_id": new_id, "task": task_to_dict(task)}
+
+
+# Operations allowed in a batch: their required fields, then optional ones
+BATCH_OPS = {
+    "add": (("title",), ("parent", "description", "approach", "criteria", "files", "deps")),
+    "update": (
+        ("id",),
+        ("title", "description", "approach", "criteria", "files", "status", "deps",
+         "if_updated"),
+    ),
+    "remove": (("id",), ()),
+    "start": (("id",), ("if_updated",)),
+    "done": ((), ("id", "if_updated")),
+    "block": (("id",), ("reason", "if_updated")),
+    "unblock": (("id",), ("if_updated",)),
+    "note": (("id", "text"), ("if_updated",)),
+    "move": (("id",), ("parent",)),
+}
+
+# Batch op fields that name tasks, and so may hold "$ref"s
+REF_FIELDS = ("id", "parent", "deps")
+# Batch op fields that take lists of strings; the rest take strings
+LIST_FIELDS = ("deps", "criteria", "files")
+
+
+def check_op(name, op: dict) -> None:
+    """Raise TaskError unless op has the fields the named batch op takes, as the right types."""
+    if not isinstance(name, str) or name not in BATCH_OPS:
+        raise TaskError(f"Unknown op: {name}. Valid: {', '.join(BATCH_OPS)}")
+    required, optional = BATCH_OPS[name]
+    for field in required:
+        if field not in op:
+            raise TaskError(f"{name} requires '{field}'")
+    for key, value in op.items():
+        if key not in required and key not in optional:
+            raise TaskError(f"{name} does not take '{key}'")
+        if key in LIST_FIELDS:
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise TaskError(f"'{key}' must be a list of strings")
+        elif not isinstance(value, str):
+            raise TaskError(f"'{key}' must be a string")
+
+
+def resolve_refs(value, refs: dict[str, str]):
+    """Replace "$ref" strings (alone or in lists) with the task IDs they name."""
+    if isinstance(value, list):
+        return [resolve_refs(v, refs) for v in value]
+    if isinstance(value, str) and value.startswith("$"):
+        name, _, rest = value[1:].partition("/")
+        if name not in refs:
+            raise TaskError(f"Unknown reference: ${name}")
+        return f"{refs[name]}/{rest}" if rest else refs[name]
+    return value
+
+
+def cmd_batch(args: argparse.Namespace) -> dict:
+    """
+    Apply a JSONL stream of operations in one process.
+
+    Not all-or-nothing: each operation is committed once it succeeds
+    (markdown adds, moves and removes touch the tree as they run), so on a
+    failure the ones before it stay applied and the BatchError lists
+    their results.
+    """
+    store = open_store()
+
+    refs: dict[str, str] = {}
+    results = []
+    with store.transaction():
+        store.lock_tree(exclusive=True)
+        for line_no, line in enumerate(args.ops, 1):
+            if not line.strip():
+                continue
+            try:
+                op = json.loads(line)
+            except ValueError as e:
+                raise BatchError(f"Line {line_no}: invalid JSON: {e}", results) from None
 
-    # Update dep references in all tasks
-    for other_id, other_task in walk_tasks(root):
-        if old_id in other_task.deps:
-            other_path = get_task_path(other_id, root)
-            other_task.deps = [new_id if d == old_id else d for d in other_task.deps]
-            other_task.updated = now_iso()
-            other_path.write_text(render_task(other_task))
+            if not isinstance(op, dict):
+                raise BatchError(f"Line {line_no}: not a JSON object", results)
 
-    output_success({"old_id": old_id, "new_id": new_id, "task": task_to_dict(task)})
+            name = op.pop("op", None)
+            ref = op.pop("ref", None)
+            try:
+                check_op(name, op)
+                if ref is not None and not isinstance(ref, str):
+                    raise TaskError("'ref' must be a string")
+                params = {
+                    k: resolve_refs(v, refs) if k in REF_FIELDS else v
+                    for k, v in op.items()
+                }
+                result = COMMANDS[name](Params(**params))
+            except TaskError as e:
+                raise BatchError(f"Line {line_no}: {e}", results) from None
+            store.commit()
+
+            if name == "move":
+                # Keep references to the moved subtree pointing at it
+                for key, task_id in refs.items():
+                    refs[key] = rename_id(task_id, result["old_id"], result["new_id"])
+            if ref:
+                refs[ref] = result.get("new_id") or result.get("id") or result["removed"]
+            results.append({"op": name, **result})
+
+    return {"results": results, "count": len(results), "refs": refs}
+
+
+def cmd_archive(args: argparse.Namespace) -> dict:
+    """Move finished subtrees out of the tree into a compressed archive segment."""
+    store = open_store()
+    store.lock_tree(exclusive=True)
+
+    within = store.resolve(args.id) if args.id else None
+    roots = archivable(store, within)
+    if not roots:
+        return {"archived": [], "count": 0, "segment": None}
+
+    # Whole tasks, subtrees included, in depth-first order
+    ids = [
+        task_id for task_id, _ in store.walk(fields=("status",))
+        if any(task_id == root or task_id.startswith(f"{root}/") for root in roots)
+    ]
+    tasks = [store.load(task_id) for task_id in ids]
+    archive = Archive(store.root)
+    # A run cut short before removing its tasks archived these already
+    new = [task for task in tasks if not archive.holds(task)]
+    segment = archive.add(new) if new else None
+    for root in roots:
+        store.remove(root, op="archived")
+
+    return {"archived": roots, "count": len(tasks), "segment": segment}
+
+
+def cmd_reindex(args: argparse.Namespace) -> dict:
+    """Rebuild the task index from scratch."""
+    store = open_store()
+    count = store.reindex()
+    return {"indexed": count, "path": str(store.index_path)}
+
+
+def cmd_export(args: argparse.Namespace) -> dict:
+    """Copy every task into another storage backend, replacing its contents."""
+    root = require_tasks_root()
+    source = open_store(root)
+    if args.to == source.name:
+        raise TaskError(f"Tasks are already stored as {args.to}")
+    target = open_store(root, args.to)
+
+    source.lock_tree(exclusive=True)
+    with target.transaction():
+        target.lock_tree(exclusive=True)
+        count = copy_tasks(source, target)
+    # Stamps in the target's old search index may match the new tasks
+    search_path(root, target.name).unlink(missing_ok=True)
+    return {"exported": count, "from": source.name, "to": target.name}
+
+
+def cmd_serve(args: argparse.Namespace) -> dict:
+    """Serve commands over a Unix socket until stopped."""
+    root = require_tasks_root()
+
+    def dispatch(method: str, params: dict) -> dict:
+        return run_command(method, Params(**params))
+
+    methods = set(COMMANDS) - {"init", "serve", "batch"}
+    path = task_server.socket_path(root)
+    print(json.dumps({"ok": True, "message": "Serving", "socket": str(path)}), flush=True)
+    handled = task_server.serve(root, dispatch, methods, args.idle_timeout)
+    return {"message": "Server stopped", "socket": str(path), "requests": handled}
+
+
+COMMANDS = {
+    "init": cmd_init,
+    "add": cmd_add,
+    "remove": cmd_remove,
+    "update": cmd_update,
+    "list": cmd_list,
+    "show": cmd_show,
+    "next": cmd_next,
+    "ready": cmd_ready,
+    "graph": cmd_graph,
+    "progress": cmd_progress,
+    "start": cmd_start,
+    "done": cmd_done,
+    "block": cmd_block,
+    "unblock": cmd_unblock,
+    "note": cmd_note,
+    "notes": cmd_notes,
+    "search": cmd_search,
+    "changes": cmd_changes,
+    "move": cmd_move,
+    "batch": cmd_batch,
+    "archive": cmd_archive,
+    "reindex": cmd_reindex,
+    "export": cmd_export,
+    "serve": cmd_serve,
+}
+
+
+def run_command(name: str, args: argparse.Namespace) -> dict:
+    """
+    Run a command as one transaction on the tree's store.
+
+    With --profile (or $TASK_PROFILE), the result gets a `timings` object.
+    """
+    if args.profile or os.environ.get(PROFILE_ENV):
+        task_profile.start()
+    try:
+        root = find_tasks_root()
+        if root is None:
+            result = COMMANDS[name](args)  # init, or the command's own error
+        else:
+            with open_store(root).transaction():
+                result = COMMANDS[name](args)
+    finally:
+        timings = task_profile.stop()
+    if timings:
+        result["timings"] = timings
+    return result
+
+
+def forward_to_server(args: argparse.Namespace) -> dict | None:
+    """
+    Run a command on a running `task.py serve`, if there is one.
+
+    Returns the command result, or None to run it locally instead.
+    """
+    if args.command in ("init", "serve", "batch") or os.environ.get("TASK_NO_SERVER"):
+        return None
+    if getattr(args, "format", None) == "jsonl":
+        return None  # Streams to stdout, so runs here
+    root = find_tasks_root()
+    if root is None:
+        return None
+    params = {k: v for k, v in vars(args).items() if k != "command"}
+    response = task_server.call(root, args.command, params)
+    if response is None:
+        return None
+    if "error" in response:
+        raise TaskError(response["error"]["message"])
+    return response["result"]
 
 
 # =============================================================================
@@ -506,12 +1077,34 @@ def cmd_move(args: argparse.Namespace) -> None:
 # =============================================================================
 
 
+def add_output_arguments(parser: argparse.ArgumentParser, fields: tuple[str, ...]) -> None:
+    """Options for commands that output many records (see page)."""
+    parser.add_argument(
+        "--format", choices=OUTPUT_FORMATS, default="json",
+        help="json: one document; jsonl: one line per record as it is read, then the result",
+    )
+    parser.add_argument(
+        "--fields", nargs="+", choices=fields, help="Only output these fields (IDs always)"
+    )
+    parser.add_argument("--limit", "-n", type=int, help="Most records to output")
+    parser.add_argument("--offset", type=int, default=0, help="Records to skip first")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Task tracker for LLM context preservation",
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
+    parser.add_argument(
+        "--jobs", "-j", type=int,
+        help=f"Parse workers for large trees (0 = all CPUs, default: ${JOBS_ENV} or 1)",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help=f"Add per-phase timings and counters to the output (or set ${PROFILE_ENV}=1)",
+    )
     subparsers = parser.add_subparsers(dest="command", required=True)
+    if_updated_help = "Only apply if the task's updated timestamp is still TS"
 
     # init
     subparsers.add_parser("init", help="Create .claude/tasks/ directory")
@@ -540,10 +1133,15 @@ def main():
     update_parser.add_argument("--files", "-f", nargs="*", help="Relevant file paths")
     update_parser.add_argument("--status", "-s", choices=VALID_STATUSES, help="New status")
     update_parser.add_argument("--deps", nargs="*", help="Dependency task IDs")
+    update_parser.add_argument("--if-updated", metavar="TS", help=if_updated_help)
 
     # list
     list_parser = subparsers.add_parser("list", help="List tasks")
     list_parser.add_argument("--status", "-s", choices=VALID_STATUSES, help="Filter by status")
+    list_parser.add_argument(
+        "--include-archived", action="store_true", help="Also list archived tasks"
+    )
+    add_output_arguments(list_parser, TASK_FIELDS)
 
     # show
     show_parser = subparsers.add_parser("show", help="Show a task")
@@ -552,57 +1150,134 @@ def main():
     # next
     subparsers.add_parser("next", help="Get next available task")
 
+    # ready
+    ready_parser = subparsers.add_parser("ready", help="Claim ready tasks for parallel workers")
+    ready_parser.add_argument(
+        "--workers", "-w", type=int, default=1, help="Number of tasks to claim (default: 1)"
+    )
+    ready_parser.add_argument(
+        "--no-claim", action="store_true", help="Only report the tasks, leave them pending"
+    )
+
+    # graph
+    subparsers.add_parser("graph", help="Dependency cycles, order and critical path")
+
+    # progress
+    progress_parser = subparsers.add_parser(
+        "progress", help="Status counts and percent complete of a subtree"
+    )
+    progress_parser.add_argument("id", nargs="?", help="Task ID (omit for the whole tree)")
+
     # start
     start_parser = subparsers.add_parser("start", help="Start a task")
     start_parser.add_argument("id", help="Task ID")
+    start_parser.add_argument("--if-updated", metavar="TS", help=if_updated_help)
 
     # done
     done_parser = subparsers.add_parser("done", help="Mark task complete")
     done_parser.add_argument("id", nargs="?", help="Task ID (default: current in_progress)")
+    done_parser.add_argument("--if-updated", metavar="TS", help=if_updated_help)
 
     # block
     block_parser = subparsers.add_parser("block", help="Block a task")
     block_parser.add_argument("id", help="Task ID")
     block_parser.add_argument("--reason", "-r", help="Reason for blocking")
+    block_parser.add_argument("--if-updated", metavar="TS", help=if_updated_help)
 
     # unblock
     unblock_parser = subparsers.add_parser("unblock", help="Unblock a task")
     unblock_parser.add_argument("id", help="Task ID")
+    unblock_parser.add_argument("--if-updated", metavar="TS", help=if_updated_help)
 
     # note
     note_parser = subparsers.add_parser("note", help="Add a note to a task")
     note_parser.add_argument("id", help="Task ID")
     note_parser.add_argument("text", help="Note text")
+    note_parser.add_argument("--if-updated", metavar="TS", help=if_updated_help)
 
     # notes
-    subparsers.add_parser("notes", help="List all notes chronologically")
+    notes_parser = subparsers.add_parser("notes", help="List all notes chronologically")
+    notes_parser.add_argument(
+        "--include-archived", action="store_true", help="Also list notes of archived tasks"
+    )
+    notes_parser.add_argument("--since", metavar="TS", help="Only notes created at or after TS")
+    notes_parser.add_argument("--until", metavar="TS", help="Only notes created at or before TS")
+    notes_parser.add_argument("--tail", type=int, metavar="N", help="Only the last N notes")
+    notes_parser.add_argument(
+        "--task", "-t", nargs="+", metavar="ID", help="Only notes of these tasks and their subtasks"
+    )
+    add_output_arguments(notes_parser, NOTE_FIELDS)
+
+    # search
+    search_parser = subparsers.add_parser("search", help="Search tasks and notes")
+    search_parser.add_argument("query", nargs="+", help="Words to match (word* for a prefix)")
+    search_parser.add_argument(
+        "--field", "-F", nargs="+", choices=SEARCH_FIELDS, help="Only match in these fields"
+    )
+    search_parser.add_argument(
+        "--since", metavar="TS",
+        help="Only notes created, or other fields of tasks updated, at or after TS",
+    )
+    search_parser.add_argument("--status", "-s", choices=VALID_STATUSES, help="Filter by status")
+    search_parser.add_argument(
+        "--limit", "-n", type=int, default=20, help="Most results to return (default: 20)"
+    )
+
+    # changes
+    changes_parser = subparsers.add_parser(
+        "changes", help="Tasks, notes, removals and moves since a time or cursor"
+    )
+    changes_parser.add_argument(
+        "--since", metavar="TS|CURSOR",
+        help="ISO8601 timestamp, or the cursor from the last call (omit for everything)",
+    )
 
     # move
     move_parser = subparsers.add_parser("move", help="Move a task")
     move_parser.add_argument("id", help="Task ID to move")
     move_parser.add_argument("--parent", "-p", help="New parent task ID (omit for top-level)")
 
-    args = parser.parse_args()
+    # batch
+    batch_parser = subparsers.add_parser("batch", help="Apply JSONL operations from stdin")
+    batch_parser.set_defaults(ops=sys.stdin)
 
-    commands = {
-        "init": cmd_init,
-        "add": cmd_add,
-        "remove": cmd_remove,
-        "update": cmd_update,
-        "list": cmd_list,
-        "show": cmd_show,
-        "next": cmd_next,
-        "start": cmd_start,
-        "done": cmd_done,
-        "block": cmd_block,
-        "unblock": cmd_unblock,
-        "note": cmd_note,
-        "notes": cmd_notes,
-        "move": cmd_move,
-    }
+    # archive
+    archive_parser = subparsers.add_parser(
+        "archive", help="Move finished subtrees into .claude/tasks/.archive"
+    )
+    archive_parser.add_argument("id", nargs="?", help="Only archive within this task")
+
+    # reindex
+    subparsers.add_parser("reindex", help="Rebuild the task index cache")
+
+    # export
+    export_parser = subparsers.add_parser("export", help="Copy tasks to another storage backend")
+    export_parser.add_argument(
+        "--to", required=True, choices=BACKENDS,
+        help=f"Backend to copy into (the one in use is ${BACKEND_ENV}, else sqlite if it exists)",
+    )
+
+    # serve
+    serve_parser = subparsers.add_parser("serve", help="Serve commands over a Unix socket")
+    serve_parser.add_argument(
+        "--idle-timeout", type=float, default=1800,
+        help="Exit after this many idle seconds (0 = never, default: 1800)",
+    )
+
+    args = parser.parse_args()
+    if args.jobs is not None:
+        os.environ[JOBS_ENV] = str(args.jobs)  # Read by every walk_tasks call
 
     try:
-        commands[args.command](args)
+        result = forward_to_server(args)
+        if result is None:
+            if args.command == "serve":
+                result = cmd_serve(args)
+            else:
+                result = run_command(args.command, args)
+        output_success(result)
+    except BatchError as e:
+        output_error(str(e), results=e.results, applied=len(e.results))
     except TaskError as e:
         output_error(str(e))
 
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Archive segments for finished subtrees.
+
+`task.py archive` moves subtrees whose tasks are all complete or wont_do out
+of the store and into .claude/tasks/.archive/:
+
+- <time>-<pid>.jsonl.gz: one segment per run, one task record per line
+  (see task_fs.task_to_record); never changed once written
+- index.json: task ID -> {"segment", "status", "updated"} for every
+  archived task
+
+A segment and the index are written before the tasks leave the tree. A run
+cut short in between leaves them in both; the next run only removes the
+ones still as they were archived (see Archive.holds).
+
+Walks of the tree never see archived tasks. They stay resolvable: as deps
+(TaskGraph.status falls back to the archive), for `show`, and for
+`list`/`notes --include-archived`. New tasks never reuse an archived ID.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterator
+
+from task_fs import (
+    ARCHIVE_DIR,
+    Task,
+    prefix_after,
+    task_from_record,
+    task_to_record,
+)
+from task_profile import count, phase
+from task_store import TaskStore, sort_key
+
+ARCHIVE_INDEX = "index.json"
+ARCHIVE_VERSION = 1
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+# Statuses a task can be archived in
+DONE_STATUSES = ("complete", "wont_do")
+
+# Indexes already read by this process: path -> ((mtime_ns, size), entries)
+_loaded: dict[Path, tuple[tuple[int, int], dict[str, dict]]] = {}
+
+
+class Archive:
+    """The archived tasks of one tasks root."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.dir = root / ARCHIVE_DIR
+        self._index: dict[str, dict] | None = None
+
+    @property
+    def index(self) -> dict[str, dict]:
+        """Task ID -> {"segment", "status", "updated"}; empty without an archive."""
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _load_index(self) -> dict[str, dict]:
+        path = self.dir / ARCHIVE_INDEX
+        try:
+            stat = path.stat()
+            key = (stat.st_mtime_ns, stat.st_size)
+            if path in _loaded and _loaded[path][0] == key:
+                return _loaded[path][1]
+            with phase("index"):
+                data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != ARCHIVE_VERSION:
+            return {}
+        _loaded[path] = (key, data["tasks"])
+        return data["tasks"]
+
+    def status(self, task_id: str) -> str | None:
+        """An archived task's status, or None if it is not archived."""
+        entry = self.index.get(task_id)
+        return entry["status"] if entry else None
+
+    def holds(self, task: Task) -> bool:
+        """Whether task is archived as it is now, so archiving it again can be skipped."""
+        entry = self.index.get(task.id)
+        return entry is not None and entry.get("updated") == task.updated
+
+    def next_prefix(self, parent_id: str = "") -> str:
+        """The NN- prefix after those of parent_id's archived children."""
+        return prefix_after(
+            task_id.rpartition("/")[2]
+            for task_id in self.index
+            if task_id.rpartition("/")[0] == parent_id
+        )
+
+    def _read_segment(self, segment: str) -> list[dict]:
+        with phase("parse"):
+            with gzip.open(self.dir / segment, "rt") as f:
+                records = [json.loads(line) for line in f]
+        count("files_read")
+        return records
+
+    def load(self, task_id: str) -> Task | None:
+        """Read one archived task, or None if it is not archived."""
+        entry = self.index.get(task_id)
+        if entry is None:
+            return None
+        for record in self._read_segment(entry["segment"]):
+            if record["id"] == task_id:
+                task = task_from_record(record, self.dir / entry["segment"])
+                task.children = self._children(task_id)
+                return task
+        return None
+
+    def _children(self, task_id: str) -> list[str]:
+        return sorted(
+            (t for t in self.index if t.rpartition("/")[0] == task_id), key=sort_key
+        )
+
+    def walk(self, status: str | None = None) -> Iterator[tuple[str, Task]]:
+        """Yield (id, Task) for archived tasks, in depth-first order."""
+        wanted = {
+            task_id: entry for task_id, entry in self.index.items()
+            if status is None or entry["status"] == status
+        }
+        tasks: dict[str, Task] = {}
+        for segment in sorted({entry["segment"] for entry in wanted.values()}):
+            for record in self._read_segment(segment):
+                entry = wanted.get(record["id"])
+                if entry is not None and entry["segment"] == segment:
+                    tasks[record["id"]] = task_from_record(record, self.dir / segment)
+        children: dict[str, list[str]] = {}
+        for task_id in sorted(self.index, key=sort_key):
+            children.setdefault(task_id.rpartition("/")[0], []).append(task_id)
+        for task_id in sorted(tasks, key=sort_key):
+            tasks[task_id].children = children.get(task_id, [])
+            yield task_id, tasks[task_id]
+
+    def add(self, tasks: list[Task]) -> str:
+        """Write tasks to a new segment and index them. Returns its name."""
+        self.dir.mkdir(exist_ok=True)
+        segment = time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + f"-{os.getpid()}"
+        segment += SEGMENT_SUFFIX
+        path = self.dir / segment
+        tmp_path = self.dir / f".{segment}.tmp"
+        with phase("write"):
+            with open(tmp_path, "wb") as raw:
+                with gzip.open(raw, "wt") as f:
+                    for task in tasks:
+                        f.write(json.dumps(task_to_record(task)) + "\n")
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp_path, path)
+            count("fsyncs")
+            count("files_written")
+
+            entries = dict(self.index)
+            for task in tasks:
+                entries[task.id] = {
+                    "segment": segment, "status": task.status, "updated": task.updated,
+                }
+            index_path = self.dir / ARCHIVE_INDEX
+            tmp_path = self.dir / f".{ARCHIVE_INDEX}.tmp"
+            tmp_path.write_text(json.dumps({"version": ARCHIVE_VERSION, "tasks": entries}))
+            os.replace(tmp_path, index_path)
+            count("files_written")
+        self._index = entries
+        return segment
+
+
+def archivable(store: TaskStore, within: str | None = None) -> list[str]:
+    """
+    Roots of the largest subtrees whose tasks are all complete or wont_do.
+
+    With within, only subtrees inside that task (which may be one itself).
+    """
+    tasks = list(store.walk(fields=("status", "children")))
+    done: dict[str, bool] = {}
+    for task_id, task in reversed(tasks):  # Children before their parents
+        done[task_id] = task.status in DONE_STATUSES and all(
+            done.get(child_id, False) for child_id in task.children
+        )
+    roots = []
+    for task_id, _ in tasks:
+        if not done[task_id]:
+            continue
+        if within is not None and not (
+            task_id == within or task_id.startswith(f"{within}/")
+        ):
+            continue
+        parent_id = task_id.rpartition("/")[0]
+        if task_id == within or not done.get(parent_id, False):
+            roots.append(task_id)
+    return roots
@@ -12,37 +12,67 @@ No external dependencies - uses simple custom frontmatter parser.
 
 from __future__ import annotations
 
+import fcntl
+import json
+import os
 import re
 import shutil
-from dataclasses import dataclass, field
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from dataclasses import fields as dataclass_fields
 from datetime import datetime, timezone
+from itertools import repeat
 from pathlib import Path
-from typing import Iterator
+from typing import Collection, Iterable, Iterator
+
+from task_profile import count, phase, profiling
 
 # Constants
 TASKS_DIR = ".claude/tasks"
 INDEX_FILE = "00-index.md"
+TASK_INDEX_FILE = ".index"  # Parse cache, keyed by path + mtime + size
+TASK_INDEX_VERSION = 1
+SERVER_SOCKET = ".server.sock"  # Unix socket for `task.py serve`
+JOURNAL_FILE = ".journal"  # .journal.<pid>: a commit in progress, see flush_writes()
+JOURNAL_VERSION = 1
+LOCKS_DIR = ".locks"  # Advisory lock files, see lock_tree() and lock_task()
+TREE_LOCK = "tree.lock"
+LOCK_BUCKETS = 256  # Task and rollup lock files, shared by the paths that hash alike
+STORE_DB = ".tasks.db"  # SQLite backend, see task_store.SqliteStore
+CHANGE_LOG = ".changes"  # Removals and moves, as JSON lines, for `task.py changes`
+ARCHIVE_DIR = ".archive"  # Archived subtrees, see task_archive
+ROLLUP_FILE = ".rollup"  # Status rollups of a directory's children, see TaskStore.rollup()
 VALID_STATUSES = ("pending", "in_progress", "blocked", "complete", "wont_do")
 
+# Task fields stored in the body, after the H1 title. Everything else can be
+# read from the frontmatter and title alone (see parse_task(header_only=True)).
+BODY_FIELDS = frozenset({"description", "notes"})
+
 
 # =============================================================================
 # Data Classes
 # =============================================================================
 
 
-@dataclass
+# Slotted, so a tree of tasks held in memory (say, by `task.py serve`) costs
+# no per-instance dicts. Timestamps left empty are filled in by
+# stamp_new_task() when the task is rendered or saved, not on every
+# construction.
+
+
+@dataclass(slots=True)
 class Note:
     """A timestamped note attached to a task."""
 
     text: str
     created: str = ""
 
-    def __post_init__(self):
-        if not self.created:
-            self.created = now_iso()
 
-
-@dataclass
+@dataclass(slots=True)
 class Task:
     """A task with metadata and optional children."""
 
@@ -62,11 +92,91 @@ class Task:
     blocked_reason: str = ""
     children: list[str] = field(default_factory=list)  # Populated when walking
 
-    def __post_init__(self):
-        if not self.created:
-            self.created = now_iso()
-        if not self.updated:
-            self.updated = now_iso()
+
+class _BodyField:
+    """
+    A LazyTask body field, read on first access (see LazyTask._read_body).
+
+    The value lives in Task's slot for the field; an empty slot means it
+    has not been read yet.
+    """
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+        self.slot = Task.__dict__[name]
+
+    def __get__(self, task, owner=None):
+        if task is None:
+            return self
+        if not self.loaded(task):
+            task.description, task.notes = task._read_body()
+        return self.slot.__get__(task, owner)
+
+    def __set__(self, task, value):
+        self.slot.__set__(task, value)
+
+    def __delete__(self, task):
+        self.slot.__delete__(task)
+
+    def loaded(self, task) -> bool:
+        try:
+            self.slot.__get__(task)
+        except AttributeError:
+            return False
+        return True
+
+
+class LazyTask(Task):
+    """
+    A Task parsed from its header only.
+
+    The description and notes are read from the file on first access.
+    Compares equal to a Task with the same fields.
+    """
+
+    __slots__ = ("_path",)
+
+    description = _BodyField()
+    notes = _BodyField()
+
+    def __init__(self, path: Path, **kwargs):
+        super().__init__(**kwargs)
+        self._path = path
+        # Drop the defaults set by Task.__init__ so the body loads on access
+        for name in BODY_FIELDS:
+            delattr(self, name)
+
+    def _read_body(self) -> tuple[str, list[Note]]:
+        """Read the description and notes from the task file."""
+        _, _, description, notes = tokenize_task(read_task_text(self._path), self._path)
+        return description, notes
+
+    def __eq__(self, other):
+        if not isinstance(other, Task):
+            return NotImplemented
+        return all(
+            getattr(self, f.name) == getattr(other, f.name)
+            for f in dataclass_fields(Task)
+        )
+
+
+def body_loaded(task: Task, name: str) -> bool:
+    """Whether a field has been read: False only for a LazyTask's unread body."""
+    body_field = getattr(type(task), name)
+    return not isinstance(body_field, _BodyField) or body_field.loaded(task)
+
+
+def stamp_new_task(task: Task) -> None:
+    """Fill in the timestamps a new task (or note) was made without."""
+    if task.created and task.updated and not (
+        body_loaded(task, "notes") and any(not note.created for note in task.notes)
+    ):
+        return
+    now = now_iso()
+    task.created = task.created or now
+    task.updated = task.updated or now
+    for note in task.notes:
+        note.created = note.created or now
 
 
 # =============================================================================
@@ -79,11 +189,39 @@ def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def parse_timestamp(value: str) -> str:
+    """
+    Normalize an ISO8601 timestamp (or date) from the command line.
+
+    Naive values are taken as UTC. The result compares as a string against
+    the timestamps now_iso() writes.
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise TaskError(f"Invalid timestamp: {value} (expected ISO8601)")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
 # =============================================================================
 # Simple Frontmatter Parser (no PyYAML dependency)
 # =============================================================================
 
 
+# Patterns are compiled once; the tokenizer only ever scans forward.
+_FRONTMATTER_RE = re.compile(r"---\n(.+?)\n---\n", re.DOTALL)
+_KEY_RE = re.compile(r"([a-z_]+):\s*(.*)")
+_KEY_START_RE = re.compile(r"[a-z_]+:")
+_ITEM_RE = re.compile(r"  - (.+)")
+_TITLE_RE = re.compile(r"# (.+)")
+_SECTION_RE = re.compile(r"^## ", re.MULTILINE)
+_NOTES_HEADER = "## Notes\n"
+_UPDATED_RE = re.compile(r"^updated:[^\n]*", re.MULTILINE)
+_NOTE_RE = re.compile(r"### (\d{4}-\d{2}-\d{2}T[^\n]+)\n\n(.*?)(?=\n### |\Z)", re.DOTALL)
+
+
 def parse_frontmatter(text: str) -> dict:
     """
     Parse simple YAML-like frontmatter.
@@ -93,21 +231,30 @@ def parse_frontmatter(text: str) -> dict:
     - key: (followed by indented list items starting with -)
     """
     result = {}
-    lines = text.strip().split("\n")
-    i = 0
-
-    while i < len(lines):
-        line = lines[i]
+    list_key = None  # Key whose "  - item" lines are being collected
+    matches = 0  # Regex calls, for the profile
+
+    for line in text.strip().split("\n"):
+        if list_key is not None:
+            matches += 1
+            item = _ITEM_RE.match(line)
+            if item:
+                result[list_key].append(item.group(1).strip())
+                continue
+            if line.strip():
+                matches += 1
+                if not _KEY_START_RE.match(line):
+                    continue  # Stray line inside a list
+            list_key = None  # Blank line or next key ends the list
 
         # Skip empty lines
         if not line.strip():
-            i += 1
             continue
 
         # Match key: value or key:
-        match = re.match(r'^([a-z_]+):\s*(.*)$', line)
+        matches += 1
+        match = _KEY_RE.match(line)
         if not match:
-            i += 1
             continue
 
         key = match.group(1)
@@ -120,24 +267,11 @@ def parse_frontmatter(text: str) -> dict:
                 value = value[1:-1]
             result[key] = value
         else:
-            # Check for list on following lines
-            items = []
-            i += 1
-            while i < len(lines):
-                next_line = lines[i]
-                list_match = re.match(r'^  - (.+)$', next_line)
-                if list_match:
-                    items.append(list_match.group(1).strip())
-                    i += 1
-                elif next_line.strip() == "" or re.match(r'^[a-z_]+:', next_line):
-                    break
-                else:
-                    i += 1
-            result[key] = items
-            continue
-
-        i += 1
+            # List on following lines
+            result[key] = []
+            list_key = key
 
+    count("regex_calls", matches)
     return result
 
 
@@ -171,17 +305,18 @@ def render_frontmatter(data: dict) -> str:
 
 def find_tasks_root() -> Path | None:
     """Walk up directories to find .claude/tasks/."""
-    current = Path.cwd()
-    while current != current.parent:
+    with phase("discover"):
+        current = Path.cwd()
+        while current != current.parent:
+            candidate = current / TASKS_DIR
+            if candidate.is_dir():
+                return candidate
+            current = current.parent
+        # Check root
         candidate = current / TASKS_DIR
         if candidate.is_dir():
             return candidate
-        current = current.parent
-    # Check root
-    candidate = current / TASKS_DIR
-    if candidate.is_dir():
-        return candidate
-    return None
+        return None
 
 
 def require_tasks_root() -> Path:
@@ -212,12 +347,13 @@ def next_prefix(directory: Path) -> str:
     """Return next NN- prefix for a directory."""
     if not directory.exists():
         return "01"
+    return prefix_after(item.name for item in directory.iterdir() if item.name != INDEX_FILE)
 
+
+def prefix_after(names: Iterable[str]) -> str:
+    """Return the NN- prefix that follows the highest one among sibling names."""
     existing = []
-    for item in directory.iterdir():
-        name = item.name
-        if name == INDEX_FILE:
-            continue
+    for name in names:
         match = re.match(r"^(\d+)-", name)
         if match:
             existing.append(int(match.group(1)))
@@ -262,68 +398,129 @@ def get_task_id(path: Path, root: Path) -> str:
         return str(rel).removesuffix(".md")
 
 
-def is_leaf(task_id: str, root: Path | None = None) -> bool:
-    """Check if task is a leaf (file) vs parent (directory)."""
-    if root is None:
-        root = require_tasks_root()
-    file_path = root / f"{task_id}.md"
-    return file_path.exists()
-
-
 # =============================================================================
 # Markdown Parser
 # =============================================================================
 
 
-def parse_task(path: Path, root: Path | None = None) -> Task:
-    """Parse markdown file into Task object."""
-    if root is None:
-        root = require_tasks_root()
-
-    content = path.read_text()
+def tokenize_task(content: str, path: Path) -> tuple[dict, str, str, list[Note]]:
+    """
+    Split task file text into (frontmatter, title, description, notes).
 
-    # Split frontmatter and body
-    match = re.match(r"^---\n(.+?)\n---\n(.*)$", content, re.DOTALL)
+    One forward scan: the frontmatter, the title line, the description up
+    to the first ## section, then each ### timestamp note block.
+    """
+    match = _FRONTMATTER_RE.match(content)
     if not match:
         raise TaskError(f"Invalid task format (no frontmatter): {path}")
 
     frontmatter = parse_frontmatter(match.group(1))
-    body = match.group(2).strip()
+    body = content[match.end():].strip()
 
-    # Parse title from H1
-    title_match = re.match(r"^# (.+)$", body, re.MULTILINE)
+    # Title from the H1 on the first body line
+    title_match = _TITLE_RE.match(body)
     title = title_match.group(1) if title_match else path.stem
 
-    # Parse description (everything between title and ## Notes or ## sections)
-    desc_match = re.search(r"^# .+\n\n(.+?)(?=\n## |\Z)", body, re.DOTALL)
-    description = desc_match.group(1).strip() if desc_match else ""
+    # Description: everything between the title line and the first ## section
+    description = ""
+    if body.startswith("# "):
+        start = body.find("\n") + 1 or len(body)
+        section = _SECTION_RE.search(body, start)
+        description = body[start:section.start() if section else len(body)].strip()
 
-    # Parse notes from ## Notes section
+    # Notes: ### timestamp blocks after the ## Notes header. The header is
+    # normally right after the description, so this find is short.
     notes = []
-    notes_match = re.search(r"## Notes\n(.+)$", body, re.DOTALL)
-    if notes_match:
-        # Find all ### timestamp headers followed by content
-        note_pattern = r"### (\d{4}-\d{2}-\d{2}T[^\n]+)\n\n(.*?)(?=\n### |\Z)"
-        note_blocks = re.findall(note_pattern, notes_match.group(1), re.DOTALL)
-        for timestamp, text in note_blocks:
+    notes_start = body.find(_NOTES_HEADER)
+    if notes_start != -1:
+        notes_start += len(_NOTES_HEADER)
+        for timestamp, text in _NOTE_RE.findall(body, notes_start):
             notes.append(Note(text=text.strip(), created=timestamp))
+        count("regex_calls")
 
-    return Task(
-        id=get_task_id(path, root),
-        title=title,
-        status=frontmatter.get("status", "pending"),
-        description=description,
-        deps=frontmatter.get("deps", []),
-        approach=frontmatter.get("approach", ""),
-        criteria=frontmatter.get("criteria", []),
-        files=frontmatter.get("files", []),
-        notes=notes,
-        created=frontmatter.get("created", ""),
-        updated=frontmatter.get("updated", ""),
-        started=frontmatter.get("started", ""),
-        completed=frontmatter.get("completed", ""),
-        blocked_reason=frontmatter.get("blocked_reason", ""),
-    )
+    # Frontmatter, title and section searches
+    count("regex_calls", 2 + body.startswith("# "))
+    return frontmatter, title, description, notes
+
+
+def read_body(task: Task) -> None:
+    """Make a LazyTask read its description and notes now (no-op for a Task)."""
+    task.notes  # noqa: B018 - attribute access triggers the load
+
+
+def read_task_header(path: Path) -> tuple[dict, str]:
+    """
+    Read (frontmatter, title) without reading the rest of the file.
+
+    Stops at the first line after the frontmatter, which is the H1 title
+    in any file written by render_task.
+    """
+    with path.open() as f:
+        if f.readline() != "---\n":
+            raise TaskError(f"Invalid task format (no frontmatter): {path}")
+        lines = []
+        for line in f:
+            if line == "---\n" and lines:
+                break
+            lines.append(line)
+        else:
+            raise TaskError(f"Invalid task format (no frontmatter): {path}")
+
+        title = path.stem
+        for line in f:
+            if line.strip():
+                count("regex_calls")
+                title_match = _TITLE_RE.match(line.lstrip())
+                if title_match:
+                    title = title_match.group(1)
+                break
+
+    count("files_read")
+    if profiling():
+        count("bytes_read", len("".join(lines).encode()) + 4)
+    return parse_frontmatter("".join(lines).removesuffix("\n")), title
+
+
+def parse_task(path: Path, root: Path | None = None, header_only: bool = False) -> Task:
+    """
+    Parse markdown file into Task object.
+
+    With header_only=True, only the frontmatter and title are read; the
+    returned LazyTask reads its description and notes on first access.
+    """
+    if root is None:
+        root = require_tasks_root()
+
+    with phase("parse"):
+        task_id = get_task_id(path, root)
+        if header_only and not (_write_buffer and path in _write_buffer):
+            frontmatter, title = read_task_header(path)
+            return LazyTask(path, **task_fields(task_id, title, frontmatter))
+
+        frontmatter, title, description, notes = tokenize_task(read_task_text(path), path)
+        return Task(
+            **task_fields(task_id, title, frontmatter),
+            description=description,
+            notes=notes,
+        )
+
+
+def task_fields(task_id: str, title: str, frontmatter: dict) -> dict:
+    """Task constructor arguments for the header fields."""
+    return {
+        "id": task_id,
+        "title": title,
+        "status": sys.intern(frontmatter.get("status", "pending")),
+        "deps": frontmatter.get("deps", []),
+        "approach": frontmatter.get("approach", ""),
+        "criteria": frontmatter.get("criteria", []),
+        "files": frontmatter.get("files", []),
+        "created": frontmatter.get("created", ""),
+        "updated": frontmatter.get("updated", ""),
+        "started": frontmatter.get("started", ""),
+        "completed": frontmatter.get("completed", ""),
+        "blocked_reason": frontmatter.get("blocked_reason", ""),
+    }
 
 
 # =============================================================================
@@ -332,12 +529,13 @@ def parse_task(path: Path, root: Path | None = None) -> Task:
 
 
 def render_task(task: Task) -> str:
-    """Render Task object to markdown string."""
+    """Render Task object to markdown string (stamping it first, if new)."""
+    stamp_new_task(task)
     # Build frontmatter dict - order matters for readability
     frontmatter: dict = {
         "status": task.status,
-        "created": task.created or now_iso(),
-        "updated": task.updated or now_iso(),
+        "created": task.created,
+        "updated": task.updated,
     }
 
     if task.started:
@@ -375,57 +573,718 @@ def render_task(task: Task) -> str:
 
 
 # =============================================================================
-# Task Walking
+# Task Writing
 # =============================================================================
 
+# Pending rewrites of existing task files, or None when writes go straight
+# to disk. See buffered_writes().
+_write_buffer: dict[Path, str] | None = None
 
-def walk_tasks(
-    root: Path | None = None, depth_first: bool = True
-) -> Iterator[tuple[str, Task]]:
+# Buffered files whose only change is appended notes (see append_note): path
+# -> original size, offset and text of the updated: line, and appended text.
+# They are committed in place instead of rewritten.
+_appends: dict[Path, dict] = {}
+
+# Note counts of buffered files after their last append_note, so further
+# appends in the same commit count on instead of re-scanning the text
+_note_counts: dict[Path, int] = {}
+
+
+def read_task_text(path: Path) -> str:
+    """Read a task file, preferring a pending buffered write."""
+    if _write_buffer is not None and path in _write_buffer:
+        return _write_buffer[path]
+    text = path.read_text()
+    count("files_read")
+    if profiling():
+        count("bytes_read", len(text.encode()))
+    return text
+
+
+def write_task(path: Path, task: Task) -> None:
     """
-    Walk directory tree, yielding (id, Task) tuples.
+    Render a task to path.
 
-    Args:
-        root: Tasks root directory. If None, finds it automatically.
-        depth_first: If True, yield children before siblings.
+    Rewrites of existing files are staged and committed together when the
+    enclosing buffered_writes() exits (or right away, outside one). New
+    files are written immediately, so prefixes and ID lookups see them.
+    """
+    if _write_buffer is None:
+        with buffered_writes():
+            return write_task(path, task)
+    with phase("render"):
+        text = render_task(task)
+    stage_write(path, text)
+
+
+def stage_write(path: Path, text: str) -> None:
+    """
+    Write a file as part of the current commit, like write_task().
+
+    Read it back with read_task_text(), which sees the staged text.
+    """
+    if _write_buffer is None:
+        replace_file(path, text)
+    elif path.exists():
+        _write_buffer[path] = text
+        _appends.pop(path, None)
+        _note_counts.pop(path, None)
+    else:
+        replace_file(path, text)
+
+
+def append_note(path: Path, note: Note, updated: str) -> int | None:
+    """
+    Add a note to a task file without re-rendering it.
+
+    Appends the ### block to the end of the file and patches the updated:
+    frontmatter line in place, which gives the same text render_task would.
+    Returns the new note count, or None if the file has no ## Notes section
+    or its updated: line cannot be patched to the same length; the caller
+    should then render the whole task instead.
+
+    Only the write is constant-size. The first append to a file in a
+    commit still reads the whole file and counts its notes, so over a
+    session the bytes read grow quadratically with the number of notes.
+    Later appends in the same commit (a batch) count on from there.
+    """
+    if _write_buffer is None:
+        with buffered_writes():
+            return append_note(path, note, updated)
+    buffered = path in _write_buffer
+    if buffered:
+        content = _write_buffer[path]
+    else:
+        raw = path.read_bytes()
+        content = raw.decode()
+        count("files_read")
+        if profiling():
+            count("bytes_read", len(raw))
+
+    match = _FRONTMATTER_RE.match(content)
+    if not match:
+        return None
+    notes_start = content.find(_NOTES_HEADER, match.end())
+    updated_match = _UPDATED_RE.search(content, 0, match.end())
+    if notes_start == -1 or updated_match is None:
+        return None
+    line = render_frontmatter({"updated": updated})
+    if len(line) != len(updated_match.group()):
+        return None
+
+    block = f"\n### {note.created}\n\n{note.text}\n"
+    if not content.endswith("\n"):
+        block = "\n" + block
+    text = (
+        content[:updated_match.start()] + line + content[updated_match.end():] + block
+    )
+    if not buffered:
+        _appends[path] = {
+            "size": len(raw),
+            "offset": len(content[:updated_match.start()].encode()),
+            "patch": line,
+            "append": block,
+        }
+    elif path in _appends:
+        _appends[path]["patch"] = line
+        _appends[path]["append"] += block
+    _write_buffer[path] = text
+
+    # Count as parse_task would, on the stripped body: the notes in the new
+    # block (its text may hold ### lines) on top of the known count, or all
+    if path in _note_counts:
+        count_from = len(text) - len(block.lstrip("\n"))
+    else:
+        count_from = notes_start + len(_NOTES_HEADER)
+    added = len(_NOTE_RE.findall(text, count_from, len(text.rstrip())))
+    _note_counts[path] = _note_counts.get(path, 0) + added
+    return _note_counts[path]
+
+
+def replace_file(path: Path, text: str) -> None:
+    """Write a file atomically: write a hidden temp file, then rename it."""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+    count("files_written")
+    if profiling():
+        count("bytes_written", len(text.encode()))
+
+
+def apply_write(path: Path, write: dict) -> None:
+    """
+    Apply one staged write (see flush_writes). Safe to repeat.
+
+    {"text": ...} replaces the file. {"size", "offset", "patch", "append"}
+    truncates it to its original size, patches the updated: line and
+    appends the new notes.
+    """
+    if "text" in write:
+        replace_file(path, write["text"])
+        return
+    with path.open("r+b") as f:
+        f.truncate(write["size"])
+        f.seek(write["offset"])
+        f.write(write["patch"].encode())
+        f.seek(write["size"])
+        appended = f.write(write["append"].encode())
+    count("files_written")
+    count("bytes_written", appended)
+
+
+def tasks_root_of(path: Path) -> Path | None:
+    """Return the tasks root containing path, if it is inside one."""
+    root_parts = Path(TASKS_DIR).parts
+    for parent in path.parents:
+        if parent.parts[-len(root_parts):] == root_parts:
+            return parent
+    return None
+
+
+def flush_writes() -> None:
+    """
+    Commit all buffered task files. Call before moving files around.
+
+    The staged writes go to a journal in the tasks root first, which is the
+    one fsync per commit; it only gets its final name once complete. Files
+    are then replaced by rename (or patched in place for appended notes)
+    and the journal is removed. If the process dies part way,
+    recover_writes() replays the journal.
     """
+    if not _write_buffer:
+        return
+    with phase("write"):
+        writes = {
+            path: _appends.get(path) or {"text": text}
+            for path, text in _write_buffer.items()
+        }
+        root = tasks_root_of(next(iter(writes)))
+        journal = root / f"{JOURNAL_FILE}.{os.getpid()}" if root else None
+        if journal is not None:
+            entries = [
+                {"path": str(path.relative_to(root)), **write}
+                for path, write in writes.items()
+            ]
+            tmp_path = journal.with_name(f"{journal.name}.tmp")
+            with tmp_path.open("w") as f:
+                json.dump({"version": JOURNAL_VERSION, "writes": entries}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            count("fsyncs")
+            os.replace(tmp_path, journal)
+
+        for path, write in writes.items():
+            apply_write(path, write)
+        if journal is not None:
+            journal.unlink()
+        _write_buffer.clear()
+        _appends.clear()
+        _note_counts.clear()
+
+
+def pending_journals(root: Path) -> list[Path]:
+    """Return journal files in root, complete or not, oldest first."""
+    journals = []
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.name.startswith(f"{JOURNAL_FILE}."):
+                try:
+                    journals.append((entry.stat().st_mtime_ns, Path(entry.path)))
+                except FileNotFoundError:
+                    pass  # Committed meanwhile
+    return [path for _, path in sorted(journals)]
+
+
+def read_journal(journal: Path) -> list[tuple[Path, dict]]:
+    """Return the (path, write) pairs of a complete journal."""
+    root = journal.parent
+    data = json.loads(journal.read_text())
+    return [(root / write.pop("path"), write) for write in data["writes"]]
+
+
+def recover_writes(root: Path, wait: bool = True) -> int:
+    """
+    Finish commits cut short by a crash. Returns the number replayed.
+
+    Runs under the exclusive tree lock, so every journal found belongs to a
+    dead process: complete ones are replayed, unfinished ones (.tmp, which
+    no file had been touched for) are discarded. With wait=False, gives up
+    instead of waiting for writers to finish.
+    """
+    if not pending_journals(root):
+        return 0
+
+    lock_path = root / LOCKS_DIR / TREE_LOCK
+    held = _held_locks.get(lock_path)
+    if held is not None and not held[1]:
+        raise RuntimeError("recover_writes() needs the tree lock exclusively")
+    fd = None
+    if held is None:
+        lock_path.parent.mkdir(exist_ok=True)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            return 0
+
+    replayed = 0
+    try:
+        for journal in pending_journals(root):
+            if journal.suffix != ".tmp":
+                try:
+                    writes = read_journal(journal)
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    writes = []  # Unreadable: nothing safe to replay
+                for path, write in writes:
+                    apply_write(path, write)
+                replayed += bool(writes)
+            journal.unlink()
+    finally:
+        if fd is not None:
+            os.close(fd)
+    return replayed
+
+
+@contextmanager
+def buffered_writes() -> Iterator[None]:
+    """Stage task writes and commit them together, on exit."""
+    global _write_buffer
+    if _write_buffer is not None:
+        yield  # Already buffering
+        return
+    _write_buffer = {}
+    try:
+        yield
+    finally:
+        try:
+            flush_writes()
+        finally:
+            _write_buffer = None
+            _appends.clear()
+            _note_counts.clear()
+            release_locks()
+
+
+# =============================================================================
+# Locking
+# =============================================================================
+
+# Advisory flock() locks held by this process until the enclosing
+# buffered_writes() commits: lock file -> (fd, exclusive). Lock files live
+# in root/.locks rather than on the task files, which every commit replaces.
+# Readers take no locks: they always see a whole file, old or new.
+_held_locks: dict[Path, tuple[int, bool]] = {}
+
+
+def _lock(lock_path: Path, exclusive: bool) -> int:
+    """Take (or upgrade) a lock until the current commit, returning its fd."""
+    held = _held_locks.get(lock_path)
+    if held is not None:
+        fd, was_exclusive = held
+        if exclusive and not was_exclusive:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            _held_locks[lock_path] = (fd, True)
+        return fd
+    if _write_buffer is None:
+        raise RuntimeError("Task locks can only be taken inside buffered_writes()")
+
+    lock_path.parent.mkdir(exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        with phase("lock"):  # Mostly waiting for other writers
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    except BaseException:
+        os.close(fd)
+        raise
+    _held_locks[lock_path] = (fd, exclusive)
+    return fd
+
+
+def bucket_lock_path(root: Path, kind: str, rel: str) -> Path:
+    """
+    The lock file for a path in the tree: one of LOCK_BUCKETS per kind.
+
+    A fixed set, so lock files do not pile up as tasks come and go. Paths
+    sharing a bucket only wait for each other: a writer holds at most one
+    task lock under the shared tree lock, and one rollup lock at a time.
+    """
+    bucket = zlib.crc32(rel.encode()) % LOCK_BUCKETS
+    return root / LOCKS_DIR / f"{kind}-{bucket:03}.lock"
+
+
+def lock_tree(root: Path, exclusive: bool = False) -> None:
+    """
+    Lock the task tree for writing until the current commit.
+
+    Shared for edits to existing tasks (which also lock_task() them),
+    exclusive for structural changes: add, move, remove, promote/demote.
+    A journal left by a crashed writer is replayed first.
+    """
+    lock_path = root / LOCKS_DIR / TREE_LOCK
+    if lock_path not in _held_locks and pending_journals(root):
+        fd = _lock(lock_path, exclusive=True)
+        recover_writes(root)
+        if not exclusive:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            _held_locks[lock_path] = (fd, False)
+        return
+    _lock(lock_path, exclusive)
+
+
+def lock_task(path: Path, root: Path) -> None:
+    """
+    Lock one task file for a read-modify-write until the current commit.
+
+    Call after lock_tree(), and read the task only once this returns.
+    """
+    rel = str(path.relative_to(root))
+    _lock(bucket_lock_path(root, "task", rel), exclusive=True)
+
+    # A writer that crashed after lock_tree() ran may have left a journal
+    # touching this task; replaying it later would undo our write.
+    for journal in pending_journals(root):
+        try:
+            paths = [p for p, _ in read_journal(journal)]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            continue  # Gone (committed) or unfinished
+        if path in paths:
+            raise TaskError(
+                f"Interrupted commit pending for {rel}; run the command again to recover"
+            )
+
+
+@contextmanager
+def rollup_lock(root: Path, parent_id: str) -> Iterator[None]:
+    """
+    Lock one directory's .rollup file while it is read and rewritten.
+
+    Unlike the other locks, held only for that and not until the commit:
+    writers of different tasks share the rollups of their common ancestors.
+    """
+    lock_path = bucket_lock_path(root, "rollup", parent_id)
+    lock_path.parent.mkdir(exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        with phase("lock"):
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def release_locks() -> None:
+    """Release every lock taken since the current commit began."""
+    for fd, _ in _held_locks.values():
+        os.close(fd)  # Closing the last descriptor releases the flock
+    _held_locks.clear()
+
+
+# =============================================================================
+# Task Index
+# =============================================================================
+
+# Files modified this recently are not cached: a second write within the
+# filesystem's timestamp granularity could keep the same mtime and size.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def task_to_record(task: Task) -> dict:
+    """
+    Convert Task to a plain dict for the index.
+
+    Body fields a LazyTask has not read yet are left out.
+    """
+    record = {
+        f.name: getattr(task, f.name)
+        for f in dataclass_fields(Task)
+        # Children come from listing
+        if f.name != "children" and body_loaded(task, f.name)
+    }
+    if "notes" in record:
+        record["notes"] = [asdict(note) for note in record["notes"]]
+    return record
+
+
+def task_from_record(record: dict, path: Path) -> Task:
+    """Rebuild a Task from an index record (a LazyTask if it has no body)."""
+    record["status"] = sys.intern(record["status"])  # Once per cached record
+    if "notes" not in record:
+        return LazyTask(path, **record)
+    notes = [Note(**note) for note in record["notes"]]
+    return Task(**{**record, "notes": notes})
+
+
+# Indexes already loaded by this process, keyed by root: (mtime_ns, size) of
+# the index file and its entries. Long-lived processes skip the JSON decode.
+_loaded_indexes: dict[Path, tuple[tuple[int, int], dict[str, dict]]] = {}
+
+
+def load_task_index(root: Path) -> dict[str, dict]:
+    """
+    Load the parse cache from .claude/tasks/.index.
+
+    Returns a dict of relative path -> entry. A missing, unreadable, or
+    outdated index yields an empty dict, so callers fall back to parsing.
+    """
+    index_path = root / TASK_INDEX_FILE
+    try:
+        stat = index_path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+        if root in _loaded_indexes and _loaded_indexes[root][0] == key:
+            return _loaded_indexes[root][1]
+        with phase("index"):
+            data = json.loads(index_path.read_text())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != TASK_INDEX_VERSION:
+        return {}
+    entries = data.get("tasks", {})
+    _loaded_indexes[root] = (key, entries)
+    return entries
+
+
+def save_task_index(root: Path, entries: dict[str, dict]) -> None:
+    """Atomically write the parse cache. Failures are ignored."""
+    index_path = root / TASK_INDEX_FILE
+    tmp_path = index_path.with_name(f"{TASK_INDEX_FILE}.{os.getpid()}.tmp")
+    data = {"version": TASK_INDEX_VERSION, "tasks": entries}
+    try:
+        with phase("index"):
+            tmp_path.write_text(json.dumps(data, separators=(",", ":")))
+            os.replace(tmp_path, index_path)
+            stat = index_path.stat()
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        return
+    _loaded_indexes[root] = ((stat.st_mtime_ns, stat.st_size), entries)
+
+
+def rebuild_task_index(root: Path | None = None) -> int:
+    """Discard the parse cache and rebuild it. Returns the task count."""
     if root is None:
         root = require_tasks_root()
+    (root / TASK_INDEX_FILE).unlink(missing_ok=True)
+    return sum(1 for _ in walk_tasks(root))
+
+
+# =============================================================================
+# Task Walking
+# =============================================================================
+
+
+# Opt-in parallel parsing for large trees (walk_tasks(jobs=N) or $TASK_JOBS).
+# Below PARALLEL_MIN_FILES files to parse, the walk stays sequential. Up to
+# PROCESS_MIN_FILES it uses threads, which start instantly and overlap file
+# reads; beyond that, processes, since parsing itself holds the GIL.
+JOBS_ENV = "TASK_JOBS"
+PARALLEL_MIN_FILES = 256
+PROCESS_MIN_FILES = 4096
+
+
+def walk_jobs() -> int:
+    """Return the worker count from $TASK_JOBS (default 1, 0 = all CPUs)."""
+    value = os.environ.get(JOBS_ENV, "1")
+    try:
+        jobs = int(value)
+    except ValueError:
+        raise TaskError(f"{JOBS_ENV} must be an integer, got {value!r}") from None
+    return jobs if jobs > 0 else os.cpu_count() or 1
 
-    def walk_dir(directory: Path, prefix: str = "") -> Iterator[tuple[str, Task]]:
-        """Recursively walk a directory."""
-        items = sorted(directory.iterdir(), key=lambda p: p.name)
-
-        for item in items:
-            if item.name == INDEX_FILE:
-                continue  # Handle index separately
-
-            if item.is_dir():
-                # Parent task - yield index first, then children
-                index_path = item / INDEX_FILE
-                task_id = f"{prefix}{item.name}" if prefix else item.name
-
-                if index_path.exists():
-                    task = parse_task(index_path, root)
-                    # Populate children
-                    task.children = [
-                        f"{task_id}/{child.name}".removesuffix(".md")
-                        for child in sorted(item.iterdir())
-                        if child.name != INDEX_FILE
-                    ]
-                    yield task_id, task
+
+def parse_record(path: Path, root: Path, header_only: bool) -> dict:
+    """Parse a task file into an index record (picklable, for worker pools)."""
+    return task_to_record(parse_task(path, root, header_only))
+
+
+def parse_parallel(
+    paths: list[Path], root: Path, header_only: bool, jobs: int
+) -> dict[Path, dict]:
+    """
+    Parse files on a thread or process pool chosen by file count.
+
+    Returns index records keyed by path, or {} if the batch is too small to
+    be worth a pool (the caller then parses as it goes).
+    """
+    if jobs <= 1 or len(paths) < PARALLEL_MIN_FILES:
+        return {}
+    if len(paths) < PROCESS_MIN_FILES:
+        pool, chunksize = ThreadPoolExecutor(jobs), 1
+    else:
+        # Large chunks keep pickling overhead per file low
+        pool, chunksize = ProcessPoolExecutor(jobs), -(-len(paths) // (jobs * 4))
+    # Workers' own phases and counters are not recorded, only the total
+    count("files_parsed_parallel", len(paths))
+    with phase("parse_parallel"), pool:
+        records = pool.map(
+            parse_record, paths, repeat(root), repeat(header_only), chunksize=chunksize
+        )
+        return dict(zip(paths, records))
+
+
+def scan_dir(directory: str | Path) -> list[os.DirEntry]:
+    """List a directory once, sorted by name."""
+    count("dirs_listed")
+    with phase("list"), os.scandir(directory) as it:
+        return sorted(it, key=lambda e: e.name)
+
+
+def walk_entries(
+    root: Path, depth_first: bool = True
+) -> Iterator[tuple[str, os.DirEntry, list[str] | None]]:
+    """
+    List the task files under root in walk order, without reading them.
+
+    Yields (task_id, file entry, children); children is None for leaf
+    tasks. Each directory is listed once, and entry.stat() is cached on
+    the entry.
+    """
+
+    def walk_dir(
+        entries: list[os.DirEntry], prefix: str = ""
+    ) -> Iterator[tuple[str, os.DirEntry, list[str] | None]]:
+        for entry in entries:
+            name = entry.name
+            if name == INDEX_FILE or name.startswith("."):
+                continue  # Handle index separately, skip cache files
+
+            if entry.is_dir():
+                # Parent task - yield index first, then children. The one
+                # listing gives the index entry, children and recursion.
+                task_id = f"{prefix}{name}"
+                children = scan_dir(entry.path)
+
+                for child in children:
+                    if child.name == INDEX_FILE:
+                        yield task_id, child, [
+                            f"{task_id}/{c.name}".removesuffix(".md")
+                            for c in children
+                            if c.name != INDEX_FILE and not c.name.startswith(".")
+                        ]
+                        break
 
                 # Recurse into children
                 if depth_first:
-                    yield from walk_dir(item, f"{task_id}/")
+                    yield from walk_dir(children, f"{task_id}/")
 
-            elif item.suffix == ".md":
+            elif name.endswith(".md"):
                 # Leaf task
-                task_id = f"{prefix}{item.stem}" if prefix else item.stem
-                task = parse_task(item, root)
-                yield task_id, task
+                yield f"{prefix}{name[:-3]}", entry, None
+
+    return walk_dir(scan_dir(root))
+
 
-    yield from walk_dir(root)
+def walk_tasks(
+    root: Path | None = None,
+    depth_first: bool = True,
+    use_index: bool = True,
+    fields: Collection[str] | None = None,
+    jobs: int | None = None,
+) -> Iterator[tuple[str, Task]]:
+    """
+    Walk directory tree, yielding (id, Task) tuples.
+
+    Args:
+        root: Tasks root directory. If None, finds it automatically.
+        depth_first: If True, yield children before siblings.
+        use_index: If True, reuse cached parses for files whose mtime and
+            size match the index, and write back any changes.
+        fields: Task fields the caller needs. If none are BODY_FIELDS,
+            files are parsed header-only and yielded as LazyTasks. None
+            means all fields.
+        jobs: Parse workers. With more than one, the tree is listed first
+            and uncached files are parsed on a pool (see parse_parallel);
+            tasks are still yielded in walk order. None reads $TASK_JOBS.
+    """
+    if root is None:
+        root = require_tasks_root()
+    if jobs is None:
+        jobs = walk_jobs()
+    header_only = fields is not None and BODY_FIELDS.isdisjoint(fields)
+
+    index = load_task_index(root) if use_index else {}
+    seen: dict[str, dict] = {}
+    parsed: dict[Path, dict] = {}
+    dirty = False
+    racy_after = time.time_ns() - RACY_WINDOW_NS
+
+    def lookup(entry: os.DirEntry) -> tuple[Path, os.stat_result | None, dict | None]:
+        """
+        Return (path, stat, index entry if still valid).
+
+        stat is None for files with a pending buffered write.
+        """
+        path = Path(entry.path)
+        if _write_buffer and path in _write_buffer:
+            return path, None, None
+        stat = entry.stat()  # Cached on the DirEntry: one stat per file
+        cached = index.get(str(path.relative_to(root)))
+        if (
+            cached is not None
+            and cached["mtime_ns"] == stat.st_mtime_ns
+            and cached["size"] == stat.st_size
+            and (header_only or "notes" in cached["task"])
+        ):
+            return path, stat, cached
+        return path, stat, None
+
+    def load(entry: os.DirEntry) -> Task:
+        """Parse a task file, or rebuild it from the index if unchanged."""
+        nonlocal dirty
+        path, stat, cached = lookup(entry)
+        if stat is None:
+            return parse_task(path, root)  # Newer than the file on disk
+        rel = str(path.relative_to(root))
+        if cached is not None:
+            seen[rel] = cached
+            count("index_hits")
+            return task_from_record(cached["task"], path)
+
+        record = parsed.pop(path, None)
+        if record is not None:
+            task = task_from_record(record, path)
+        else:
+            task = parse_task(path, root, header_only)
+        if stat.st_mtime_ns < racy_after:
+            seen[rel] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "task": record if record is not None else task_to_record(task),
+            }
+            dirty = True
+        return task
+
+    complete = False
+    try:
+        plan: Iterable[tuple[str, os.DirEntry, list[str] | None]]
+        plan = walk_entries(root, depth_first)
+        if jobs > 1:
+            # List the whole tree first so uncached files can be parsed
+            # ahead of time; yielding below keeps the walk order.
+            plan = list(plan)
+            uncached = []
+            for _, entry, _ in plan:
+                path, stat, cached = lookup(entry)
+                if stat is not None and cached is None:
+                    uncached.append(path)
+            parsed.update(parse_parallel(uncached, root, header_only, jobs))
+
+        for task_id, entry, children in plan:
+            task = load(entry)
+            if children is not None:
+                task.children = children
+            yield task_id, task
+        complete = True
+    finally:
+        if use_index:
+            if complete and depth_first:
+                # Full walk: drop entries for files that no longer exist
+                dirty = dirty or seen.keys() != index.keys()
+                entries = seen
+            else:
+                entries = {**index, **seen}
+            if dirty:
+                save_task_index(root, entries)
 
 
 # =============================================================================
@@ -441,6 +1300,7 @@ def promote_to_parent(task_id: str, root: Path | None = None) -> None:
     """
     if root is None:
         root = require_tasks_root()
+    flush_writes()
 
     file_path = root / f"{task_id}.md"
     if not file_path.exists():
@@ -463,6 +1323,7 @@ def demote_to_leaf(task_id: str, root: Path | None = None) -> None:
     """
     if root is None:
         root = require_tasks_root()
+    flush_writes()
 
     dir_path = root / task_id
     if not dir_path.is_dir():
@@ -473,44 +1334,17 @@ def demote_to_leaf(task_id: str, root: Path | None = None) -> None:
         raise TaskError(f"Cannot demote: {task_id} has no index file")
 
     # Check for children
-    children = [f for f in dir_path.iterdir() if f.name != INDEX_FILE]
+    children = [f for f in dir_path.iterdir() if f.name not in (INDEX_FILE, ROLLUP_FILE)]
     if children:
         raise TaskError(f"Cannot demote: {task_id} still has children")
 
     # Move index to file and remove directory
     file_path = root / f"{task_id}.md"
     index_path.rename(file_path)
+    (dir_path / ROLLUP_FILE).unlink(missing_ok=True)
     dir_path.rmdir()
 
 
-# =============================================================================
-# Dependency Checking
-# =============================================================================
-
-
-def deps_satisfied(task: Task, root: Path | None = None) -> tuple[bool, list[str]]:
-    """
-    Check if all dependencies are complete.
-
-    Returns (satisfied, list of incomplete dep IDs).
-    """
-    if root is None:
-        root = require_tasks_root()
-
-    incomplete = []
-    for dep_id in task.deps:
-        try:
-            dep_path = get_task_path(dep_id, root)
-            dep_task = parse_task(dep_path, root)
-            if dep_task.status != "complete":
-                incomplete.append(dep_id)
-        except TaskError:
-            # Dependency doesn't exist - treat as incomplete
-            incomplete.append(dep_id)
-
-    return len(incomplete) == 0, incomplete
-
-
 # =============================================================================
 # Error Handling
 # =============================================================================
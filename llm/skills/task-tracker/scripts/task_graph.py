@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+In-memory dependency graph over the task tree.
+
+Loads every task once (through the store's walk) and answers readiness
+queries from memory, instead of re-reading each dependency's file per
+candidate.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from typing import Callable, Iterable, Iterator
+
+from task_archive import Archive
+from task_fs import Task, TaskError
+from task_profile import phase
+from task_store import TaskStore
+
+# Task fields the graph itself reads
+GRAPH_FIELDS = ("status", "deps", "children", "files")
+
+
+class TaskGraph:
+    """Tasks keyed by ID in depth-first order, with dependency lookups."""
+
+    def __init__(self, tasks: Iterable[tuple[str, Task]], archive: Archive | None = None):
+        self.tasks: dict[str, Task] = dict(tasks)
+        # Where deps on tasks that are no longer in the tree are looked up
+        self.archive = archive
+        # Reverse dependencies: dep ID -> IDs of tasks that depend on it
+        self.dependants: dict[str, set[str]] = {}
+        for task_id, task in self.tasks.items():
+            for dep_id in task.deps:
+                self.dependants.setdefault(dep_id, set()).add(task_id)
+        # Sorted dep IDs, for subtree (prefix) queries
+        self._dep_ids = sorted(self.dependants)
+
+    @classmethod
+    def load(cls, store: TaskStore) -> TaskGraph:
+        """Build a graph from every task in a store."""
+        # Only headers are read; task bodies load lazily if accessed
+        tasks = list(store.walk(fields=GRAPH_FIELDS))
+        with phase("graph"):
+            return cls(tasks, Archive(store.root))
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self.tasks
+
+    def get(self, task_id: str) -> Task:
+        """Return a task by ID or raise TaskError."""
+        try:
+            return self.tasks[task_id]
+        except KeyError:
+            raise TaskError(f"Task not found: {task_id}") from None
+
+    def status(self, task_id: str) -> str | None:
+        """Return a task's status (archived or not), or None if it does not exist."""
+        task = self.tasks.get(task_id)
+        if task is not None:
+            return task.status
+        return self.archive.status(task_id) if self.archive else None
+
+    def blockers(self, task_id: str) -> list[str]:
+        """
+        Return the dependencies of task_id that are not complete.
+
+        Missing dependencies count as incomplete.
+        """
+        return [
+            dep_id for dep_id in self.tasks[task_id].deps
+            if self.status(dep_id) != "complete"
+        ]
+
+    def dependants_of(self, task_id: str, subtree: bool = False) -> list[str]:
+        """
+        Return IDs of tasks that depend on task_id.
+
+        With subtree=True, also include tasks that depend on any
+        descendant of task_id (e.g. "01-auth/02-session" for "01-auth").
+        """
+        found = set(self.dependants.get(task_id, ()))
+        if subtree:
+            prefix = f"{task_id}/"
+            i = bisect_left(self._dep_ids, prefix)
+            while i < len(self._dep_ids) and self._dep_ids[i].startswith(prefix):
+                found |= self.dependants[self._dep_ids[i]]
+                i += 1
+        return sorted(found)
+
+    def set_deps(self, task_id: str, deps: list[str]) -> None:
+        """Replace a task's deps, keeping the reverse index in sync."""
+        task = self.get(task_id)
+        for dep_id in set(task.deps):
+            users = self.dependants[dep_id]
+            users.discard(task_id)
+            if not users:
+                del self.dependants[dep_id]
+                self._dep_ids.remove(dep_id)
+        task.deps = deps
+        for dep_id in deps:
+            if dep_id not in self.dependants:
+                self.dependants[dep_id] = set()
+                insort(self._dep_ids, dep_id)
+            self.dependants[dep_id].add(task_id)
+
+    def is_ready(self, task_id: str) -> bool:
+        """Check if a task is pending with all dependencies complete."""
+        return self.status(task_id) == "pending" and not self.blockers(task_id)
+
+    def next_ready(self) -> tuple[str, str] | None:
+        """
+        Pick the next task to work on.
+
+        Returns (task_id, reason), or None if nothing is ready:
+        1. First ready child of an in_progress task
+        2. Otherwise, first ready task in depth-first order
+        """
+        for task in self.tasks.values():
+            if task.status == "in_progress":
+                for child_id in task.children:
+                    if child_id in self.tasks and self.is_ready(child_id):
+                        return child_id, "pending child of in_progress task"
+
+        for task_id in self.tasks:
+            if self.is_ready(task_id):
+                return task_id, "first pending task with satisfied dependencies"
+
+        return None
+
+    def frontier(self) -> list[str]:
+        """
+        Return every ready task, in next_ready() priority order.
+
+        Ready children of in_progress tasks come first, then the rest in
+        depth-first order.
+        """
+        first = [
+            child_id
+            for task in self.tasks.values() if task.status == "in_progress"
+            for child_id in task.children
+            if child_id in self.tasks and self.is_ready(child_id)
+        ]
+        rest = [task_id for task_id in self.tasks if self.is_ready(task_id)]
+        return list(dict.fromkeys(first + rest))
+
+    def pick_parallel(self, workers: int) -> list[str]:
+        """
+        Pick up to `workers` ready tasks that can be worked on side by side.
+
+        Goes down the frontier, skipping tasks whose `files` overlap those of
+        a task already picked or in progress, and tasks inside (or containing)
+        one already picked.
+        """
+        busy = [
+            task.files for task in self.tasks.values()
+            if task.status == "in_progress"
+        ]
+        picked: list[str] = []
+        for task_id in self.frontier():
+            if len(picked) == workers:
+                break
+            files = self.tasks[task_id].files
+            if any(files_overlap(files, other) for other in busy):
+                continue
+            if any(is_within(task_id, other) or is_within(other, task_id) for other in picked):
+                continue
+            picked.append(task_id)
+            busy.append(files)
+        return picked
+
+    def components(self) -> list[list[str]]:
+        """
+        Strongly connected components of the dependency graph (Tarjan).
+
+        Edges run from each task to its existing deps. Components come out
+        deps-first, so their concatenation is a topological order.
+        """
+        index: dict[str, int] = {}
+        low: dict[str, int] = {}
+        stack: list[str] = []
+        on_stack: set[str] = set()
+        components = []
+
+        def visit(task_id: str) -> None:
+            index[task_id] = low[task_id] = len(index)
+            stack.append(task_id)
+            on_stack.add(task_id)
+            work.append((task_id, iter(self.tasks[task_id].deps)))
+
+        # Iterative, so deep dependency chains don't hit the recursion limit
+        for start in self.tasks:
+            if start in index:
+                continue
+            work: list[tuple[str, Iterator[str]]] = []
+            visit(start)
+            while work:
+                task_id, deps = work[-1]
+                for dep_id in deps:
+                    if dep_id not in self.tasks:
+                        continue
+                    if dep_id not in index:
+                        visit(dep_id)
+                        break
+                    if dep_id in on_stack:
+                        low[task_id] = min(low[task_id], index[dep_id])
+                else:
+                    work.pop()
+                    if work:
+                        parent_id = work[-1][0]
+                        low[parent_id] = min(low[parent_id], low[task_id])
+                    if low[task_id] == index[task_id]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == task_id:
+                                break
+                        components.append(component[::-1])
+        return components
+
+    def cycles(self) -> list[list[str]]:
+        """Return each set of tasks that depend on each other in a cycle."""
+        return [
+            component for component in self.components()
+            if len(component) > 1 or component[0] in self.tasks[component[0]].deps
+        ]
+
+    def longest_chain(self, include: Callable[[Task], bool] | None = None) -> list[str]:
+        """
+        Return the longest dependency chain, deps first.
+
+        With include, only tasks it accepts can be links in the chain. Tasks
+        in cycles are never part of it.
+        """
+        # Task ID -> (length of the longest chain ending here, previous link)
+        best: dict[str, tuple[int, str | None]] = {}
+        for component in self.components():
+            task_id = component[0]
+            task = self.tasks[task_id]
+            if len(component) > 1 or task_id in task.deps:
+                continue
+            if include is not None and not include(task):
+                continue
+            length, previous = 0, None
+            for dep_id in task.deps:
+                if dep_id in best and best[dep_id][0] > length:
+                    length, previous = best[dep_id][0], dep_id
+            best[task_id] = (length + 1, previous)
+
+        if not best:
+            return []
+        task_id = max(best, key=lambda t: best[t][0])
+        chain = []
+        while task_id is not None:
+            chain.append(task_id)
+            task_id = best[task_id][1]
+        return chain[::-1]
+
+
+def find_cycle(
+    task_id: str, deps: Iterable[str], deps_of: Callable[[str], list[str]]
+) -> list[str] | None:
+    """
+    Check whether giving task_id these deps would close a dependency cycle.
+
+    Searches only what the new deps can reach, loading each task's deps with
+    deps_of. Returns the cycle as [task_id, dep, ..., task_id], or None.
+    """
+    # Depth-first search for task_id, remembering how each task was reached
+    reached_from: dict[str, str] = {}
+    stack = []
+    for dep_id in deps:
+        if dep_id not in reached_from:
+            reached_from[dep_id] = task_id
+            stack.append(dep_id)
+    while stack:
+        current = stack.pop()
+        if current == task_id:
+            cycle = [task_id]
+            node = reached_from[task_id]
+            while node != task_id:
+                cycle.append(node)
+                node = reached_from[node]
+            cycle.append(task_id)
+            cycle.reverse()
+            return cycle
+        for dep_id in deps_of(current):
+            if dep_id not in reached_from:
+                reached_from[dep_id] = current
+                stack.append(dep_id)
+    return None
+
+
+def rename_id(task_id: str, old_id: str, new_id: str) -> str:
+    """Map task_id to its new ID after old_id (and its subtree) moves to new_id."""
+    if task_id == old_id:
+        return new_id
+    if task_id.startswith(f"{old_id}/"):
+        return f"{new_id}{task_id[len(old_id):]}"
+    return task_id
+
+
+def is_within(path: str, parent: str) -> bool:
+    """Check whether a slash-separated task ID or file path is parent or under it."""
+    return path == parent or path.startswith(f"{parent}/")
+
+
+def files_overlap(a: Iterable[str], b: Iterable[str]) -> bool:
+    """
+    Check whether two `files` lists share a path.
+
+    A directory entry (e.g. "src/auth/") overlaps every path under it.
+    """
+    a = [path.rstrip("/") for path in a]
+    b = [path.rstrip("/") for path in b]
+    return any(is_within(x, y) or is_within(y, x) for x in a for y in b)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Per-phase timings and counters for one task.py command.
+
+`task.py --profile <command>` (or TASK_PROFILE=1) adds a `timings` object
+to the command's JSON output:
+
+    "timings": {
+      "total_ms": 41.2,
+      "phases": {"discover": 0.1, "list": 3.0, "parse": 30.5, "command": 7.6},
+      "counters": {"files_read": 120, "bytes_read": 48211, "regex_calls": 2210}
+    }
+
+Phases nest, and each one's time excludes the phases inside it, so they add
+up to total_ms. Time not in any named phase counts as "command". Only the
+thread that started the profile records; worker threads are not counted.
+When no profile is active, phase() and count() return right away.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+PROFILE_ENV = "TASK_PROFILE"
+
+
+class Profile:
+    """Exclusive time per phase and event counters, for one command."""
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.thread = threading.get_ident()
+        self._stack = ["command"]
+        self._started = self._since = time.perf_counter()
+
+    def _charge(self) -> None:
+        """Add the time since the last switch to the current phase."""
+        now = time.perf_counter()
+        name = self._stack[-1]
+        self.timings[name] = self.timings.get(name, 0.0) + now - self._since
+        self._since = now
+
+    def enter(self, name: str) -> None:
+        self._charge()
+        self._stack.append(name)
+
+    def exit(self) -> None:
+        self._charge()
+        self._stack.pop()
+
+    def report(self) -> dict:
+        """The timings object for the command's output, in milliseconds."""
+        self._charge()
+        return {
+            "total_ms": round((self._since - self._started) * 1000, 3),
+            "phases": {
+                name: round(seconds * 1000, 3)
+                for name, seconds in sorted(self.timings.items(), key=lambda x: -x[1])
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+# The profile being recorded by this process, if any
+_active: Profile | None = None
+
+
+def start() -> Profile:
+    """Start recording a new profile."""
+    global _active
+    _active = Profile()
+    return _active
+
+
+def stop() -> dict:
+    """Stop recording and return the report."""
+    global _active
+    profile, _active = _active, None
+    return profile.report() if profile else {}
+
+
+def _recording() -> Profile | None:
+    """The active profile, if this thread records into it."""
+    profile = _active
+    if profile is None or profile.thread != threading.get_ident():
+        return None
+    return profile
+
+
+def profiling() -> bool:
+    """Check whether a profile is being recorded (to skip costly counts)."""
+    return _recording() is not None
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Time a block as phase `name`.
+
+    Never wrap a yield: the consumer's time would be charged to the phase.
+    """
+    profile = _recording()
+    if profile is None:
+        yield
+        return
+    profile.enter(name)
+    try:
+        yield
+    finally:
+        profile.exit()
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add n to a counter."""
+    profile = _recording()
+    if profile is not None:
+        profile.counters[name] = profile.counters.get(name, 0) + n
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Full-text search over tasks and their notes.
+
+An inverted index over titles, descriptions, approaches, criteria and note
+text, kept in .claude/tasks/.search.<backend>. Each search first refreshes
+it from the store's stamps (see TaskStore.stamps), so only tasks that
+changed since the last search are read again.
+
+Results are ranked with BM25, per section, weighted by field:
+
+    score = sum over query terms and matching sections of
+            weight(field) * idf(term) * tf * (K1 + 1) / (tf + K1 * norm)
+
+where norm grows with the section's length relative to its field's average.
+Every query term has to match; `term*` matches any term with that prefix.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from bisect import bisect_left
+from pathlib import Path
+from typing import Collection, Iterator
+
+from task_fs import Task, TaskError
+from task_profile import count, phase
+from task_store import TaskStore
+
+SEARCH_FILE = ".search"
+SEARCH_VERSION = 1
+SEARCH_FIELDS = ("title", "description", "approach", "criteria", "note")
+
+# Matches in the title count most, then criteria and approach
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "criteria": 1.5,
+    "approach": 1.2,
+    "description": 1.0,
+    "note": 1.0,
+}
+
+# BM25 term saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+_TERM_RE = re.compile(r"\w+")
+_QUERY_RE = re.compile(r"(\w+)(\*?)")
+
+
+def terms(text: str) -> list[str]:
+    """Lowercased words of text, in order."""
+    return _TERM_RE.findall(text.lower())
+
+
+def sections(task: Task) -> Iterator[tuple[str, str]]:
+    """
+    Yield (section, text) for each searchable part of a task.
+
+    Sections are named after their field; notes are "note:<index>".
+    """
+    yield "title", task.title
+    yield "description", task.description
+    yield "approach", task.approach
+    yield "criteria", "\n".join(task.criteria)
+    for i, note in enumerate(task.notes):
+        yield f"note:{i}", note.text
+
+
+def section_field(section: str) -> str:
+    return section.partition(":")[0]
+
+
+def search_path(root: Path, backend: str) -> Path:
+    """Where the search index for a backend lives."""
+    return root / f"{SEARCH_FILE}.{backend}"
+
+
+# Indexes already read by this process: path -> ((mtime_ns, size), index)
+_loaded: dict[Path, tuple[tuple[int, int], SearchIndex]] = {}
+
+
+class SearchIndex:
+    """
+    Postings for every term, and what ranking needs to know per task.
+
+    docs:     task id -> {"stamp", "title", "status", "updated",
+                          "notes": [created, ...], "lengths": {section: n},
+                          "terms": [term, ...]}
+    postings: term -> task id -> section -> term count
+    totals:   field -> [sections, terms], for average section lengths
+    """
+
+    def __init__(self, path: Path, data: dict | None = None):
+        data = data or {}
+        self.path = path
+        self.docs: dict[str, dict] = data.get("docs", {})
+        self.postings: dict[str, dict[str, dict[str, int]]] = data.get("postings", {})
+        self.totals: dict[str, list[int]] = data.get("totals", {})
+        self.dirty = False
+        self._vocabulary: list[str] | None = None
+
+    @classmethod
+    def open(cls, store: TaskStore) -> SearchIndex:
+        """Load the store's index, or start an empty one."""
+        path = search_path(store.root, store.name)
+        try:
+            stat = path.stat()
+            key = (stat.st_mtime_ns, stat.st_size)
+            if path in _loaded and _loaded[path][0] == key:
+                return _loaded[path][1]
+            with phase("index"):
+                data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(path)
+        if not isinstance(data, dict) or data.get("version") != SEARCH_VERSION:
+            return cls(path)
+        index = cls(path, data)
+        _loaded[path] = (key, index)
+        return index
+
+    def save(self) -> None:
+        """Atomically write the index if it changed. Failures are ignored."""
+        if not self.dirty:
+            return
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        data = {
+            "version": SEARCH_VERSION,
+            "docs": self.docs,
+            "postings": self.postings,
+            "totals": self.totals,
+        }
+        try:
+            with phase("index"):
+                tmp_path.write_text(json.dumps(data, separators=(",", ":")))
+                os.replace(tmp_path, self.path)
+                stat = self.path.stat()
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            return
+        self.dirty = False
+        _loaded[self.path] = ((stat.st_mtime_ns, stat.st_size), self)
+
+    # -------------------------------------------------------------------------
+    # Updates
+    # -------------------------------------------------------------------------
+
+    def refresh(self, store: TaskStore) -> int:
+        """
+        Bring the index up to date with the store.
+
+        Returns how many tasks were (re)indexed.
+        """
+        stamps = dict(store.stamps())
+        for task_id in [t for t in self.docs if t not in stamps]:
+            self.remove(task_id)
+
+        indexed = 0
+        for task_id, stamp in stamps.items():
+            doc = self.docs.get(task_id)
+            if doc is not None and stamp is not None and doc["stamp"] == stamp:
+                continue
+            try:
+                task = store.load(task_id)
+            except TaskError:
+                continue  # Removed since the stamps were read
+            self.remove(task_id)
+            self.add(task_id, task, stamp)
+            indexed += 1
+        count("tasks_indexed", indexed)
+        return indexed
+
+    def add(self, task_id: str, task: Task, stamp: object) -> None:
+        lengths: dict[str, int] = {}
+        task_terms: set[str] = set()
+        with phase("index"):
+            for section, text in sections(task):
+                words = terms(text)
+                if not words:
+                    continue
+                lengths[section] = len(words)
+                totals = self.totals.setdefault(section_field(section), [0, 0])
+                totals[0] += 1
+                totals[1] += len(words)
+                for word in words:
+                    counts = self.postings.setdefault(word, {}).setdefault(task_id, {})
+                    counts[section] = counts.get(section, 0) + 1
+                task_terms.update(words)
+
+        self.docs[task_id] = {
+            "stamp": stamp,
+            "title": task.title,
+            "status": task.status,
+            "updated": task.updated,
+            "notes": [note.created for note in task.notes],
+            "lengths": lengths,
+            "terms": sorted(task_terms),
+        }
+        self._vocabulary = None
+        self.dirty = True
+
+    def remove(self, task_id: str) -> None:
+        doc = self.docs.pop(task_id, None)
+        if doc is None:
+            return
+        for section, length in doc["lengths"].items():
+            totals = self.totals[section_field(section)]
+            totals[0] -= 1
+            totals[1] -= length
+        for word in doc["terms"]:
+            postings = self.postings.get(word, {})
+            postings.pop(task_id, None)
+            if not postings:
+                self.postings.pop(word, None)
+        self._vocabulary = None
+        self.dirty = True
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def expand(self, word: str, prefix: bool) -> list[str]:
+        """The indexed terms a query word matches."""
+        if not prefix:
+            return [word] if word in self.postings else []
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        matched = []
+        for i in range(bisect_left(vocabulary, word), len(vocabulary)):
+            if not vocabulary[i].startswith(word):
+                break
+            matched.append(vocabulary[i])
+        return matched
+
+    def search(
+        self,
+        query: str,
+        fields: Collection[str] | None = None,
+        since: str | None = None,
+        status: str | None = None,
+    ) -> list[tuple[float, str, list[str]]]:
+        """
+        Rank the tasks matching every word of query.
+
+        fields limits matches to those fields; since limits them to notes
+        created, or other fields of tasks updated, at or after it.
+
+        Returns (score, task id, matching sections), best first.
+        """
+        words = _QUERY_RE.findall(query.lower())
+        if not words:
+            raise TaskError("Search query has no words")
+
+        def eligible(task_id: str, section: str) -> bool:
+            field = section_field(section)
+            if fields and field not in fields:
+                return False
+            if since is not None:
+                doc = self.docs[task_id]
+                if field == "note":
+                    return doc["notes"][int(section[5:])] >= since
+                return (doc["updated"] or "") >= since
+            return True
+
+        average = {
+            field: total / max(n, 1) for field, (n, total) in self.totals.items()
+        }
+        scores: dict[str, float] | None = None
+        matched: dict[str, set[str]] = {}
+        with phase("query"):
+            for word, star in words:
+                # Each word scores on its own; tasks missing any word drop out
+                postings: dict[str, dict[str, int]] = {}
+                for term in self.expand(word, bool(star)):
+                    for task_id, counts in self.postings[term].items():
+                        merged = postings.setdefault(task_id, {})
+                        for section, n in counts.items():
+                            merged[section] = merged.get(section, 0) + n
+                idf = math.log(1 + (len(self.docs) - len(postings) + 0.5) / (len(postings) + 0.5))
+
+                word_scores: dict[str, float] = {}
+                for task_id, counts in postings.items():
+                    if scores is not None and task_id not in scores:
+                        continue
+                    if status is not None and self.docs[task_id]["status"] != status:
+                        continue
+                    lengths = self.docs[task_id]["lengths"]
+                    score = 0.0
+                    for section, tf in counts.items():
+                        if not eligible(task_id, section):
+                            continue
+                        field = section_field(section)
+                        norm = 1 - B + B * lengths[section] / average[field]
+                        score += FIELD_WEIGHTS[field] * idf * tf * (K1 + 1) / (tf + K1 * norm)
+                        matched.setdefault(task_id, set()).add(section)
+                    if score:
+                        word_scores[task_id] = score
+
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {t: scores[t] + s for t, s in word_scores.items()}
+                if not scores:
+                    break
+
+        ranked = sorted((scores or {}).items(), key=lambda x: (-x[1], x[0]))
+        return [
+            (score, task_id, sorted(matched[task_id], key=_section_order))
+            for task_id, score in ranked
+        ]
+
+
+def _section_order(section: str) -> tuple[int, int]:
+    field, _, i = section.partition(":")
+    return SEARCH_FIELDS.index(field), int(i or 0)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Long-lived task server over a Unix domain socket.
+
+`task.py serve` keeps one process (and its in-memory task index) alive and
+answers task.py subcommands as newline-delimited JSON-RPC 2.0:
+
+    -> {"jsonrpc": "2.0", "id": 1, "method": "next", "params": {}}
+    <- {"jsonrpc": "2.0", "id": 1, "result": {"task": {...}, ...}}
+
+Each request re-validates cached tasks by stat, so edits made outside the
+server are picked up on the next call. Requests are handled one at a time.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Callable
+
+from task_fs import SERVER_SOCKET, TaskError
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+TASK_ERROR = -32000
+
+Dispatch = Callable[[str, dict], dict]
+
+
+def socket_path(root: Path) -> Path:
+    """Return the server socket path for a tasks root."""
+    return root / SERVER_SOCKET
+
+
+def handle_request(line: str, dispatch: Dispatch, methods: set[str]) -> dict:
+    """Decode one JSON-RPC request line and build its response."""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return rpc_error(None, PARSE_ERROR, f"Parse error: {e}")
+
+    if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+        return rpc_error(None, INVALID_REQUEST, "Invalid request")
+
+    request_id = request.get("id")
+    method = request["method"]
+    params = request.get("params") or {}
+    if method not in methods:
+        return rpc_error(request_id, METHOD_NOT_FOUND, f"Unknown method: {method}")
+    if not isinstance(params, dict):
+        return rpc_error(request_id, INVALID_REQUEST, "params must be an object")
+
+    try:
+        result = dispatch(method, params)
+    except TaskError as e:
+        return rpc_error(request_id, TASK_ERROR, str(e))
+    except Exception as e:  # Keep serving after a bad request
+        return rpc_error(request_id, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+    return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+def rpc_error(request_id, code: int, message: str) -> dict:
+    """Build a JSON-RPC error response."""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": code, "message": message},
+    }
+
+
+def serve(
+    root: Path, dispatch: Dispatch, methods: set[str], idle_timeout: float = 0
+) -> int:
+    """
+    Serve requests on root/.server.sock until stopped.
+
+    Stops on SIGTERM, SIGINT, or after idle_timeout seconds without a
+    connection (0 disables the timeout). Returns the number of requests
+    handled.
+    """
+    path = socket_path(root)
+    if path.exists():
+        if is_running(path):
+            raise TaskError(f"Server already running on {path}")
+        path.unlink()  # Stale socket from a server that died
+
+    lock = threading.Lock()
+    handled = 0
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            nonlocal handled
+            for raw in self.rfile:
+                line = raw.decode().strip()
+                if not line:
+                    continue
+                with lock:
+                    response = handle_request(line, dispatch, methods)
+                    handled += 1
+                self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        timed_out = False
+
+        def handle_timeout(self):
+            self.timed_out = True
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Bind by relative path: AF_UNIX paths are limited to ~100 bytes
+    server = Server(os.path.relpath(path), Handler)
+    server.timeout = idle_timeout or None
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while not server.timed_out:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+    return handled
+
+
+def is_running(path: Path) -> bool:
+    """Check whether a server is accepting connections on path."""
+    try:
+        with connect(path):
+            return True
+    except OSError:
+        return False
+
+
+def connect(path: Path) -> socket.socket:
+    """Open a client connection to the server socket."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(os.path.relpath(path))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def call(root: Path, method: str, params: dict) -> dict | None:
+    """
+    Forward one command to a running server.
+
+    Returns the JSON-RPC response, or None if no server is reachable so the
+    caller can fall back to direct filesystem access.
+    """
+    path = socket_path(root)
+    if not path.exists():
+        return None
+    request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    try:
+        with connect(path) as sock:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except OSError:
+        return None
+    if not line:
+        return None
+    return json.loads(line)
@@ -0,0 +1,1017 @@
+#!/usr/bin/env python3
+"""
+Task storage backends.
+
+Commands reach the task tree through a TaskStore, so the same command code
+runs against either backend:
+
+- MarkdownStore: the markdown tree under .claude/tasks/ (see task_fs)
+- SqliteStore: a single SQLite database, .claude/tasks/.tasks.db, with
+  indexes on status, parent and deps
+
+open_store() picks the backend: $TASK_BACKEND if set, otherwise SQLite
+when the database exists. `task.py export --to` copies tasks between them.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Collection, Iterable, Iterator
+
+from task_fs import (
+    BODY_FIELDS,
+    CHANGE_LOG,
+    INDEX_FILE,
+    RACY_WINDOW_NS,
+    ROLLUP_FILE,
+    STORE_DB,
+    TASK_INDEX_FILE,
+    LazyTask,
+    body_loaded,
+    Note,
+    Task,
+    TaskError,
+    append_note,
+    buffered_writes,
+    demote_to_leaf,
+    flush_writes,
+    get_task_id,
+    get_task_path,
+    lock_task,
+    lock_tree,
+    next_prefix,
+    now_iso,
+    parse_task,
+    prefix_after,
+    promote_to_parent,
+    read_task_text,
+    rebuild_task_index,
+    recover_writes,
+    replace_file,
+    require_tasks_root,
+    rollup_lock,
+    stamp_new_task,
+    walk_entries,
+    walk_tasks,
+    write_task,
+)
+from task_profile import count, phase
+
+BACKEND_ENV = "TASK_BACKEND"
+
+
+def own_status(task: Task) -> list[str]:
+    """The part of a task's rollup that is its own: [status, started, completed]."""
+    return [task.status, task.started, task.completed]
+
+
+def rollup_total(own: list[str], children: Iterable[dict]) -> dict:
+    """
+    Combine a task's own status with its children's rollup entries.
+
+    Returns {"counts": {status: n}, "started", "completed"} for the subtree:
+    the earliest start and the latest completion ("" if none).
+    """
+    status, started, completed = own
+    counts = {status: 1}
+    for child in children:
+        total = child["total"]
+        for child_status, n in total["counts"].items():
+            counts[child_status] = counts.get(child_status, 0) + n
+        if total["started"] and (not started or total["started"] < started):
+            started = total["started"]
+        completed = max(completed, total["completed"])
+    return {"counts": counts, "started": started, "completed": completed}
+
+
+class TaskStore(ABC):
+    """
+    Where tasks live. Task IDs are path-based ("01-auth/02-session").
+
+    All methods raise TaskError for tasks that do not exist.
+    """
+
+    name: str
+    # File that `task.py reindex` rebuilds
+    index_path: Path
+
+    @abstractmethod
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Commit every write made inside as one unit, on exit.
+
+        If it raises, SQLite rolls the writes back; the markdown tree has
+        already changed, so its staged writes are committed too.
+        """
+
+    @abstractmethod
+    def commit(self) -> None:
+        """Commit the writes made so far in the transaction, which goes on."""
+
+    @abstractmethod
+    def lock_tree(self, exclusive: bool = False) -> None:
+        """
+        Lock the tree for writing until the transaction commits.
+
+        Shared for edits to existing tasks (which also lock() them),
+        exclusive for add, move and remove.
+        """
+
+    @abstractmethod
+    def lock(self, task_id: str) -> None:
+        """Lock one task for a read-modify-write; read it only after this."""
+
+    @abstractmethod
+    def resolve(self, task_id: str) -> str:
+        """Return the canonical ID of an existing task."""
+
+    @abstractmethod
+    def load(self, task_id: str, header_only: bool = False) -> Task:
+        """Load one task (a LazyTask with header_only=True)."""
+
+    @abstractmethod
+    def save(self, task: Task) -> None:
+        """Create or overwrite task.id. Its parent must already be a parent."""
+
+    @abstractmethod
+    def append_note(self, task_id: str, note: Note) -> int:
+        """Add a note and bump `updated`. Returns the new note count."""
+
+    @abstractmethod
+    def walk(
+        self,
+        fields: Collection[str] | None = None,
+        status: str | None = None,
+        since: str | None = None,
+    ) -> Iterator[tuple[str, Task]]:
+        """
+        Yield (id, Task) in depth-first order, with children filled in.
+
+        fields works as for task_fs.walk_tasks(); with status, only tasks
+        in that status are yielded, and with since, only tasks updated at
+        or after that timestamp.
+        """
+
+    @abstractmethod
+    def stamps(self) -> Iterator[tuple[str, object]]:
+        """
+        Yield (id, stamp) for every task, without loading any.
+
+        A task whose stamp is unchanged has not changed since. A None stamp
+        means the task may change without its stamp changing.
+        """
+
+    @abstractmethod
+    def next_prefix(self, parent_id: str = "") -> str:
+        """Return the next NN- prefix among parent_id's children."""
+
+    @abstractmethod
+    def promote(self, task_id: str) -> None:
+        """Make task_id able to hold children."""
+
+    @abstractmethod
+    def remove(self, task_id: str, op: str = "removed") -> None:
+        """Delete a task and its subtree, and log it as op (or "archived")."""
+
+    @abstractmethod
+    def move(self, old_id: str, new_id: str) -> None:
+        """
+        Move a task and its subtree, and log the move. Task contents are
+        left as they were.
+        """
+
+    @abstractmethod
+    def changes(self, since: str, after: int | None = None) -> tuple[list[dict], int]:
+        """
+        Return logged removals and moves, and the log position after them.
+
+        Each is {"op": "removed", "archived" or "moved", "id", "at"}, plus
+        "new_id" for moves. With after (a position returned earlier), the ones logged
+        after it; otherwise the ones at or after since.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Delete every task."""
+
+    @abstractmethod
+    def reindex(self) -> int:
+        """Rebuild the store's indexes and rollups. Returns the task count."""
+
+    # -------------------------------------------------------------------------
+    # Rollups
+    # -------------------------------------------------------------------------
+    #
+    # Each task's rollup entry, {"own": own_status(), "total": rollup_total()},
+    # is stored with its siblings' under their parent. A write to a task
+    # updates its entry and then the totals of its ancestors, so both
+    # writes and rollup() stay O(depth).
+
+    @abstractmethod
+    def _read_rollups(self, parent_id: str) -> dict[str, dict] | None:
+        """Rollup entries of parent_id's children, by name (None if none)."""
+
+    @abstractmethod
+    def _write_rollups(self, parent_id: str, entries: dict[str, dict]) -> None:
+        """Replace the rollup entries of parent_id's children."""
+
+    @abstractmethod
+    def _clear_rollups(self) -> None:
+        """Mark every rollup unbuilt, for the next rollup() to rebuild."""
+
+    def rollup(self, task_id: str = "") -> dict:
+        """
+        Status counts, earliest start and latest completion of a task and
+        its subtree (see rollup_total), or of the whole tree for "".
+
+        Builds the rollups from a full walk the first time.
+        """
+        top = self._read_rollups("")
+        if top is None:
+            self.rebuild_rollups()
+            top = self._read_rollups("") or {}
+        if not task_id:
+            total = rollup_total(["", "", ""], top.values())
+            del total["counts"][""]
+            return total
+        parent_id, _, name = task_id.rpartition("/")
+        entry = (self._read_rollups(parent_id) or {}).get(name)
+        if entry is None:
+            # Out of step (say, an edit by hand): rebuild once
+            self.rebuild_rollups()
+            entry = (self._read_rollups(parent_id) or {}).get(name)
+            if entry is None:
+                raise TaskError(f"Task not found: {task_id}")
+        return entry["total"]
+
+    def rebuild_rollups(self) -> None:
+        """Recompute every rollup from the tasks' headers."""
+        self.lock_tree(exclusive=True)  # No writes meanwhile
+        entries: dict[str, dict[str, dict]] = {"": {}}
+        tasks = list(self.walk(fields=("status", "started", "completed", "children")))
+        for task_id, task in reversed(tasks):  # Children before their parents
+            parent_id, _, name = task_id.rpartition("/")
+            own = own_status(task)
+            children = entries.get(task_id, {}).values()
+            entries.setdefault(parent_id, {})[name] = {
+                "own": own, "total": rollup_total(own, children),
+            }
+        self._clear_rollups()
+        # The top level last: while it is missing, the rollups count as unbuilt
+        top = entries.pop("")
+        for parent_id, children in entries.items():
+            self._write_rollups(parent_id, children)
+        self._write_rollups("", top)
+
+    def _update_rollups(self, task_id: str, own: list[str] | None) -> None:
+        """Set a task's own status (or drop it, for None), then re-total its ancestors."""
+        if self._read_rollups("") is None:
+            return  # Not built yet: the first rollup() builds them all
+        parent_id, _, name = task_id.rpartition("/")
+        entries = self._read_rollups(parent_id) or {}
+        if own is None:
+            entries.pop(name, None)
+        else:
+            children = (self._read_rollups(task_id) or {}).values()
+            entries[name] = {"own": own, "total": rollup_total(own, children)}
+        self._write_rollups(parent_id, entries)
+
+        while parent_id:
+            child_entries = entries
+            task_id = parent_id
+            parent_id, _, name = task_id.rpartition("/")
+            entries = self._read_rollups(parent_id) or {}
+            if name not in entries:
+                self._clear_rollups()  # Out of step: rebuild on the next rollup()
+                return
+            entries[name]["total"] = rollup_total(entries[name]["own"], child_entries.values())
+            self._write_rollups(parent_id, entries)
+
+
+# =============================================================================
+# Markdown
+# =============================================================================
+
+
+class MarkdownStore(TaskStore):
+    """Tasks as markdown files, one per task (see task_fs)."""
+
+    name = "markdown"
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.index_path = root / TASK_INDEX_FILE
+        self._depth = 0
+        # Tasks written in this transaction, for _refresh_rollups()
+        self._stale: set[str] = set()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        if not self._depth:
+            # Finish a commit cut short by a crash, unless writers are
+            # active (they recover when they take the tree lock)
+            recover_writes(self.root, wait=False)
+        self._depth += 1
+        try:
+            # One commit (and one fsync) for all of the writes
+            with buffered_writes():
+                try:
+                    yield
+                finally:
+                    if self._depth == 1:
+                        # Before the locks go, so rollups follow commits in order
+                        flush_writes()
+                        self._refresh_rollups()
+        finally:
+            self._depth -= 1
+
+    def commit(self) -> None:
+        # Staged writes are committed even if the transaction fails, so
+        # they wait for its end and are coalesced with later ones
+        pass
+
+    def lock_tree(self, exclusive: bool = False) -> None:
+        lock_tree(self.root, exclusive)
+
+    def lock(self, task_id: str) -> None:
+        lock_task(get_task_path(task_id, self.root), self.root)
+
+    def resolve(self, task_id: str) -> str:
+        return get_task_id(get_task_path(task_id, self.root), self.root)
+
+    def load(self, task_id: str, header_only: bool = False) -> Task:
+        return parse_task(get_task_path(task_id, self.root), self.root, header_only)
+
+    def save(self, task: Task) -> None:
+        try:
+            path = get_task_path(task.id, self.root)
+        except TaskError:
+            path = self.root / f"{task.id}.md"
+        write_task(path, task)
+        self._update_rollups(task.id, own_status(task))
+
+    def append_note(self, task_id: str, note: Note) -> int:
+        path = get_task_path(task_id, self.root)
+        # Fast path: append the note block, leaving the rest of the file alone
+        note_count = append_note(path, note, updated=note.created)
+        if note_count is None:
+            task = parse_task(path, self.root)
+            task.notes.append(note)
+            task.updated = note.created
+            write_task(path, task)
+            note_count = len(task.notes)
+        return note_count
+
+    def walk(
+        self,
+        fields: Collection[str] | None = None,
+        status: str | None = None,
+        since: str | None = None,
+    ) -> Iterator[tuple[str, Task]]:
+        if (status is not None or since is not None) and fields is None:
+            # Only matching tasks need their body read
+            fields = ("status", "updated")
+        for task_id, task in walk_tasks(self.root, fields=fields):
+            if status is not None and task.status != status:
+                continue
+            if since is not None and task.updated < since:
+                continue
+            yield task_id, task
+
+    def stamps(self) -> Iterator[tuple[str, object]]:
+        # Same rule as the parse cache: recent mtimes may not change again
+        racy_after = time.time_ns() - RACY_WINDOW_NS
+        for task_id, entry, _ in walk_entries(self.root):
+            stat = entry.stat()
+            if stat.st_mtime_ns < racy_after:
+                yield task_id, [stat.st_mtime_ns, stat.st_size]
+            else:
+                yield task_id, None
+
+    def next_prefix(self, parent_id: str = "") -> str:
+        return next_prefix(self.root / parent_id)
+
+    def promote(self, task_id: str) -> None:
+        if (self.root / f"{task_id}.md").exists() and not (self.root / task_id).exists():
+            promote_to_parent(task_id, self.root)
+
+    def remove(self, task_id: str, op: str = "removed") -> None:
+        path = get_task_path(task_id, self.root)
+        flush_writes()
+        if path.name == INDEX_FILE:
+            # Parent task - remove entire directory
+            shutil.rmtree(path.parent)
+        else:
+            path.unlink()
+            self._demote_if_empty(path.parent)
+        task_id = get_task_id(path, self.root)
+        self._update_rollups(task_id, None)
+        self._log_change({"op": op, "id": task_id})
+
+    def move(self, old_id: str, new_id: str) -> None:
+        path = get_task_path(old_id, self.root)
+        flush_writes()
+        if path.name == INDEX_FILE:
+            # Moving a parent task
+            shutil.move(str(path.parent), str(self.root / new_id))
+        else:
+            shutil.move(str(path), str(self.root / f"{new_id}.md"))
+            self._demote_if_empty(path.parent)
+        old_id = get_task_id(path, self.root)
+        self._update_rollups(old_id, None)
+        self._update_rollups(new_id, own_status(self.load(new_id, header_only=True)))
+        self._log_change({"op": "moved", "id": old_id, "new_id": new_id})
+
+    def _log_change(self, change: dict) -> None:
+        # One short O_APPEND write, so readers never see half a line
+        line = json.dumps({**change, "at": now_iso()}) + "\n"
+        fd = os.open(self.root / CHANGE_LOG, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+        count("files_written")
+
+    def changes(self, since: str, after: int | None = None) -> tuple[list[dict], int]:
+        # The position is a byte offset into the log
+        try:
+            with open(self.root / CHANGE_LOG, "rb") as f:
+                f.seek(after or 0)
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+        count("files_read")
+        end = data.rfind(b"\n") + 1  # A line still being written waits
+        changes = [json.loads(line) for line in data[:end].splitlines()]
+        if after is None:
+            changes = [c for c in changes if c["at"] >= since]
+        return changes, (after or 0) + end
+
+    def _demote_if_empty(self, directory: Path) -> None:
+        """Turn a parent whose last child just left back into a leaf."""
+        if directory == self.root:
+            return
+        children = [f for f in directory.iterdir() if f.name not in (INDEX_FILE, ROLLUP_FILE)]
+        if not children:
+            try:
+                demote_to_leaf(str(directory.relative_to(self.root)), self.root)
+            except TaskError:
+                pass  # If demotion fails, leave as empty parent
+
+    def clear(self) -> None:
+        flush_writes()
+        for entry in self.root.iterdir():
+            if entry.name.startswith("."):
+                continue  # Caches, locks, journals, the database
+            if entry.is_dir():
+                shutil.rmtree(entry)
+            elif entry.suffix == ".md":
+                entry.unlink()
+        self._clear_rollups()
+
+    def reindex(self) -> int:
+        task_count = rebuild_task_index(self.root)
+        self.rebuild_rollups()
+        return task_count
+
+    def _rollup_path(self, parent_id: str) -> Path:
+        return self.root / parent_id / ROLLUP_FILE
+
+    def _read_rollups(self, parent_id: str) -> dict[str, dict] | None:
+        try:
+            return json.loads(read_task_text(self._rollup_path(parent_id)))
+        except (OSError, ValueError):
+            return None
+
+    def _write_rollups(self, parent_id: str, entries: dict[str, dict]) -> None:
+        # A cache, so not journaled: a crash can only leave it stale
+        path = self._rollup_path(parent_id)
+        if path.parent.is_dir():  # Else a leaf now, with nothing to roll up
+            replace_file(path, json.dumps(entries, separators=(",", ":"), sort_keys=True))
+
+    def _clear_rollups(self) -> None:
+        # Without the top-level file, the rest count as unbuilt
+        self._rollup_path("").unlink(missing_ok=True)
+
+    def _update_rollups(self, task_id: str, own: list[str] | None) -> None:
+        # Once committed: tasks are written at the end of the transaction
+        self._stale.add(task_id)
+        if not self._depth:
+            self._refresh_rollups()
+
+    def _refresh_rollups(self) -> None:
+        """
+        Update the rollups of the tasks written in this transaction, and
+        of their ancestors, from the committed tasks.
+
+        Runs under the tree and task locks the writes took. Each .rollup is
+        locked only while it is rewritten, and entries are re-read from
+        disk under that lock, so writers sharing an ancestor leave it with
+        both of their changes.
+        """
+        stale, self._stale = self._stale, set()
+        if not stale or self._read_rollups("") is None:
+            return  # Not built yet: the first rollup() builds them all
+        # Parent ID -> names of children to re-read (True) or only re-total
+        pending: dict[str, dict[str, bool]] = {}
+        for task_id in stale:
+            parent_id, _, name = task_id.rpartition("/")
+            pending.setdefault(parent_id, {})[name] = True
+
+        while pending:
+            # Deepest first, so totals include the levels below
+            parent_id = max(pending, key=lambda p: p.count("/") + bool(p))
+            names = pending.pop(parent_id)
+            with rollup_lock(self.root, parent_id):
+                entries = self._read_rollups(parent_id) or {}
+                for name, reread in names.items():
+                    task_id = f"{parent_id}/{name}" if parent_id else name
+                    if reread:
+                        try:
+                            own = own_status(self.load(task_id, header_only=True))
+                        except TaskError:
+                            entries.pop(name, None)  # Removed or moved away
+                            continue
+                    elif name in entries:
+                        own = entries[name]["own"]
+                    else:
+                        self._clear_rollups()  # Out of step: rebuild on the next rollup()
+                        return
+                    children = (self._read_rollups(task_id) or {}).values()
+                    entries[name] = {"own": own, "total": rollup_total(own, children)}
+                self._write_rollups(parent_id, entries)
+            if parent_id:
+                grandparent_id, _, name = parent_id.rpartition("/")
+                pending.setdefault(grandparent_id, {}).setdefault(name, False)
+
+
+# =============================================================================
+# SQLite
+# =============================================================================
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,       -- '' for top-level tasks
+    sort_key TEXT NOT NULL,     -- id with '/' as \\x01, so it sorts depth-first
+    title TEXT NOT NULL,
+    status TEXT NOT NULL,
+    approach TEXT NOT NULL,
+    criteria TEXT NOT NULL,     -- JSON list
+    files TEXT NOT NULL,        -- JSON list
+    created TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    started TEXT NOT NULL,
+    completed TEXT NOT NULL,
+    blocked_reason TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS tasks_by_order ON tasks (sort_key);
+CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status, sort_key);
+CREATE INDEX IF NOT EXISTS tasks_by_parent ON tasks (parent, sort_key);
+
+CREATE TABLE IF NOT EXISTS deps (
+    task_id TEXT NOT NULL REFERENCES tasks (id) ON UPDATE CASCADE ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    dep_id TEXT NOT NULL,       -- Not a foreign key: deps may dangle, as in markdown
+    PRIMARY KEY (task_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS deps_by_dep ON deps (dep_id);
+
+CREATE TABLE IF NOT EXISTS notes (
+    task_id TEXT NOT NULL REFERENCES tasks (id) ON UPDATE CASCADE ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (task_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tasks_by_updated ON tasks (updated);
+
+-- Removals and moves, for `task.py changes`
+CREATE TABLE IF NOT EXISTS changes (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    at TEXT NOT NULL,
+    op TEXT NOT NULL,           -- 'removed', 'archived' or 'moved'
+    id TEXT NOT NULL,
+    new_id TEXT                 -- For moves
+);
+CREATE INDEX IF NOT EXISTS changes_by_time ON changes (at);
+
+-- Status rollups of each task's children (see TaskStore.rollup)
+CREATE TABLE IF NOT EXISTS rollups (
+    parent TEXT NOT NULL,       -- '' for top-level tasks
+    name TEXT NOT NULL,         -- Last part of the child's id
+    entry TEXT NOT NULL,        -- JSON {"own", "total"}
+    PRIMARY KEY (parent, name)
+) WITHOUT ROWID;
+"""
+
+# Task columns read for every task; description is read with the body
+_HEADER_COLUMNS = (
+    "id", "title", "status", "approach", "criteria", "files",
+    "created", "updated", "started", "completed", "blocked_reason",
+)
+_JSON_COLUMNS = frozenset({"criteria", "files"})
+
+
+def sort_key(task_id: str) -> str:
+    """Key that orders task IDs depth-first, parents before their children."""
+    return task_id.replace("/", "\x01")
+
+
+class _StoredTask(LazyTask):
+    """A LazyTask whose description and notes are read from the database."""
+
+    __slots__ = ("_store",)
+
+    def __init__(self, store: SqliteStore, **kwargs):
+        super().__init__(None, **kwargs)
+        self._store = store
+
+    def _read_body(self) -> tuple[str, list[Note]]:
+        return self._store.read_body(self.id)
+
+
+class SqliteStore(TaskStore):
+    """
+    Tasks in one SQLite database, in WAL mode.
+
+    A transaction() is one SQLite transaction: reads see one snapshot, and
+    lock_tree() or lock() take the database's single write lock.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.index_path = root / STORE_DB
+        # Commands run one at a time, so `task.py serve` threads can share it
+        self.db = sqlite3.connect(
+            self.index_path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SQLITE_SCHEMA)
+        self._depth = 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        if self._depth:
+            yield  # Already in one
+            return
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            if self.db.in_transaction:
+                self.db.execute("ROLLBACK")
+            raise
+        else:
+            self.commit()
+        finally:
+            self._depth -= 1
+
+    def commit(self) -> None:
+        if self.db.in_transaction:
+            with phase("write"):
+                self.db.execute("COMMIT")
+
+    def _begin(self, write: bool = False) -> None:
+        """Start the transaction on first use (outside one, autocommit)."""
+        if self._depth and not self.db.in_transaction:
+            self.db.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+
+    def lock_tree(self, exclusive: bool = False) -> None:
+        self._begin(write=True)
+
+    def lock(self, task_id: str) -> None:
+        self._begin(write=True)
+
+    def resolve(self, task_id: str) -> str:
+        self._begin()
+        for candidate in (task_id, task_id.removesuffix(".md")):
+            if self.db.execute("SELECT 1 FROM tasks WHERE id = ?", (candidate,)).fetchone():
+                return candidate
+        raise TaskError(f"Task not found: {task_id}")
+
+    def _task(self, row: tuple, deps: list[str], header_only: bool) -> Task:
+        """Build a Task from a row of _HEADER_COLUMNS (then description)."""
+        fields = dict(zip(_HEADER_COLUMNS, row))
+        for column in _JSON_COLUMNS:
+            fields[column] = json.loads(fields[column])
+        fields["deps"] = deps
+        fields["status"] = sys.intern(fields["status"])
+        if header_only:
+            return _StoredTask(self, **fields)
+        return Task(**fields, description=row[len(_HEADER_COLUMNS)])
+
+    def load(self, task_id: str, header_only: bool = False) -> Task:
+        task_id = self.resolve(task_id)
+        columns = _HEADER_COLUMNS if header_only else (*_HEADER_COLUMNS, "description")
+        with phase("query"):
+            row = self.db.execute(
+                f"SELECT {', '.join(columns)} FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+            deps = [dep for dep, in self.db.execute(
+                "SELECT dep_id FROM deps WHERE task_id = ? ORDER BY position", (task_id,)
+            )]
+            task = self._task(row, deps, header_only)
+            if not header_only:
+                task.notes = self._notes(task_id)
+        count("tasks_read")
+        return task
+
+    def _notes(self, task_id: str) -> list[Note]:
+        return [
+            Note(text=text, created=created)
+            for created, text in self.db.execute(
+                "SELECT created, text FROM notes WHERE task_id = ? ORDER BY position",
+                (task_id,),
+            )
+        ]
+
+    def read_body(self, task_id: str) -> tuple[str, list[Note]]:
+        """Read a task's description and notes."""
+        self._begin()
+        row = self.db.execute(
+            "SELECT description FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            raise TaskError(f"Task not found: {task_id}")
+        return row[0], self._notes(task_id)
+
+    def save(self, task: Task) -> None:
+        self._begin(write=True)
+        count("tasks_written")
+        with phase("query"):
+            self._save(task)
+            self._update_rollups(task.id, own_status(task))
+
+    def _save(self, task: Task) -> None:
+        # A _StoredTask whose body was never read keeps the stored body
+        stamp_new_task(task)
+        columns = list(_HEADER_COLUMNS)
+        if body_loaded(task, "description"):
+            columns.append("description")
+        values = [
+            json.dumps(getattr(task, c)) if c in _JSON_COLUMNS else getattr(task, c)
+            for c in columns
+        ]
+        parent = task.id.rpartition("/")[0]
+        self.db.execute(
+            f"INSERT INTO tasks (parent, sort_key, {', '.join(columns)})"
+            f" VALUES ({', '.join('?' * (len(columns) + 2))})"
+            " ON CONFLICT (id) DO UPDATE SET parent = excluded.parent,"
+            " sort_key = excluded.sort_key, "
+            + ", ".join(f"{c} = excluded.{c}" for c in columns[1:]),
+            (parent, sort_key(task.id), *values),
+        )
+        self.db.execute("DELETE FROM deps WHERE task_id = ?", (task.id,))
+        self.db.executemany(
+            "INSERT INTO deps (task_id, position, dep_id) VALUES (?, ?, ?)",
+            [(task.id, i, dep) for i, dep in enumerate(task.deps)],
+        )
+        if body_loaded(task, "notes"):
+            self.db.execute("DELETE FROM notes WHERE task_id = ?", (task.id,))
+            self.db.executemany(
+                "INSERT INTO notes (task_id, position, created, text) VALUES (?, ?, ?, ?)",
+                [(task.id, i, n.created, n.text) for i, n in enumerate(task.notes)],
+            )
+
+    def append_note(self, task_id: str, note: Note) -> int:
+        task_id = self.resolve(task_id)
+        self._begin(write=True)
+        position, = self.db.execute(
+            "SELECT COUNT(*) FROM notes WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        self.db.execute(
+            "INSERT INTO notes (task_id, position, created, text) VALUES (?, ?, ?, ?)",
+            (task_id, position, note.created, note.text),
+        )
+        self.db.execute("UPDATE tasks SET updated = ? WHERE id = ?", (note.created, task_id))
+        return position + 1
+
+    def walk(
+        self,
+        fields: Collection[str] | None = None,
+        status: str | None = None,
+        since: str | None = None,
+    ) -> Iterator[tuple[str, Task]]:
+        self._begin()
+        header_only = fields is not None and BODY_FIELDS.isdisjoint(fields)
+        columns = _HEADER_COLUMNS if header_only else (*_HEADER_COLUMNS, "description")
+        # With status or since, every query is narrowed through their index
+        conditions = {"status = ?": status, "updated >= ?": since}
+        params = tuple(v for v in conditions.values() if v is not None)
+        if params:
+            where = "WHERE " + " AND ".join(c for c, v in conditions.items() if v is not None)
+            subset = f"WHERE task_id IN (SELECT id FROM tasks {where})"
+        else:
+            where, subset = "", ""
+
+        with phase("query"):
+            rows = self.db.execute(
+                f"SELECT {', '.join(columns)} FROM tasks {where} ORDER BY sort_key", params
+            ).fetchall()
+            deps: dict[str, list[str]] = {}
+            for task_id, dep_id in self.db.execute(
+                f"SELECT task_id, dep_id FROM deps {subset} ORDER BY task_id, position", params
+            ):
+                deps.setdefault(task_id, []).append(dep_id)
+            children: dict[str, list[str]] = {}
+            for parent, task_id in self.db.execute(
+                f"SELECT parent, id FROM tasks WHERE parent IN (SELECT id FROM tasks {where})"
+                " ORDER BY sort_key",
+                params,
+            ):
+                children.setdefault(parent, []).append(task_id)
+            notes: dict[str, list[Note]] = {}
+            if not header_only:
+                for task_id, created, text in self.db.execute(
+                    f"SELECT task_id, created, text FROM notes {subset}"
+                    " ORDER BY task_id, position",
+                    params,
+                ):
+                    notes.setdefault(task_id, []).append(Note(text=text, created=created))
+        count("tasks_read", len(rows))
+
+        for row in rows:
+            task_id = row[0]
+            task = self._task(row, deps.get(task_id, []), header_only)
+            if not header_only:
+                task.notes = notes.get(task_id, [])
+            task.children = children.get(task_id, [])
+            yield task_id, task
+
+    def stamps(self) -> Iterator[tuple[str, object]]:
+        # Every write through the store sets `updated`
+        self._begin()
+        with phase("query"):
+            rows = self.db.execute("SELECT id, updated FROM tasks").fetchall()
+        yield from rows
+
+    def next_prefix(self, parent_id: str = "") -> str:
+        self._begin()
+        return prefix_after(
+            task_id.rpartition("/")[2]
+            for task_id, in self.db.execute("SELECT id FROM tasks WHERE parent = ?", (parent_id,))
+        )
+
+    def promote(self, task_id: str) -> None:
+        self.resolve(task_id)  # Any task can have children
+
+    def _subtree(self, task_id: str) -> list[str]:
+        """IDs of task_id and its descendants, parents first."""
+        prefix = sort_key(f"{task_id}/")
+        return [
+            row[0] for row in self.db.execute(
+                "SELECT id FROM tasks WHERE id = ? OR (sort_key >= ? AND sort_key < ?)"
+                " ORDER BY sort_key",
+                (task_id, prefix, f"{prefix[:-1]}\x02"),
+            )
+        ]
+
+    def remove(self, task_id: str, op: str = "removed") -> None:
+        task_id = self.resolve(task_id)
+        self._begin(write=True)
+        # Deps and notes go with their tasks (ON DELETE CASCADE)
+        subtree = [(t,) for t in self._subtree(task_id)]
+        self.db.executemany("DELETE FROM tasks WHERE id = ?", subtree)
+        self.db.executemany("DELETE FROM rollups WHERE parent = ?", subtree)
+        self._update_rollups(task_id, None)
+        self.db.execute(
+            "INSERT INTO changes (at, op, id) VALUES (?, ?, ?)", (now_iso(), op, task_id)
+        )
+
+    def move(self, old_id: str, new_id: str) -> None:
+        old_id = self.resolve(old_id)
+        self._begin(write=True)
+        renamed = []
+        for task_id in self._subtree(old_id):
+            moved = f"{new_id}{task_id[len(old_id):]}"
+            renamed.append((moved, moved.rpartition("/")[0], sort_key(moved), task_id))
+        # Deps and notes follow their tasks (ON UPDATE CASCADE)
+        self.db.executemany(
+            "UPDATE tasks SET id = ?, parent = ?, sort_key = ? WHERE id = ?", renamed
+        )
+        self.db.executemany(
+            "UPDATE rollups SET parent = ? WHERE parent = ?",
+            [(moved, task_id) for moved, _, _, task_id in renamed],
+        )
+        self._update_rollups(old_id, None)
+        self._update_rollups(new_id, own_status(self.load(new_id, header_only=True)))
+        self.db.execute(
+            "INSERT INTO changes (at, op, id, new_id) VALUES (?, 'moved', ?, ?)",
+            (now_iso(), old_id, new_id),
+        )
+
+    def changes(self, since: str, after: int | None = None) -> tuple[list[dict], int]:
+        self._begin()
+        if after is None:
+            where, param = "at >= ?", since
+        else:
+            where, param = "position > ?", after
+        with phase("query"):
+            rows = self.db.execute(
+                f"SELECT position, at, op, id, new_id FROM changes WHERE {where}"
+                " ORDER BY position",
+                (param,),
+            ).fetchall()
+            last, = self.db.execute("SELECT COALESCE(MAX(position), 0) FROM changes").fetchone()
+        changes = []
+        for _, at, op, task_id, new_id in rows:
+            change = {"op": op, "id": task_id, "at": at}
+            if new_id is not None:
+                change["new_id"] = new_id
+            changes.append(change)
+        return changes, last
+
+    def clear(self) -> None:
+        self._begin(write=True)
+        self.db.execute("DELETE FROM tasks")
+        self._clear_rollups()
+
+    def reindex(self) -> int:
+        self._begin(write=True)
+        self.db.execute("REINDEX")
+        self.db.execute("ANALYZE")
+        self.rebuild_rollups()
+        return self.db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def _read_rollups(self, parent_id: str) -> dict[str, dict] | None:
+        self._begin()
+        rows = self.db.execute(
+            "SELECT name, entry FROM rollups WHERE parent = ?", (parent_id,)
+        ).fetchall()
+        return {name: json.loads(entry) for name, entry in rows} or None
+
+    def _write_rollups(self, parent_id: str, entries: dict[str, dict]) -> None:
+        self._begin(write=True)
+        self.db.execute("DELETE FROM rollups WHERE parent = ?", (parent_id,))
+        self.db.executemany(
+            "INSERT INTO rollups (parent, name, entry) VALUES (?, ?, ?)",
+            [(parent_id, name, json.dumps(entry)) for name, entry in entries.items()],
+        )
+
+    def _clear_rollups(self) -> None:
+        self._begin(write=True)
+        self.db.execute("DELETE FROM rollups")
+
+
+# =============================================================================
+# Backend Selection
+# =============================================================================
+
+BACKENDS: dict[str, type[TaskStore]] = {
+    "markdown": MarkdownStore,
+    "sqlite": SqliteStore,
+}
+
+# Stores opened by this process, keyed by (backend, root)
+_stores: dict[tuple[str, Path], TaskStore] = {}
+
+
+def store_backend(root: Path) -> str:
+    """Return the backend in use for root: $TASK_BACKEND, else by what exists."""
+    backend = os.environ.get(BACKEND_ENV)
+    if backend:
+        if backend not in BACKENDS:
+            raise TaskError(
+                f"{BACKEND_ENV} must be one of {', '.join(BACKENDS)}, got {backend!r}"
+            )
+        return backend
+    return "sqlite" if (root / STORE_DB).exists() else "markdown"
+
+
+def open_store(root: Path | None = None, backend: str | None = None) -> TaskStore:
+    """Open (once per process) the store for a tasks root."""
+    if root is None:
+        root = require_tasks_root()
+    if backend is None:
+        backend = store_backend(root)
+    key = (backend, root)
+    if key not in _stores:
+        _stores[key] = BACKENDS[backend](root)
+    return _stores[key]
+
+
+def copy_tasks(source: TaskStore, target: TaskStore) -> int:
+    """Replace every task in target with those in source. Returns the count."""
+    target.clear()
+    count = 0
+    for task_id, task in source.walk():
+        parent_id = task_id.rpartition("/")[0]
+        if parent_id:
+            target.promote(parent_id)  # Parents come first in the walk
+        target.save(task)
+        count += 1
+    return count
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Memory benchmark for tasks held in memory.
+
+Usage:
+    python3 tests/bench_memory.py                  # 1k and 50k tasks
+    python3 tests/bench_memory.py --tasks 200000   # custom sizes
+
+Generates a synthetic tree (see bench_tasks.generate_tree), walks it once
+and keeps the index records, then measures with tracemalloc the memory
+held by the tasks built from them, per task:
+- reference: the previous Task and Note (kept below as ReferenceTask and
+  ReferenceNote), plain dataclasses with an instance dict each and
+  timestamp defaults made in __post_init__
+- current: task_fs.Task and task_fs.Note, and header-only LazyTasks
+
+Prints one JSON object per size.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import task_fs  # noqa: E402
+from bench_tasks import generate_tree  # noqa: E402
+
+
+# Reference: Task and Note before they were slotted.
+
+
+@dataclass
+class ReferenceNote:
+    text: str
+    created: str = ""
+
+    def __post_init__(self):
+        if not self.created:
+            self.created = task_fs.now_iso()
+
+
+@dataclass
+class ReferenceTask:
+    id: str
+    title: str
+    status: str = "pending"
+    description: str = ""
+    deps: list[str] = field(default_factory=list)
+    approach: str = ""
+    criteria: list[str] = field(default_factory=list)
+    files: list[str] = field(default_factory=list)
+    notes: list[ReferenceNote] = field(default_factory=list)
+    created: str = ""
+    updated: str = ""
+    started: str = ""
+    completed: str = ""
+    blocked_reason: str = ""
+    children: list[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        if not self.created:
+            self.created = task_fs.now_iso()
+        if not self.updated:
+            self.updated = task_fs.now_iso()
+
+
+def reference_task(record: dict, path: Path) -> ReferenceTask:
+    notes = [ReferenceNote(**note) for note in record["notes"]]
+    return ReferenceTask(**{**record, "notes": notes})
+
+
+def header_task(record: dict, path: Path) -> task_fs.Task:
+    header = {k: v for k, v in record.items() if k not in task_fs.BODY_FIELDS}
+    return task_fs.task_from_record(header, path)
+
+
+def build_all(lines: list[str], build) -> list:
+    # Decode each record as it is used, as an index load or a walk would
+    path = Path("task.md")
+    return [build(json.loads(line), path) for line in lines]
+
+
+def measure(lines: list[str], build) -> tuple[int, float]:
+    """Bytes held by the tasks build() makes from JSON records, and the build time."""
+    start = time.perf_counter()
+    build_all(lines, build)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    tasks = build_all(lines, build)
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tasks
+    return held, elapsed
+
+
+def bench(tasks: int, args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / task_fs.TASKS_DIR
+        root.mkdir(parents=True)
+        generate_tree(root, tasks, notes=args.notes)
+        lines = [
+            json.dumps(task_fs.task_to_record(task))
+            for _, task in task_fs.walk_tasks(root, use_index=False)
+        ]
+
+    result: dict = {"tasks": tasks}
+    variants = {
+        "reference": reference_task,
+        "current": task_fs.task_from_record,
+        "header_only": header_task,
+    }
+    for name, build in variants.items():
+        held, elapsed = measure(lines, build)
+        result[f"{name}_bytes_per_task"] = round(held / tasks)
+        result[f"{name}_ms"] = round(elapsed * 1000, 3)
+    result["saving"] = round(
+        1 - result["current_bytes_per_task"] / result["reference_bytes_per_task"], 3
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, nargs="*", default=[1_000, 50_000])
+    parser.add_argument("--notes", type=int, default=2, help="Mean notes per task")
+    args = parser.parse_args()
+
+    for tasks in args.tasks:
+        print(json.dumps(bench(tasks, args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for task file parsing.
+
+Usage:
+    python3 tests/bench_parse.py                 # 1k- and 100k-line tasks
+    python3 tests/bench_parse.py --lines 5000    # custom sizes
+    python3 tests/bench_parse.py --repeat 20     # more timing samples
+
+Times task_fs.tokenize_task against the previous regex-per-field parser
+(kept below as reference_parse) on synthetic tasks whose size comes from a
+long note history, and checks that both produce identical results.
+Prints one JSON object per size.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import task_fs  # noqa: E402
+
+
+def synthetic_task(lines: int) -> str:
+    """Render a task whose body is about `lines` lines long, mostly notes."""
+    notes = [
+        task_fs.Note(
+            text=f"Finding {i}: checked module_{i % 97}.py\nand updated the tests.",
+            created=f"2026-01-{1 + i % 28:02d}T{i % 24:02d}:00:00+00:00",
+        )
+        for i in range(max(lines // 5, 1))  # Each note renders as 5 lines
+    ]
+    task = task_fs.Task(
+        id="01-synthetic",
+        title="Synthetic task",
+        status="in_progress",
+        description="A generated task.\n\nUsed to measure parse cost.",
+        deps=["02-other", "03-more"],
+        approach="Parse it: many times",
+        criteria=["Fast", "Identical"],
+        files=["scripts/task_fs.py"],
+        notes=notes,
+        created="2026-01-01T00:00:00+00:00",
+        updated="2026-01-02T00:00:00+00:00",
+    )
+    return task_fs.render_task(task)
+
+
+# Reference: the parser tokenize_task replaced, one regex pass per field.
+
+
+def reference_frontmatter(text: str) -> dict:
+    result = {}
+    lines = text.strip().split("\n")
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            i += 1
+            continue
+        match = re.match(r'^([a-z_]+):\s*(.*)$', line)
+        if not match:
+            i += 1
+            continue
+        key = match.group(1)
+        value = match.group(2).strip()
+        if value:
+            if (value.startswith('"') and value.endswith('"')) or \
+               (value.startswith("'") and value.endswith("'")):
+                value = value[1:-1]
+            result[key] = value
+        else:
+            items = []
+            i += 1
+            while i < len(lines):
+                next_line = lines[i]
+                list_match = re.match(r'^  - (.+)$', next_line)
+                if list_match:
+                    items.append(list_match.group(1).strip())
+                    i += 1
+                elif next_line.strip() == "" or re.match(r'^[a-z_]+:', next_line):
+                    break
+                else:
+                    i += 1
+            result[key] = items
+            continue
+        i += 1
+    return result
+
+
+def reference_parse(content: str, stem: str) -> tuple:
+    match = re.match(r"^---\n(.+?)\n---\n(.*)$", content, re.DOTALL)
+    if not match:
+        raise task_fs.TaskError("no frontmatter")
+    frontmatter = reference_frontmatter(match.group(1))
+    body = match.group(2).strip()
+
+    title_match = re.match(r"^# (.+)$", body, re.MULTILINE)
+    title = title_match.group(1) if title_match else stem
+
+    description = ""
+    if body.startswith("# "):
+        rest = body.partition("\n")[2]
+        section = re.search(r"^## ", rest, re.MULTILINE)
+        description = (rest[:section.start()] if section else rest).strip()
+
+    notes = []
+    notes_match = re.search(r"## Notes\n(.+)$", body, re.DOTALL)
+    if notes_match:
+        note_pattern = r"### (\d{4}-\d{2}-\d{2}T[^\n]+)\n\n(.*?)(?=\n### |\Z)"
+        for timestamp, text in re.findall(note_pattern, notes_match.group(1), re.DOTALL):
+            notes.append(task_fs.Note(text=text.strip(), created=timestamp))
+
+    return frontmatter, title, description, notes
+
+
+def best_of(repeat: int, func, *args) -> float:
+    """Fastest of `repeat` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="*", default=[1_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    path = Path("01-synthetic.md")
+    for lines in args.lines:
+        content = synthetic_task(lines)
+        reference = reference_parse(content, path.stem)
+        current = task_fs.tokenize_task(content, path)
+        if current != reference:
+            sys.exit(f"Parsers disagree on the {lines}-line task")
+
+        old = best_of(args.repeat, reference_parse, content, path.stem)
+        new = best_of(args.repeat, task_fs.tokenize_task, content, path)
+        print(json.dumps({
+            "lines": content.count("\n"),
+            "bytes": len(content.encode()),
+            "reference_ms": round(old * 1000, 3),
+            "tokenize_ms": round(new * 1000, 3),
+            "speedup": round(old / new, 2),
+        }))
+
+
+if __name__ == "__main__":
+    main()
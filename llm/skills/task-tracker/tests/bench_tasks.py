@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Scaling benchmark for task.py on synthetic task trees.
+
+Usage:
+    python3 tests/bench_tasks.py                          # 100, 1k and 10k tasks
+    python3 tests/bench_tasks.py --tasks 100000           # custom sizes
+    python3 tests/bench_tasks.py --breadth 5 --depth 4 --deps 0.5 --notes 3
+    python3 tests/bench_tasks.py --backend sqlite         # after export --to sqlite
+    python3 tests/bench_tasks.py --save-baseline base.json
+    python3 tests/bench_tasks.py --baseline base.json     # exit 1 on regressions
+
+For each size, generates a .claude/tasks/ tree in a temporary directory,
+then times:
+- commands: each task.py subcommand (and task-render.py) end to end, as a
+  fresh process, best of --repeat runs
+- command_phases: one more run of each subcommand with --profile, split
+  into the phases it reports (see task_profile)
+- phases: the work inside those commands, in this process: walking the
+  tree cold and cached, header-only walks, the dependency graph, rendering
+  and committing writes
+
+Prints one JSON object per size. Against a --baseline saved earlier, a
+timing regresses when it is more than --tolerance slower and at least
+--slack-ms slower in absolute terms.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+import task_fs  # noqa: E402
+import task_store  # noqa: E402
+from task_graph import GRAPH_FIELDS, TaskGraph  # noqa: E402
+
+# Status mix of generated tasks
+STATUSES = (
+    ["complete"] * 4 + ["pending"] * 4 + ["in_progress", "blocked"]
+)
+
+
+# =============================================================================
+# Synthetic Trees
+# =============================================================================
+
+
+def tree_shape(tasks: int, breadth: int, depth: int) -> list[str]:
+    """
+    Task IDs for a tree of `tasks` tasks, filled breadth-first.
+
+    Each task gets up to `breadth` children, down to `depth` levels; once
+    every level is full, more top-level tasks are added.
+    """
+    ids: list[str] = []
+    counts: dict[str, int] = {}
+    queue: deque[tuple[str, int]] = deque()
+    while len(ids) < tasks:
+        parent, level = queue.popleft() if queue else ("", 0)
+        for _ in range(breadth if parent else max(breadth, 1)):
+            if len(ids) == tasks:
+                break
+            counts[parent] = counts.get(parent, 0) + 1
+            name = f"{counts[parent]:02d}-task-{len(ids)}"
+            task_id = f"{parent}/{name}" if parent else name
+            ids.append(task_id)
+            if level + 1 < depth:
+                queue.append((task_id, level + 1))
+    return ids
+
+
+def generate_tree(
+    root: Path,
+    tasks: int,
+    breadth: int = 10,
+    depth: int = 3,
+    deps: float = 0.3,
+    notes: int = 2,
+    seed: int = 0,
+) -> int:
+    """
+    Write a synthetic markdown task tree under root. Returns bytes written.
+
+    deps is the share of tasks with dependencies (one to three, always on
+    earlier tasks, so the graph is acyclic); notes is the mean note count.
+    Files are backdated so the parse cache treats them as settled.
+    """
+    rng = random.Random(seed)
+    ids = tree_shape(tasks, breadth, depth)
+    parents = {task_id.rpartition("/")[0] for task_id in ids}
+    old = time.time() - 3600
+    written = 0
+    for i, task_id in enumerate(ids):
+        task = task_fs.Task(
+            id=task_id,
+            title=f"Task {i}",
+            status=rng.choice(STATUSES),
+            description=f"Synthetic task {i}.\n\nGenerated for benchmarks.",
+            approach="Follow the plan",
+            criteria=["It works", "It is tested"],
+            files=[f"src/module_{i % 50}.py"],
+            created="2026-01-01T00:00:00+00:00",
+            updated="2026-01-02T00:00:00+00:00",
+        )
+        if i and rng.random() < deps:
+            task.deps = sorted({ids[rng.randrange(i)] for _ in range(rng.randint(1, 3))})
+        task.notes = [
+            task_fs.Note(
+                text=f"Finding {n} on task {i}.",
+                created=f"2026-01-{1 + (i + n) % 28:02d}T{n % 24:02d}:00:00+00:00",
+            )
+            for n in range(rng.randint(0, 2 * notes))
+        ]
+
+        if task_id in parents:
+            path = root / task_id / task_fs.INDEX_FILE
+        else:
+            path = root / f"{task_id}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = task_fs.render_task(task)
+        path.write_text(text)
+        os.utime(path, (old, old))
+        written += len(text.encode())
+    return written
+
+
+# =============================================================================
+# Timing
+# =============================================================================
+
+
+def best_of(repeat: int, func, *args) -> float:
+    """Fastest of `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+
+def task_py(project: Path, *args: str) -> dict:
+    """Run task.py directly (no server) and return its JSON output."""
+    r = subprocess.run(
+        [sys.executable, str(SCRIPTS / "task.py"), *args],
+        capture_output=True, text=True, cwd=project,
+        env={**os.environ, "TASK_NO_SERVER": "1"},
+    )
+    result = json.loads(r.stdout)
+    if not result["ok"]:
+        sys.exit(f"task.py {' '.join(args)} failed: {result['error']}")
+    return result
+
+
+def render(project: Path) -> None:
+    subprocess.run(
+        [sys.executable, str(SCRIPTS / "task-render.py")],
+        capture_output=True, check=True, cwd=project,
+    )
+
+
+def time_commands(project: Path, repeat: int) -> tuple[dict, dict]:
+    """End-to-end milliseconds per subcommand, and its profiled phases."""
+    tasks = task_py(project, "list")["tasks"]
+    deepest = max(tasks, key=lambda t: (t["id"].count("/"), len(t["deps"])))["id"]
+    # A task others depend on, so move rewrites dependants too
+    depended = next((d for t in tasks for d in t["deps"]), tasks[0]["id"])
+
+    commands = {
+        "list": ["list"],
+        "list_status": ["list", "--status", "blocked"],
+        "next": ["next"],
+        "show": ["show", deepest],
+        "notes": ["notes"],
+        "search": ["search", "finding"],
+        "add": ["add", "Benchmark task"],
+    }
+    timings = {name: best_of(repeat, task_py, project, *argv) for name, argv in commands.items()}
+    phases = {
+        name: task_py(project, "--profile", *argv)["timings"]["phases"]
+        for name, argv in commands.items()
+    }
+    timings["render"] = best_of(repeat, render, project)
+
+    moving = [depended]
+
+    def move(*options: str) -> dict:
+        result = task_py(project, *options, "move", moving[-1])
+        moving.append(result["new_id"])
+        return result
+
+    timings["move"] = best_of(repeat, move)
+    phases["move"] = move("--profile")["timings"]["phases"]
+    return timings, phases
+
+
+def time_phases(root: Path, store: task_store.TaskStore, repeat: int) -> dict[str, float]:
+    """In-process milliseconds for the phases commands are made of."""
+
+    def walk_cold() -> None:
+        if store.name == "markdown":
+            (root / task_fs.TASK_INDEX_FILE).unlink(missing_ok=True)
+        list(store.walk())
+
+    def walk_cached() -> None:
+        list(store.walk())
+
+    def walk_header() -> None:
+        list(store.walk(fields=GRAPH_FIELDS))
+
+    graph_tasks = list(store.walk(fields=GRAPH_FIELDS))
+
+    def graph() -> None:
+        built = TaskGraph(graph_tasks)
+        built.next_ready()
+        built.components()
+
+    full = [task for _, task in store.walk()]
+
+    def render_tasks() -> None:
+        for task in full:
+            task_fs.render_task(task)
+
+    def commit() -> None:
+        with store.transaction():
+            store.lock_tree(exclusive=True)
+            for task in full[:100]:
+                store.save(task)
+
+    return {
+        "walk_cold": best_of(repeat, walk_cold),
+        "walk_cached": best_of(repeat, walk_cached),
+        "walk_header": best_of(repeat, walk_header),
+        "graph": best_of(repeat, graph),
+        "render_tasks": best_of(repeat, render_tasks),
+        "commit_100": best_of(repeat, commit),
+    }
+
+
+def bench(tasks: int, args: argparse.Namespace) -> dict:
+    """Generate one tree and time it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        project = Path(tmp)
+        root = project / task_fs.TASKS_DIR
+        root.mkdir(parents=True)
+        size = generate_tree(
+            root, tasks, args.breadth, args.depth, args.deps, args.notes, args.seed
+        )
+        if args.backend == "sqlite":
+            task_py(project, "export", "--to", "sqlite")
+
+        store = task_store.open_store(root, args.backend)
+        phases = time_phases(root, store, args.repeat)
+        commands, command_phases = time_commands(project, args.repeat)
+    return {
+        "tasks": tasks,
+        "backend": args.backend,
+        "bytes": size,
+        "commands": commands,
+        "phases": phases,
+        "command_phases": command_phases,
+    }
+
+
+# =============================================================================
+# Baselines
+# =============================================================================
+
+
+def find_regressions(
+    results: list[dict], baseline: list[dict], tolerance: float, slack_ms: float
+) -> list[dict]:
+    """Timings slower than the baseline run with the same size and backend."""
+    previous = {(r["tasks"], r["backend"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["tasks"], result["backend"]))
+        if before is None:
+            continue
+        for group in ("commands", "phases"):
+            for name, ms in result[group].items():
+                old = before.get(group, {}).get(name)
+                if old is None:
+                    continue
+                if ms > old * (1 + tolerance) and ms - old >= slack_ms:
+                    regressions.append({
+                        "tasks": result["tasks"],
+                        "backend": result["backend"],
+                        "timing": f"{group}.{name}",
+                        "baseline_ms": old,
+                        "ms": ms,
+                    })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, nargs="*", default=[100, 1_000, 10_000])
+    parser.add_argument("--breadth", type=int, default=10, help="Children per task")
+    parser.add_argument("--depth", type=int, default=3, help="Levels of nesting")
+    parser.add_argument("--deps", type=float, default=0.3, help="Share of tasks with deps")
+    parser.add_argument("--notes", type=int, default=2, help="Mean notes per task")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=task_store.BACKENDS, default="markdown")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, help="Fail on regressions against this file")
+    parser.add_argument("--save-baseline", type=Path, help="Write the results here")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown ratio")
+    parser.add_argument("--slack-ms", type=float, default=20, help="Ignore smaller slowdowns")
+    args = parser.parse_args()
+
+    results = []
+    for tasks in args.tasks:
+        result = bench(tasks, args)
+        print(json.dumps(result), flush=True)
+        results.append(result)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2) + "\n")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = find_regressions(results, baseline, args.tolerance, args.slack_ms)
+        print(json.dumps({"regressions": regressions}))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "pytest>=8.0",
+# ]
+# ///
+"""Run the task tracker test suite.
+
+Usage:
+    uv run tests/run.py              # run all tests
+    uv run tests/run.py -v           # verbose output
+    uv run tests/run.py -k index     # run tests matching 'index'
+    uv run tests/run.py --tb=short   # shorter tracebacks
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.exit(pytest.main([str(Path(__file__).parent), *sys.argv[1:]]))
@@ -0,0 +1,1502 @@
+"""Tests for task tracker scripts.
+
+Run via: uv run tests/run.py [-v] [-k pattern]
+
+Every test works in a fresh temporary project with its own .claude/tasks/.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+import task_fs  # noqa: E402
+from task_graph import TaskGraph  # noqa: E402
+
+
+def run(cwd: Path, *args: str, stdin: str = "", env: dict | None = None) -> dict:
+    """Run task.py in cwd and return the decoded JSON output."""
+    r = subprocess.run(
+        [sys.executable, str(SCRIPTS / "task.py"), *args],
+        capture_output=True, text=True, cwd=cwd, input=stdin,
+        env={**os.environ, **env} if env else None,
+    )
+    return json.loads(r.stdout)
+
+
+@pytest.fixture
+def project(tmp_path):
+    """A project directory with an initialized tasks root."""
+    assert run(tmp_path, "init")["ok"]
+    return tmp_path
+
+
+def tasks_root(project: Path) -> Path:
+    return project / task_fs.TASKS_DIR
+
+
+# ---- task index ----
+
+
+class TestTaskIndex:
+    def test_list_writes_index(self, project):
+        run(project, "add", "First")
+        run(project, "add", "Second", "--parent", "01-first")
+        listed = run(project, "list")
+        assert [t["id"] for t in listed["tasks"]] == ["01-first", "01-first/01-second"]
+        # Freshly written files are too recent to cache
+        index = task_fs.load_task_index(tasks_root(project))
+        assert index == {}
+
+    def test_cached_walk_matches_parse(self, project, monkeypatch):
+        root = tasks_root(project)
+        run(project, "add", "First", "--criteria", "a", "b")
+        run(project, "note", "01-first", "Something learned")
+        run(project, "add", "Child", "--parent", "01-first")
+        uncached = list(task_fs.walk_tasks(root, use_index=False))
+
+        # Treat every file as old enough to cache
+        monkeypatch.setattr(task_fs, "RACY_WINDOW_NS", -10**12)
+        assert list(task_fs.walk_tasks(root)) == uncached
+        index = task_fs.load_task_index(root)
+        assert sorted(index) == ["01-first/00-index.md", "01-first/01-child.md"]
+        assert list(task_fs.walk_tasks(root)) == uncached
+
+    def test_stale_entry_is_reparsed(self, project, monkeypatch):
+        root = tasks_root(project)
+        run(project, "add", "First")
+        monkeypatch.setattr(task_fs, "RACY_WINDOW_NS", -10**12)
+        list(task_fs.walk_tasks(root))
+        path = root / "01-first.md"
+        path.write_text(path.read_text().replace("# First", "# Renamed"))
+        [(_, task)] = task_fs.walk_tasks(root)
+        assert task.title == "Renamed"
+
+    def test_corrupt_index_falls_back(self, project):
+        run(project, "add", "First")
+        (tasks_root(project) / task_fs.TASK_INDEX_FILE).write_text("{not json")
+        assert run(project, "list")["count"] == 1
+
+    def test_reindex(self, project):
+        run(project, "add", "First")
+        run(project, "add", "Second")
+        result = run(project, "reindex")
+        assert result["ok"]
+        assert result["indexed"] == 2
+
+
+# ---- parsing ----
+
+
+class TestParsing:
+    def test_round_trip(self, tmp_path):
+        task = task_fs.Task(
+            id="01-x", title="X", status="blocked", deps=["02-y"],
+            description="First paragraph.\n\nSecond paragraph.",
+            approach="Use a: colon", criteria=["a", "b"], files=["f.py"],
+            notes=[task_fs.Note("one", "2026-01-01T00:00:00+00:00"),
+                   task_fs.Note("two\n\nlines", "2026-01-02T00:00:00+00:00")],
+            blocked_reason="waiting",
+        )
+        path = tmp_path / "01-x.md"
+        path.write_text(task_fs.render_task(task))
+        assert task_fs.parse_task(path, tmp_path) == task
+
+    @pytest.mark.parametrize("body", [
+        "# T\n",
+        "no title\n\n## Notes\n\n### 2026-01-01T00:00:00+00:00\n\nx\n",
+        "# T\n\nDesc\n\n## Notes\n",
+        "# T\n\n## Approach\n\na\n\n## Notes\n\n### bad\n\nskipped\n"
+        "### 2026-01-01T00:00:00+00:00\n\n### 2026-01-02T00:00:00+00:00\n\ny",
+        "# T\n# U\n\n### 2026-01-01T00:00:00+00:00\n\nnot a note",
+    ])
+    def test_tokenizer_matches_reference(self, tmp_path, body):
+        from bench_parse import reference_parse
+
+        content = "---\nstatus: pending\ndeps:\n  - 01-a\ncriteria: []\n---\n" + body
+        path = tmp_path / "01-t.md"
+        assert task_fs.tokenize_task(content, path) == reference_parse(content, path.stem)
+
+    def test_notes_do_not_leak_into_description(self, project):
+        run(project, "add", "First")
+        run(project, "note", "01-first", "one")
+        run(project, "note", "01-first", "two")
+        task = run(project, "show", "01-first")["task"]
+        assert task["description"] == ""
+        assert [n["text"] for n in task["notes"]] == ["one", "two"]
+
+    def test_header_only_is_lazy(self, project):
+        root = tasks_root(project)
+        run(project, "add", "First", "--description", "Details", "--deps")
+        run(project, "note", "01-first", "Learned")
+        path = root / "01-first.md"
+        full = task_fs.parse_task(path, root)
+        lazy = task_fs.parse_task(path, root, header_only=True)
+        assert not task_fs.body_loaded(lazy, "notes")
+        assert lazy.title == "First"
+        assert lazy == full
+        assert lazy.notes[0].text == "Learned"
+
+    def test_header_walk_then_full_walk(self, project, monkeypatch):
+        root = tasks_root(project)
+        run(project, "add", "First", "--description", "Details")
+        monkeypatch.setattr(task_fs, "RACY_WINDOW_NS", -10**12)
+        [(_, lazy)] = task_fs.walk_tasks(root, fields=("status",))
+        assert isinstance(lazy, task_fs.LazyTask)
+        [(_, full)] = task_fs.walk_tasks(root)
+        assert not isinstance(full, task_fs.LazyTask)
+        assert full.description == "Details"
+
+    def test_slotted(self, project):
+        run(project, "add", "First", "-d", "Details")
+        [(_, task)] = task_fs.walk_tasks(tasks_root(project), fields=("status",))
+        assert not hasattr(task, "__dict__")
+        assert task.status is sys.intern("pending")
+        assert task.description == "Details"
+        # Timestamps are made when a new task is rendered, not constructed
+        new = task_fs.Task(id="02-new", title="New", notes=[task_fs.Note("n")])
+        assert (new.created, new.notes[0].created) == ("", "")
+        task_fs.render_task(new)
+        assert new.created == new.updated == new.notes[0].created != ""
+
+
+# ---- notes ----
+
+
+class TestNotes:
+    def test_append_matches_full_render(self, project):
+        root = tasks_root(project)
+        run(project, "add", "First", "--description", "Details", "--deps")
+        path = root / "01-first.md"
+        first = run(project, "note", "01-first", "one")  # No ## Notes yet: full render
+        assert first["note_count"] == 1
+        before = path.read_text()
+
+        second = run(project, "note", "01-first", "two\n\nlines")
+        assert second["note_count"] == 2
+        after = path.read_text()
+        task = task_fs.parse_task(path, root)
+        assert after == task_fs.render_task(task)
+        assert after.startswith(before.split("updated:")[0])
+        assert after.endswith(f"### {second['note']['created']}\n\ntwo\n\nlines\n")
+        assert task.updated == second["note"]["created"]
+        assert [n.text for n in task.notes] == ["one", "two\n\nlines"]
+
+    def test_falls_back_without_notes_section(self, tmp_path):
+        path = tmp_path / "01-x.md"
+        path.write_text(task_fs.render_task(task_fs.Task(id="01-x", title="X")))
+        note = task_fs.Note("n", task_fs.now_iso())
+        assert task_fs.append_note(path, note, note.created) is None
+
+    def test_falls_back_on_updated_length_change(self, tmp_path):
+        task = task_fs.Task(
+            id="01-x", title="X", updated="2026-01-01T00:00:00+00:00",
+            notes=[task_fs.Note("one", "2026-01-01T00:00:00+00:00")],
+        )
+        path = tmp_path / "01-x.md"
+        path.write_text(task_fs.render_task(task))
+        note = task_fs.Note("two", "2026-01-02T00:00:00.000001+00:00")
+        assert task_fs.append_note(path, note, note.created) is None
+        note = task_fs.Note("two", "2026-01-02T00:00:00+00:00")
+        assert task_fs.append_note(path, note, note.created) == 2
+        task.notes.append(note)
+        task.updated = note.created
+        assert path.read_text() == task_fs.render_task(task)
+
+    def test_batch_appends_to_buffered_text(self, project):
+        run(project, "add", "First")
+        run(project, "note", "01-first", "zero")
+        result = run(project, "batch", stdin=jsonl(
+            {"op": "update", "id": "01-first", "description": "Changed"},
+            {"op": "note", "id": "01-first", "text": "one"},
+            {"op": "note", "id": "01-first", "text": "two"},
+        ))
+        assert [r.get("note_count") for r in result["results"]] == [None, 2, 3]
+        task = run(project, "show", "01-first")["task"]
+        assert task["description"] == "Changed"
+        assert [n["text"] for n in task["notes"]] == ["zero", "one", "two"]
+
+    def test_batch_counts_on_from_first_append(self, project):
+        run(project, "add", "First")
+        run(project, "note", "01-first", "zero")
+        result = run(project, "--profile", "batch", stdin=jsonl(
+            {"op": "note", "id": "01-first", "text": "one"},
+            {"op": "note", "id": "01-first", "text": "two\n\n### 2026-01-01T00:00:00+00:00\n\nx"},
+            {"op": "note", "id": "01-first", "text": "four"},
+        ))
+        assert [r["note_count"] for r in result["results"]] == [2, 4, 5]
+        assert result["timings"]["counters"]["files_read"] == 1
+        task = task_fs.parse_task(tasks_root(project) / "01-first.md", tasks_root(project))
+        assert len(task.notes) == 5
+
+
+# ---- journaled writes ----
+
+
+class TestJournal:
+    def stage(self, project, *titles):
+        """Add tasks, then stage a rewrite of each inside buffered_writes()."""
+        root = tasks_root(project)
+        for title in titles:
+            run(project, "add", title)
+        paths = sorted(root.glob("*.md"))
+        for path in paths:
+            task = task_fs.parse_task(path, root)
+            task.status = "complete"
+            task_fs.write_task(path, task)
+        return root, paths
+
+    def test_one_fsync_per_commit(self, project, monkeypatch):
+        fsyncs = []
+        monkeypatch.setattr(os, "fsync", fsyncs.append)
+        with task_fs.buffered_writes():
+            root, paths = self.stage(project, "First", "Second", "Third")
+            assert (root / "01-first.md").read_text().startswith("---\nstatus: pending")
+        assert len(fsyncs) == 1
+        assert task_fs.pending_journals(root) == []
+        assert [task_fs.parse_task(p, root).status for p in paths] == ["complete"] * 3
+
+    def test_interrupted_commit_is_replayed(self, project, monkeypatch):
+        applied = []
+
+        def crash_after_first(path, write):
+            if applied:
+                raise KeyboardInterrupt
+            applied.append(path)
+            task_fs.replace_file(path, write["text"])
+
+        monkeypatch.setattr(task_fs, "apply_write", crash_after_first)
+        with pytest.raises(KeyboardInterrupt):
+            with task_fs.buffered_writes():
+                root, paths = self.stage(project, "First", "Second")
+        assert len(task_fs.pending_journals(root)) == 1
+        assert task_fs.parse_task(paths[1], root).status == "pending"
+
+        listed = run(project, "list")
+        assert [t["status"] for t in listed["tasks"]] == ["complete", "complete"]
+        assert task_fs.pending_journals(root) == []
+
+    def test_torn_journal_is_rolled_back(self, project):
+        root = tasks_root(project)
+        run(project, "add", "First")
+        before = (root / "01-first.md").read_text()
+        torn = root / f"{task_fs.JOURNAL_FILE}.123.tmp"
+        torn.write_text('{"version": 1, "writes": [{"path": "01-first.md", "te')
+        assert task_fs.recover_writes(root) == 0
+        assert not torn.exists()
+        assert (root / "01-first.md").read_text() == before
+
+    def test_note_append_replays_idempotently(self, project):
+        root = tasks_root(project)
+        run(project, "add", "First")
+        run(project, "note", "01-first", "one")
+        path = root / "01-first.md"
+        with task_fs.buffered_writes():
+            note = task_fs.Note("two", task_fs.now_iso())
+            assert task_fs.append_note(path, note, note.created) == 2
+            write = dict(task_fs._appends[path])
+        after = path.read_text()
+        task_fs.apply_write(path, write)
+        assert path.read_text() == after
+
+
+# ---- locking ----
+
+
+class TestLocking:
+    def test_concurrent_writers_lose_nothing(self, project):
+        run(project, "add", "First")
+        run(project, "note", "01-first", "zero")
+        procs = [
+            subprocess.Popen(
+                [sys.executable, str(SCRIPTS / "task.py"), cmd, "01-first", *extra],
+                cwd=project, stdout=subprocess.PIPE, text=True,
+            )
+            for i in range(6)
+            for cmd, extra in [("note", [f"note {i}"]), ("update", ["--approach", f"a{i}"])]
+        ]
+        assert all(json.loads(p.communicate()[0])["ok"] for p in procs)
+        task = run(project, "show", "01-first")["task"]
+        assert sorted(n["text"] for n in task["notes"]) == [f"note {i}" for i in range(6)] + ["zero"]
+
+    def test_if_updated(self, project):
+        run(project, "add", "First")
+        updated = run(project, "show", "01-first")["task"]["updated"]
+        assert run(project, "start", "01-first", "--if-updated", updated)["ok"]
+        stale = run(project, "done", "01-first", "--if-updated", updated)
+        assert not stale["ok"]
+        assert stale["error"].startswith("Task 01-first was updated at ")
+        assert run(project, "show", "01-first")["task"]["status"] == "in_progress"
+
+    def test_writers_wait_and_readers_do_not(self, project):
+        root = tasks_root(project)
+        run(project, "add", "First")
+        with task_fs.buffered_writes():
+            task_fs.lock_tree(root, exclusive=True)
+            assert run(project, "list")["count"] == 1
+            writer = subprocess.Popen(
+                [sys.executable, str(SCRIPTS / "task.py"), "start", "01-first"],
+                cwd=project, stdout=subprocess.PIPE, text=True,
+            )
+            with pytest.raises(subprocess.TimeoutExpired):
+                writer.wait(timeout=0.5)
+        assert json.loads(writer.communicate(timeout=10)[0])["ok"]
+
+    def test_lock_files_do_not_pile_up(self, project):
+        import re
+
+        run(project, "progress")  # Rollups built, so writes lock them too
+        for i in range(5):
+            task_id = run(project, "add", f"T{i}")["id"]
+            run(project, "start", task_id)
+            run(project, "remove", task_id)
+        names = sorted(p.name for p in (tasks_root(project) / task_fs.LOCKS_DIR).iterdir())
+        assert names and all(
+            re.fullmatch(r"tree\.lock|(task|rollup)-\d{3}\.lock", name) for name in names
+        ), names
+
+
+# ---- tree walk ----
+
+
+class CountingEntry:
+    """DirEntry wrapper that counts stat() calls."""
+
+    def __init__(self, entry, counts):
+        self._entry = entry
+        self._counts = counts
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+    def stat(self, **kwargs):
+        self._counts["entry_stat"] += 1
+        return self._entry.stat(**kwargs)
+
+
+@pytest.fixture
+def syscalls(monkeypatch):
+    """Count directory listings and stats made through the os module."""
+    counts = {"scandir": 0, "listdir": 0, "stat": 0, "entry_stat": 0}
+    scandir, listdir, stat = os.scandir, os.listdir, os.stat
+
+    class CountingScandir:
+        def __init__(self, path):
+            counts["scandir"] += 1
+            self._it = scandir(path)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self._it.close()
+
+        def __iter__(self):
+            return (CountingEntry(e, counts) for e in self._it)
+
+    def counting_listdir(*args, **kwargs):
+        counts["listdir"] += 1
+        return listdir(*args, **kwargs)
+
+    def counting_stat(*args, **kwargs):
+        counts["stat"] += 1
+        return stat(*args, **kwargs)
+
+    monkeypatch.setattr(os, "scandir", CountingScandir)
+    monkeypatch.setattr(os, "listdir", counting_listdir)
+    monkeypatch.setattr(os, "stat", counting_stat)
+    return counts
+
+
+class TestWalk:
+    def test_one_listing_per_directory(self, project, syscalls):
+        run(project, "add", "Auth")
+        run(project, "add", "Login", "--parent", "01-auth")
+        run(project, "add", "Session", "--parent", "01-auth")
+        run(project, "add", "Oauth", "--parent", "01-auth/02-session")
+        run(project, "add", "Docs")
+        root = tasks_root(project)
+
+        syscalls.update(dict.fromkeys(syscalls, 0))
+        tasks = dict(task_fs.walk_tasks(root, use_index=False))
+
+        assert list(tasks) == [
+            "01-auth", "01-auth/01-login", "01-auth/02-session",
+            "01-auth/02-session/01-oauth", "02-docs",
+        ]
+        assert tasks["01-auth"].children == ["01-auth/01-login", "01-auth/02-session"]
+        # root, 01-auth and 02-session, each listed once
+        assert syscalls == {"scandir": 3, "listdir": 0, "stat": 0, "entry_stat": 5}
+
+    def test_index_adds_one_stat(self, project, syscalls):
+        run(project, "add", "First")
+        run(project, "add", "Second")
+        root = tasks_root(project)
+
+        syscalls.update(dict.fromkeys(syscalls, 0))
+        list(task_fs.walk_tasks(root))
+        assert syscalls == {"scandir": 1, "listdir": 0, "stat": 1, "entry_stat": 2}
+
+
+    @pytest.mark.parametrize("process_min", [10**9, 0], ids=["threads", "processes"])
+    def test_parallel_walk_keeps_order(self, project, monkeypatch, process_min):
+        run(project, "add", "Auth", "--description", "Details")
+        run(project, "add", "Login", "--parent", "01-auth")
+        run(project, "add", "Oauth", "--parent", "01-auth/01-login")
+        run(project, "add", "Session", "--parent", "01-auth")
+        run(project, "add", "Docs")
+        root = tasks_root(project)
+        sequential = list(task_fs.walk_tasks(root, jobs=1))
+
+        monkeypatch.setattr(task_fs, "PARALLEL_MIN_FILES", 0)
+        monkeypatch.setattr(task_fs, "PROCESS_MIN_FILES", process_min)
+        assert list(task_fs.walk_tasks(root, jobs=3)) == sequential
+        header = list(task_fs.walk_tasks(root, jobs=3, fields=("status",)))
+        assert header == sequential
+        assert all(isinstance(t, task_fs.LazyTask) for _, t in header)
+
+    def test_jobs_option(self, project):
+        run(project, "add", "First")
+        assert run(project, "--jobs", "2", "list")["count"] == 1
+        result = run(project, "list", env={"TASK_JOBS": "many"})
+        assert result["error"] == "TASK_JOBS must be an integer, got 'many'"
+
+
+# ---- dependency graph ----
+
+
+class TestDependencyGraph:
+    def test_next_prefers_child_of_in_progress(self, project):
+        run(project, "add", "First")
+        run(project, "add", "Second")
+        run(project, "add", "Child", "--parent", "02-second")
+        run(project, "start", "02-second")
+        result = run(project, "next")
+        assert result["id"] == "02-second/01-child"
+        assert result["reason"] == "pending child of in_progress task"
+
+    def test_next_skips_unsatisfied_deps(self, project):
+        run(project, "add", "First")
+        run(project, "add", "Second")
+        run(project, "update", "01-first", "--deps", "02-second")
+        assert run(project, "next")["id"] == "02-second"
+        run(project, "done", "02-second")
+        assert run(project, "next")["id"] == "01-first"
+
+    def test_next_with_nothing_ready(self, project):
+        run(project, "add", "First")
+        run(project, "done", "01-first")
+        result = run(project, "next")
+        assert result["task"] is None
+
+    def test_show_reports_blockers(self, project):
+        run(project, "add", "First")
+        run(project, "add", "Second", "--deps", "01-first")
+        result = run(project, "show", "02-second")
+        assert result["deps_satisfied"] is False
+        assert result["incomplete_deps"] == ["01-first"]
+
+    def test_start_warns_on_blockers(self, project):
+        run(project, "add", "First")
+        run(project, "add", "Second", "--deps", "01-first")
+        result = run(project, "start", "02-second")
+        assert result["task"]["status"] == "in_progress"
+        assert "01-first" in result["warnings"][0]
+
+    def test_show_and_start_read_only_their_deps(self, project):
+        run(project, "add", "First")
+        run(project, "add", "Second", "--deps", "01-first")
+        run(project, "batch", stdin=jsonl(*({"op": "add", "title": f"T{i}"} for i in range(10))))
+        shown = run(project, "--profile", "show", "02-second")
+        assert shown["incomplete_deps"] == ["01-first"]
+        assert shown["timings"]["counters"]["files_read"] == 2
+        started = run(project, "--profile", "start", "02-second")
+        assert started["timings"]["counters"]["files_read"] <= 3
+
+    def test_missing_dep_blocks(self):
+        graph = TaskGraph([("a", task_fs.Task(id="a", title="A", deps=["gone"]))])
+        assert graph.blockers("a") == ["gone"]
+        assert not graph.is_ready("a")
+        assert graph.next_ready() is None
+
+
+# ---- graph analysis ----
+
+
+class TestGraphAnalysis:
+    def test_update_rejects_cycle(self, project):
+        run(project, "add", "A")
+        run(project, "add", "B", "--deps", "01-a")
+        run(project, "add", "C", "--deps", "02-b")
+        result = run(project, "update", "01-a", "--deps", "03-c")
+        assert result["error"] == "Dependency cycle: 01-a -> 03-c -> 02-b -> 01-a"
+        assert not run(project, "update", "01-a", "--deps", "01-a")["ok"]
+        assert run(project, "update", "03-c", "--deps", "01-a")["ok"]
+
+    def test_add_rejects_cycle_through_reused_id(self, project):
+        # 01-a keeps depending on 02-x after it is removed, and the next
+        # add hands out 02-x again
+        run(project, "add", "A")
+        run(project, "add", "X")
+        run(project, "update", "01-a", "--deps", "02-x")
+        run(project, "remove", "02-x")
+        result = run(project, "add", "X", "--deps", "01-a")
+        assert result["error"] == "Dependency cycle: 02-x -> 01-a -> 02-x"
+        assert run(project, "list")["count"] == 1
+
+    def test_graph_report(self, project):
+        run(project, "add", "A")
+        run(project, "add", "B", "--deps", "01-a")
+        run(project, "add", "C", "--deps", "02-b")
+        run(project, "add", "D", "--deps", "01-a")
+        run(project, "done", "01-a")
+        report = run(project, "graph")
+        assert report["acyclic"]
+        assert report["edges"] == 3
+        assert report["order"].index("01-a") < report["order"].index("02-b") < report["order"].index("03-c")
+        assert report["critical_path"] == ["01-a", "02-b", "03-c"]
+        assert report["pending_chain"] == ["02-b", "03-c"]
+
+    def test_hand_made_cycle_is_reported(self, project):
+        root = tasks_root(project)
+        run(project, "add", "A")
+        run(project, "add", "B", "--deps", "01-a")
+        path = root / "01-a.md"
+        path.write_text(path.read_text().replace("status: pending", "status: pending\ndeps:\n  - 02-b"))
+        report = run(project, "graph")
+        assert report["cycles"] == [["01-a", "02-b"]]
+        assert report["critical_path"] == []
+        assert run(project, "next")["cycles"] == [["01-a", "02-b"]]
+
+    def test_deep_chain(self):
+        n = 5000
+        graph = TaskGraph(
+            (f"{i:05d}", task_fs.Task(id=f"{i:05d}", title="t", deps=[f"{i - 1:05d}"] if i else []))
+            for i in range(n)
+        )
+        assert len(graph.components()) == n
+        assert len(graph.longest_chain()) == n
+
+
+# ---- parallel scheduling ----
+
+
+class TestReady:
+    def test_claims_non_conflicting_tasks(self, project):
+        run(project, "add", "Api", "--files", "src/api/")
+        run(project, "add", "Routes", "--files", "src/api/routes.py")
+        run(project, "add", "Docs", "--files", "README.md")
+        run(project, "add", "Deploy", "--deps", "01-api")
+        run(project, "add", "Cli")
+
+        preview = run(project, "ready", "--workers", "5", "--no-claim")
+        assert preview["frontier"] == ["01-api", "02-routes", "03-docs", "05-cli"]
+        assert preview["ids"] == ["01-api", "03-docs", "05-cli"]
+        assert run(project, "show", "01-api")["task"]["status"] == "pending"
+
+        claimed = run(project, "ready", "--workers", "2")
+        assert claimed["ids"] == ["01-api", "03-docs"]
+        assert [t["status"] for t in claimed["tasks"]] == ["in_progress"] * 2
+        # 02-routes still conflicts with the in-progress 01-api
+        assert run(project, "ready", "--workers", "2")["ids"] == ["05-cli"]
+        assert run(project, "ready")["ids"] == []
+
+    def test_parent_and_child_not_picked_together(self, project):
+        run(project, "add", "Auth")
+        run(project, "add", "Login", "--parent", "01-auth")
+        run(project, "add", "Docs")
+        assert run(project, "ready", "-w", "3")["ids"] == ["01-auth", "02-docs"]
+        # Children of an in-progress task come first
+        assert run(project, "ready", "-w", "3")["ids"] == ["01-auth/01-login"]
+
+    def test_files_overlap(self):
+        from task_graph import files_overlap
+
+        assert files_overlap(["src/a.py"], ["src/a.py"])
+        assert files_overlap(["src/"], ["src/a.py"])
+        assert not files_overlap(["src/a.py"], ["src/ab.py"])
+        assert not files_overlap([], ["src/a.py"])
+
+
+# ---- move ----
+
+
+class TestMove:
+    def test_move_rewrites_subtree_dependants(self, project):
+        run(project, "add", "Auth")
+        run(project, "add", "Session", "--parent", "01-auth")
+        run(project, "add", "Backend")
+        run(project, "add", "Deploy", "--deps", "01-auth", "01-auth/01-session")
+        run(project, "add", "Docs")
+        result = run(project, "move", "01-auth", "--parent", "02-backend")
+        assert result["new_id"] == "02-backend/01-auth"
+        assert result["task"]["id"] == "02-backend/01-auth"
+        assert result["task"]["children"] == ["02-backend/01-auth/01-session"]
+
+        deploy = run(project, "show", "03-deploy")["task"]
+        assert deploy["deps"] == ["02-backend/01-auth", "02-backend/01-auth/01-session"]
+
+    def test_move_only_writes_affected_files(self, project):
+        root = tasks_root(project)
+        run(project, "add", "First")
+        run(project, "add", "Second", "--deps", "01-first")
+        run(project, "add", "Third")
+        run(project, "add", "Parent")
+        untouched = (root / "03-third.md").read_text()
+        before = {p: p.stat().st_mtime_ns for p in root.glob("*.md")}
+
+        run(project, "move", "01-first", "--parent", "04-parent")
+        assert run(project, "show", "02-second")["task"]["deps"] == ["04-parent/01-first"]
+        assert (root / "03-third.md").read_text() == untouched
+        assert (root / "03-third.md").stat().st_mtime_ns == before[root / "03-third.md"]
+
+    def test_move_into_dependant_leaf(self, project):
+        run(project, "add", "First")
+        run(project, "add", "Second", "--deps", "01-first")
+        run(project, "note", "02-second", "Keep me")
+        result = run(project, "move", "01-first", "--parent", "02-second")
+        assert result["new_id"] == "02-second/01-first"
+        second = run(project, "show", "02-second")["task"]
+        assert second["deps"] == ["02-second/01-first"]
+        assert second["notes"][0]["text"] == "Keep me"
+
+    def test_dependants_of_subtree(self):
+        graph = TaskGraph([
+            ("a", task_fs.Task(id="a", title="A", deps=["x"])),
+            ("b", task_fs.Task(id="b", title="B", deps=["x/1"])),
+            ("c", task_fs.Task(id="c", title="C", deps=["x-y"])),
+        ])
+        assert graph.dependants_of("x") == ["a"]
+        assert graph.dependants_of("x", subtree=True) == ["a", "b"]
+        graph.set_deps("b", ["x-y"])
+        assert graph.dependants_of("x", subtree=True) == ["a"]
+        assert graph.dependants_of("x-y") == ["b", "c"]
+
+
+# ---- storage backends ----
+
+
+TIMESTAMPS = ("created", "updated", "started", "completed")
+
+
+def listing(project: Path, env: dict | None = None) -> list[dict]:
+    """`list` output without timestamps, to compare across runs."""
+    tasks = run(project, "list", env=env)["tasks"]
+    for task in tasks:
+        for key in TIMESTAMPS:
+            task.pop(key)
+        task["notes"] = [n["text"] for n in task["notes"]]
+    return tasks
+
+
+class TestStore:
+    def scenario(self, project):
+        run(project, "add", "Auth", "-d", "Login flow", "-c", "Tokens expire")
+        run(project, "add", "Session", "--parent", "01-auth", "-f", "src/session.py")
+        run(project, "add", "Deploy", "--deps", "01-auth/01-session")
+        run(project, "add", "Backend")
+        run(project, "add", "Scratch", "--parent", "03-backend")
+        run(project, "note", "01-auth/01-session", "Use cookies")
+        run(project, "start", "01-auth/01-session")
+        run(project, "block", "02-deploy", "-r", "Waiting")
+        assert run(project, "move", "01-auth", "--parent", "03-backend")["ok"]
+        assert run(project, "remove", "03-backend/01-scratch")["ok"]
+        run(project, "done")
+        run(project, "note", "03-backend/02-auth", "Shipped")
+
+    def test_sqlite_matches_markdown(self, tmp_path):
+        markdown, sqlite = tmp_path / "md", tmp_path / "db"
+        for project in (markdown, sqlite):
+            project.mkdir()
+            run(project, "init")
+        assert run(sqlite, "export", "--to", "sqlite")["exported"] == 0
+
+        for project in (markdown, sqlite):
+            self.scenario(project)
+        assert listing(sqlite) == listing(markdown)
+        assert not list(tasks_root(sqlite).glob("*.md"))
+        assert run(sqlite, "next")["id"] == run(markdown, "next")["id"] == "03-backend"
+        assert run(sqlite, "list", "--status", "complete")["tasks"][0]["id"] == (
+            "03-backend/02-auth/01-session"
+        )
+
+    def test_export_round_trip(self, project):
+        self.scenario(project)
+        before = listing(project)
+        assert run(project, "export", "--to", "sqlite")["exported"] == 4
+        assert listing(project) == before
+
+        # The database now takes over from the markdown files
+        run(project, "add", "Docs", "--deps", "02-deploy")
+        assert not (tasks_root(project) / "04-docs.md").exists()
+        result = run(project, "export", "--to", "markdown")
+        assert result == {"ok": True, "exported": 5, "from": "sqlite", "to": "markdown"}
+        after = listing(project)
+        assert after == listing(project, env={"TASK_BACKEND": "markdown"})
+        assert after[-1]["id"] == "04-docs"
+        assert after[-1]["deps"] == ["02-deploy"]
+
+    def test_status_filter_uses_index(self, project):
+        import task_store
+
+        self.scenario(project)
+        run(project, "export", "--to", "sqlite")
+        store = task_store.SqliteStore(tasks_root(project))
+        statements = []
+        store.db.set_trace_callback(statements.append)
+        [(task_id, task)] = store.walk(status="blocked")
+        assert (task_id, task.notes) == ("02-deploy", [])
+        store.db.set_trace_callback(None)
+
+        for statement in statements:
+            plan = " ".join(
+                row[-1] for row in store.db.execute(f"EXPLAIN QUERY PLAN {statement}")
+            )
+            assert "SCAN" not in plan.replace("SCAN CONSTANT ROW", ""), (statement, plan)
+
+    def test_sqlite_rolls_back_on_error(self, project):
+        import task_store
+
+        run(project, "add", "Auth")
+        run(project, "export", "--to", "sqlite")
+        store = task_store.SqliteStore(tasks_root(project))
+        with pytest.raises(task_fs.TaskError):
+            with store.transaction():
+                store.lock_tree(exclusive=True)
+                store.save(task_fs.Task(id="02-docs", title="Docs"))
+                store.remove("01-auth")
+                raise task_fs.TaskError("Failed part way")
+        assert [t["id"] for t in run(project, "list")["tasks"]] == ["01-auth"]
+
+    def test_backends_implement_the_interface(self):
+        import task_store
+
+        class Partial(task_store.TaskStore):
+            def resolve(self, task_id: str) -> str:
+                return task_id
+
+        with pytest.raises(TypeError, match="abstract"):
+            Partial()
+
+
+# ---- search ----
+
+
+def backdate(project: Path) -> None:
+    """Age every task file past the racy window, so its stamp is trusted."""
+    old = time.time() - 3600
+    for path in tasks_root(project).rglob("*.md"):
+        os.utime(path, (old, old))
+
+
+class TestSearch:
+    def scenario(self, project):
+        run(project, "add", "Fix login", "-d", "Users cannot sign in", "-c", "SSO works")
+        run(project, "add", "Write docs", "-d", "Document the login flow for new users")
+        run(project, "add", "Tokens", "--parent", "01-fix-login", "-a", "Refresh tokens early")
+        run(project, "note", "02-write-docs", "The login page needs screenshots")
+
+    def test_ranking_and_filters(self, project):
+        self.scenario(project)
+        result = run(project, "search", "login")
+        assert [r["id"] for r in result["results"]] == ["01-fix-login", "02-write-docs"]
+        assert result["results"][0]["fields"] == ["title"]
+        assert result["results"][1]["fields"] == ["description", "note"]
+        assert result["results"][1]["notes"][0]["text"] == "The login page needs screenshots"
+
+        # Every word has to match; a trailing * matches prefixes
+        assert [r["id"] for r in run(project, "search", "login", "users")["results"]] == [
+            "01-fix-login", "02-write-docs",
+        ]
+        assert run(project, "search", "token*")["results"][0]["id"] == "01-fix-login/01-tokens"
+        assert run(project, "search", "login", "sso")["count"] == 1
+
+        notes_only = run(project, "search", "login", "--field", "note")["results"]
+        assert [(r["id"], r["fields"]) for r in notes_only] == [("02-write-docs", ["note"])]
+        assert run(project, "search", "login", "--status", "complete")["count"] == 0
+        assert run(project, "search", "login", "--limit", "1")["count"] == 2
+        for limit in ("0", "-1"):
+            assert run(project, "search", "login", "--limit", limit)["error"] == (
+                "--limit must be at least 1"
+            )
+
+    def test_since(self, project):
+        self.scenario(project)
+        assert run(project, "search", "login", "--since", "2000-01-01")["count"] == 2
+        assert run(project, "search", "login", "--since", "2999-01-01")["count"] == 0
+        assert not run(project, "search", "login", "--since", "yesterday")["ok"]
+
+        # Only the note is new enough once the tasks look older than it
+        for task in tasks_root(project).rglob("*.md"):
+            task.write_text(task.read_text().replace('updated: "20', 'updated: "19'))
+        [result] = run(project, "search", "login", "--since", "2000-01-01")["results"]
+        assert (result["id"], result["fields"]) == ("02-write-docs", ["note"])
+
+    def test_reindexes_only_changed_tasks(self, project):
+        self.scenario(project)
+        backdate(project)
+        assert run(project, "search", "login")["reindexed"] == 3
+        assert run(project, "search", "login")["reindexed"] == 0
+
+        run(project, "note", "01-fix-login/01-tokens", "Rotate on login")
+        result = run(project, "search", "rotate")
+        assert result["reindexed"] == 1
+        assert result["results"][0]["id"] == "01-fix-login/01-tokens"
+
+        run(project, "remove", "02-write-docs")
+        assert [r["id"] for r in run(project, "search", "login")["results"]] == [
+            "01-fix-login", "01-fix-login/01-tokens",
+        ]
+
+    def test_sqlite_backend(self, project):
+        self.scenario(project)
+        markdown = run(project, "search", "login")["results"]
+        run(project, "export", "--to", "sqlite")
+        result = run(project, "search", "login")
+        assert (result["results"], result["reindexed"]) == (markdown, 3)
+        assert run(project, "search", "login")["reindexed"] == 0
+
+
+# ---- changes ----
+
+
+class TestChanges:
+    @pytest.mark.parametrize("backend", ["markdown", "sqlite"])
+    def test_feed(self, project, backend):
+        if backend == "sqlite":
+            run(project, "export", "--to", "sqlite")
+        run(project, "add", "Auth")
+        run(project, "add", "Session", "--parent", "01-auth")
+        run(project, "add", "Docs")
+        first = run(project, "changes")
+        assert [(c["op"], c["id"]) for c in first["changes"]] == [
+            ("created", "01-auth"), ("created", "01-auth/01-session"), ("created", "02-docs"),
+        ]
+
+        note = run(project, "note", "02-docs", "Draft ready")["note"]
+        run(project, "move", "01-auth/01-session")
+        run(project, "remove", "01-auth")
+        second = run(project, "changes", "--since", first["cursor"])
+        changes = {(c["op"], c["id"]): c for c in second["changes"]}
+        assert changes["moved", "01-auth/01-session"]["new_id"] == "03-session"
+        assert ("removed", "01-auth") in changes
+        assert "03-session" in {task_id for _, task_id in changes}
+        docs = next(c for (_, task_id), c in changes.items() if task_id == "02-docs")
+        assert docs["task"]["notes"] == [note]
+
+        # Only what happened from the note on
+        later = [
+            (c["op"], c["id"])
+            for c in run(project, "changes", "--since", note["created"])["changes"]
+        ]
+        assert later == [
+            ("updated", "02-docs"),
+            ("moved", "01-auth/01-session"),
+            ("updated", "03-session"),
+            ("removed", "01-auth"),
+        ]
+        # Nothing new: at most the last moments are repeated
+        third = run(project, "changes", "--since", second["cursor"])["changes"]
+        assert {c["id"] for c in third if "task" in c} <= {"02-docs", "03-session"}
+        assert third == [c for c in third if "task" in c]
+
+    def test_bad_since(self, project):
+        result = run(project, "changes", "--since", "last week")
+        assert not result["ok"]
+        assert "cursor" in result["error"]
+
+
+# ---- archive ----
+
+
+class TestArchive:
+    def scenario(self, project):
+        run(project, "add", "Auth")
+        run(project, "add", "Session", "--parent", "01-auth")
+        run(project, "add", "Tokens", "--parent", "01-auth")
+        run(project, "add", "Docs")
+        run(project, "add", "Outline", "--parent", "02-docs")
+        run(project, "add", "Deploy", "--deps", "01-auth/01-session")
+        run(project, "note", "01-auth/01-session", "Use cookies")
+        for task_id in ("01-auth/01-session", "02-docs/01-outline", "02-docs"):
+            run(project, "done", task_id)
+
+    @pytest.mark.parametrize("backend", ["markdown", "sqlite"])
+    def test_archive_finished_subtrees(self, project, backend):
+        if backend == "sqlite":
+            run(project, "export", "--to", "sqlite")
+        self.scenario(project)
+        before = listing(project)
+
+        result = run(project, "archive")
+        assert (result["archived"], result["count"]) == (["01-auth/01-session", "02-docs"], 3)
+        assert [t["id"] for t in listing(project)] == ["01-auth", "01-auth/02-tokens", "03-deploy"]
+        assert run(project, "archive")["count"] == 0
+
+        # Archived tasks still count as deps, and their IDs are not reused
+        assert run(project, "show", "03-deploy")["deps_satisfied"]
+        assert run(project, "next")["id"] == "01-auth"
+        assert run(project, "add", "Cookies", "--parent", "01-auth")["id"] == "01-auth/03-cookies"
+        assert run(project, "add", "Docs")["id"] == "04-docs"
+
+        archived = run(project, "show", "02-docs")
+        assert archived["archived"]
+        assert archived["task"]["children"] == ["02-docs/01-outline"]
+        full = run(project, "list", "--include-archived")["tasks"]
+        assert [t["id"] for t in full] == [
+            "01-auth", "01-auth/01-session", "01-auth/02-tokens", "01-auth/03-cookies",
+            "02-docs", "02-docs/01-outline", "03-deploy", "04-docs",
+        ]
+        # Archived tasks come back as they were
+        archived = [t for t in full if t.pop("archived", False)]
+        for task in archived:
+            for key in TIMESTAMPS:
+                task.pop(key)
+            task["notes"] = [n["text"] for n in task["notes"]]
+        assert archived == [t for t in before if t["id"] in {a["id"] for a in archived}]
+        assert run(project, "notes")["count"] == 0
+        assert run(project, "notes", "--include-archived")["notes"][0]["text"] == "Use cookies"
+
+    def test_archive_within(self, project):
+        self.scenario(project)
+        assert run(project, "archive", "01-auth")["archived"] == ["01-auth/01-session"]
+        assert run(project, "show", "02-docs").get("archived") is None
+        changes = run(project, "changes")["changes"]
+        assert [c["id"] for c in changes if c["op"] == "archived"] == ["01-auth/01-session"]
+
+    def test_finishes_run_cut_short(self, project):
+        import task_archive
+        import task_store
+
+        self.scenario(project)
+        # A run that wrote the archive, then died before removing the tasks
+        root = tasks_root(project)
+        store = task_store.MarkdownStore(root)
+        archive = task_archive.Archive(root)
+        first = archive.add([store.load("02-docs"), store.load("02-docs/01-outline")])
+
+        result = run(project, "archive")
+        assert (result["archived"], result["count"]) == (["01-auth/01-session", "02-docs"], 3)
+        index = task_archive.Archive(root).index
+        assert [index[t]["segment"] for t in ("02-docs", "02-docs/01-outline")] == [first] * 2
+        assert index["01-auth/01-session"]["segment"] == result["segment"] != first
+        full = [t["id"] for t in run(project, "list", "--include-archived")["tasks"]]
+        assert len(full) == len(set(full))
+
+
+# ---- progress ----
+
+
+class TestProgress:
+    def progress(self, project, *ids):
+        return {task_id: run(project, "progress", *filter(None, [task_id])) for task_id in ids}
+
+    @pytest.mark.parametrize("backend", ["markdown", "sqlite"])
+    def test_rollups_follow_writes(self, project, backend):
+        if backend == "sqlite":
+            run(project, "export", "--to", "sqlite")
+        TestArchive().scenario(project)
+        run(project, "start", "01-auth/02-tokens")
+
+        tree = run(project, "progress")
+        assert (tree["id"], tree["total"], tree["percent_complete"]) == (None, 6, 50.0)
+        assert tree["counts"] == {
+            "pending": 2, "in_progress": 1, "blocked": 0, "complete": 3, "wont_do": 0,
+        }
+        auth = run(project, "progress", "01-auth")
+        assert (auth["total"], auth["counts"]["complete"]) == (3, 1)
+        assert auth["started"] and auth["completed"]
+        assert run(project, "progress", "02-docs")["percent_complete"] == 100.0
+        assert run(project, "progress", "03-deploy")["started"] is None
+
+        # Kept up to date as the tree changes, and equal to a fresh rebuild
+        run(project, "done", "01-auth/02-tokens")
+        run(project, "move", "02-docs/01-outline", "--parent", "01-auth")
+        run(project, "add", "Review", "--parent", "01-auth/03-outline")
+        run(project, "remove", "03-deploy")
+        run(project, "archive", "01-auth/01-session")
+        ids = ["", "01-auth", "01-auth/02-tokens", "01-auth/03-outline", "02-docs"]
+        updated = self.progress(project, *ids)
+        assert updated["01-auth"]["total"] == 4
+        assert updated["01-auth/03-outline"]["counts"]["pending"] == 1
+        assert updated["02-docs"]["total"] == 1
+        assert run(project, "reindex")["ok"]
+        assert self.progress(project, *ids) == updated
+
+    def test_missing_task(self, project):
+        assert run(project, "progress")["total"] == 0
+        assert not run(project, "progress", "01-nope")["ok"]
+
+    def test_reads_while_writers_hold_locks(self, project):
+        import fcntl
+
+        run(project, "add", "Auth")
+        run(project, "add", "Session", "--parent", "01-auth")
+        assert run(project, "progress")["total"] == 2  # Builds the rollups
+        root = project / task_fs.TASKS_DIR
+        assert not list(root.glob(f"{task_fs.JOURNAL_FILE}.*"))
+
+        # A writer mid-commit holds the tree lock and an ancestor's .rollup
+        locks = root / task_fs.LOCKS_DIR
+        fds = [os.open(path, os.O_RDWR | os.O_CREAT) for path in (
+            locks / task_fs.TREE_LOCK, task_fs.bucket_lock_path(root, "rollup", ""),
+        )]
+        try:
+            for fd in fds:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            r = subprocess.run(
+                [sys.executable, str(SCRIPTS / "task.py"), "progress", "01-auth"],
+                capture_output=True, text=True, cwd=project, timeout=10,
+            )
+        finally:
+            for fd in fds:
+                os.close(fd)
+        assert json.loads(r.stdout)["total"] == 2
+
+        # Sibling writes each update their shared ancestors
+        run(project, "add", "Tokens", "--parent", "01-auth")
+        run(project, "start", "01-auth/02-tokens")
+        assert run(project, "progress", "01-auth")["counts"]["in_progress"] == 1
+        assert run(project, "progress")["total"] == 3
+
+
+# ---- output ----
+
+
+def run_lines(cwd: Path, *args: str) -> list[dict]:
+    """Run task.py in cwd and return each line of its output, decoded."""
+    r = subprocess.run(
+        [sys.executable, str(SCRIPTS / "task.py"), *args],
+        capture_output=True, text=True, cwd=cwd,
+    )
+    return [json.loads(line) for line in r.stdout.splitlines()]
+
+
+class TestOutput:
+    def scenario(self, project):
+        for title in ("One", "Two", "Three", "Four"):
+            run(project, "add", title, "-d", f"About {title}")
+            run(project, "note", run(project, "list")["tasks"][-1]["id"], f"{title} noted")
+
+    def test_fields_and_paging(self, project):
+        self.scenario(project)
+        result = run(project, "list", "--fields", "title", "status", "--offset", "1", "-n", "2")
+        assert result["tasks"] == [
+            {"id": "02-two", "title": "Two", "status": "pending"},
+            {"id": "03-three", "title": "Three", "status": "pending"},
+        ]
+        assert result["more"]
+        assert not run(project, "list", "--offset", "2", "--limit", "2")["more"]
+        assert run(project, "list", "--offset", "9")["tasks"] == []
+        first = run(project, "list", "--fields", "notes")["tasks"][0]
+        assert sorted(first) == ["id", "notes"]
+        assert [(n["text"], sorted(n)) for n in first["notes"]] == [
+            ("One noted", ["created", "text"]),
+        ]
+        assert run(project, "list")["tasks"][0]["description"] == "About One"
+
+        notes = run(project, "notes", "--fields", "text", "--limit", "1")
+        assert notes["notes"] == [{"task_id": "01-one", "text": "One noted"}]
+        assert not run(project, "list", "--limit", "-1")["ok"]
+
+    def test_jsonl(self, project):
+        self.scenario(project)
+        *tasks, result = run_lines(project, "list", "--format", "jsonl", "--fields", "title")
+        assert [t["title"] for t in tasks] == ["One", "Two", "Three", "Four"]
+        assert result == {"ok": True, "count": 4}
+
+        *notes, result = run_lines(project, "notes", "--format", "jsonl", "--offset", "3")
+        assert [n["text"] for n in notes] == ["Four noted"]
+        assert result == {"ok": True, "count": 1}
+
+
+# ---- notes timeline ----
+
+
+class TestTimeline:
+    def scenario(self, project):
+        run(project, "add", "Auth")
+        run(project, "add", "Session", "--parent", "01-auth")
+        run(project, "add", "Docs")
+        created = []
+        for task_id in ("02-docs", "01-auth/01-session", "01-auth", "02-docs", "01-auth"):
+            created.append(run(project, "note", task_id, f"On {task_id}")["note"]["created"])
+        return created
+
+    def test_merged_in_time_order(self, project):
+        created = self.scenario(project)
+        notes = run(project, "notes")["notes"]
+        assert [n["created"] for n in notes] == created
+        assert [n["task_id"] for n in notes] == [
+            "02-docs", "01-auth/01-session", "01-auth", "02-docs", "01-auth",
+        ]
+
+        window = run(project, "notes", "--since", created[1], "--until", created[3])["notes"]
+        assert [n["created"] for n in window] == created[1:4]
+        tail = run(project, "notes", "--tail", "2")["notes"]
+        assert [n["created"] for n in tail] == created[3:]
+        subtree = run(project, "notes", "--task", "01-auth/01-session", "02-docs", "--tail", "2")
+        assert [n["task_id"] for n in subtree["notes"]] == ["01-auth/01-session", "02-docs"]
+        assert not run(project, "notes", "--task", "09-nope")["ok"]
+
+    def test_reads_only_tasks_it_needs(self):
+        from itertools import islice
+
+        import task
+
+        read = []
+
+        class Lazy(task_fs.Task):
+            @property
+            def notes(self):
+                read.append(self.id)
+                return [task_fs.Note(f"{self.id} {t}", t) for t in self.times]
+
+            @notes.setter
+            def notes(self, value):
+                pass
+
+        tasks = []
+        for i in range(50):
+            stamps = [f"2026-01-01T00:{i:02}:0{j}" for j in range(3)]
+            lazy = Lazy(id=f"{i:02}", title="", created=stamps[0], updated=stamps[-1])
+            lazy.times = stamps
+            tasks.append((lazy.id, lazy))
+
+        newest = task.note_timeline(tasks, newest_first=True)
+        assert [note.text for _, _, note in islice(newest, 4)] == [
+            "49 2026-01-01T00:49:02", "49 2026-01-01T00:49:01",
+            "49 2026-01-01T00:49:00", "48 2026-01-01T00:48:02",
+        ]
+        assert read == ["49", "48"]
+
+
+# ---- rendering ----
+
+
+def render(project: Path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(SCRIPTS / "task-render.py"), *args],
+        capture_output=True, text=True, cwd=project,
+    )
+
+
+def wait_for(condition, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+class TestRender:
+    def test_render(self, project):
+        assert render(project).stdout == "# Tasks\n\n_No tasks._\n"
+        run(project, "add", "Auth", "-a", "Use JWT")
+        run(project, "add", "Session", "--parent", "01-auth")
+        run(project, "done", "01-auth/01-session")
+        assert render(project).stdout == (
+            "# Tasks\n\n## Pending\n- **01-auth** Auth\n  _Approach: Use JWT_\n\n"
+            "## Completed\n  - [x] **01-auth/01-session** Session\n"
+        )
+        render(project, "--output", "TASKS.md")
+        assert (project / "TASKS.md").read_text() == render(project).stdout
+
+    @pytest.mark.parametrize("mode", ["inotify", "poll"])
+    def test_watch(self, project, mode):
+        output = project / "TASKS.md"
+        run(project, "add", "Auth")
+        args = ["--watch", "-o", str(output), "--interval", "0.1"]
+        watcher = subprocess.Popen(
+            [sys.executable, str(SCRIPTS / "task-render.py"), *args,
+             *(["--poll"] if mode == "poll" else [])],
+            cwd=project,
+        )
+        try:
+            wait_for(lambda: output.exists())
+            run(project, "add", "Docs")
+            run(project, "note", "01-auth", "Tokens expire")
+            run(project, "done", "01-auth")
+            wait_for(lambda: output.read_text() == render(project).stdout)
+            assert "> Tokens expire" in output.read_text()
+
+            run(project, "remove", "01-auth")
+            wait_for(lambda: "01-auth" not in output.read_text())
+            assert output.read_text() == render(project).stdout
+
+            # A change that shows nothing new leaves the file alone
+            written = output.stat().st_mtime_ns
+            run(project, "update", "02-docs", "--description", "Not rendered")
+            os.utime(tasks_root(project) / "02-docs.md")
+            time.sleep(0.5)
+            assert output.stat().st_mtime_ns == written
+
+            # A directory deleted and made again (demoted, then promoted)
+            run(project, "add", "Y", "-p", "02-docs")
+            run(project, "remove", "02-docs/01-y")
+            run(project, "add", "Z", "-p", "02-docs")
+            wait_for(lambda: "02-docs/01-z" in output.read_text())
+            run(project, "start", "02-docs/01-z")
+            run(project, "note", "02-docs/01-z", "Still watched")
+            wait_for(lambda: "> Still watched" in output.read_text())
+            assert output.read_text() == render(project).stdout
+        finally:
+            watcher.terminate()
+            watcher.wait()
+
+    def test_rendered_tree_memoizes(self, project):
+        import importlib.util
+
+        import task_store
+
+        spec = importlib.util.spec_from_file_location("task_render", SCRIPTS / "task-render.py")
+        task_render = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(task_render)
+
+        run(project, "add", "Auth")
+        run(project, "add", "Docs")
+        backdate(project)
+        tree = task_render.RenderedTree(task_store.MarkdownStore(tasks_root(project)))
+        assert tree.refresh() and tree.renders == 2
+        assert not tree.refresh()
+
+        run(project, "update", "02-docs", "--description", "Not rendered")
+        backdate(project)
+        assert not tree.refresh()
+        assert tree.renders == 2
+        run(project, "block", "02-docs", "-r", "Waiting")
+        assert tree.refresh() and tree.renders == 3
+        assert tree.render() == render(project).stdout.rstrip("\n")
+
+
+# ---- batch ----
+
+
+def jsonl(*ops: dict) -> str:
+    return "".join(json.dumps(op) + "\n" for op in ops)
+
+
+class TestBatch:
+    def test_refs_and_results(self, project):
+        result = run(project, "batch", stdin=jsonl(
+            {"op": "add", "ref": "auth", "title": "Auth"},
+            {"op": "add", "ref": "form", "title": "Form", "parent": "$auth"},
+            {"op": "add", "title": "Deploy", "deps": ["$auth", "$form"]},
+            {"op": "add", "ref": "be", "title": "Backend"},
+            {"op": "move", "id": "$auth", "parent": "$be"},
+            {"op": "start", "id": "$form"},
+            {"op": "note", "id": "$form", "text": "Halfway"},
+        ))
+        assert result["ok"]
+        assert [r["op"] for r in result["results"]] == [
+            "add", "add", "add", "add", "move", "start", "note",
+        ]
+        assert result["refs"]["form"] == "03-backend/01-auth/01-form"
+        form = run(project, "show", "03-backend/01-auth/01-form")["task"]
+        assert form["status"] == "in_progress"
+        assert [n["text"] for n in form["notes"]] == ["Halfway"]
+        deploy = run(project, "show", "02-deploy")["task"]
+        assert deploy["deps"] == ["03-backend/01-auth", "03-backend/01-auth/01-form"]
+
+    @pytest.mark.parametrize("line, error", [
+        ("[1]", "not a JSON object"),
+        ('"x"', "not a JSON object"),
+        ('{"op": "add", "title": 5}', "'title' must be a string"),
+        ('{"op": "note", "id": "01-a", "text": 5}', "'text' must be a string"),
+        ('{"op": "add", "title": "B", "deps": "01-a"}', "'deps' must be a list of strings"),
+        ('{"op": "add", "title": "B", "desc": "typo"}', "add does not take 'desc'"),
+        ('{"op": ["add"]}', "Unknown op: ['add']. Valid: " + ", ".join([
+            "add", "update", "remove", "start", "done", "block", "unblock", "note", "move",
+        ])),
+        ('{"op": "start", "id": "01-a", "ref": 1}', "'ref' must be a string"),
+    ])
+    def test_rejects_malformed_ops(self, project, line, error):
+        result = run(project, "batch", stdin=jsonl({"op": "add", "title": "A"}) + line + "\n")
+        assert (result["ok"], result["error"]) == (False, f"Line 2: {error}")
+        assert result["applied"] == 1
+        assert [t["title"] for t in run(project, "list")["tasks"]] == ["A"]
+
+    def test_refs_only_in_id_fields(self, project):
+        result = run(project, "batch", stdin=jsonl(
+            {"op": "add", "ref": "home", "title": "$HOME cleanup", "description": "$PATH too"},
+            {"op": "note", "id": "$home", "text": "$5 per seat"},
+        ))
+        assert result["ok"]
+        task = run(project, "show", "01-home-cleanup")["task"]
+        assert (task["title"], task["description"]) == ("$HOME cleanup", "$PATH too")
+        assert [n["text"] for n in task["notes"]] == ["$5 per seat"]
+
+    @pytest.mark.parametrize("backend", ["markdown", "sqlite"])
+    def test_stops_at_first_error(self, project, backend):
+        if backend == "sqlite":
+            run(project, "export", "--to", "sqlite")
+        result = run(project, "batch", stdin=jsonl(
+            {"op": "add", "ref": "a", "title": "A"},
+            {"op": "start", "id": "$missing"},
+            {"op": "add", "title": "B"},
+        ))
+        assert not result["ok"]
+        assert result["error"] == "Line 2: Unknown reference: $missing"
+        assert len(result["results"]) == result["applied"] == 1
+        assert run(project, "list")["count"] == 1
+
+    def test_buffered_writes_coalesce(self, project):
+        root = tasks_root(project)
+        run(project, "add", "First")
+        path = root / "01-first.md"
+        before = path.read_text()
+        with task_fs.buffered_writes():
+            task = task_fs.parse_task(path, root)
+            task.status = "in_progress"
+            task_fs.write_task(path, task)
+            assert path.read_text() == before
+            assert task_fs.parse_task(path, root).status == "in_progress"
+            [(_, walked)] = task_fs.walk_tasks(root)
+            assert walked.status == "in_progress"
+        assert "status: in_progress" in path.read_text()
+
+
+# ---- server ----
+
+
+@pytest.fixture
+def server(project):
+    """A running `task.py serve` for the project."""
+    proc = subprocess.Popen(
+        [sys.executable, str(SCRIPTS / "task.py"), "serve"],
+        stdout=subprocess.PIPE, text=True, cwd=project,
+    )
+    assert json.loads(proc.stdout.readline())["message"] == "Serving"
+    sock = tasks_root(project) / task_fs.SERVER_SOCKET
+    for _ in range(100):
+        if sock.exists():
+            break
+        time.sleep(0.05)
+    yield proc
+    proc.terminate()
+    proc.wait(timeout=5)
+
+
+def rpc(project: Path, *requests: dict) -> list[dict]:
+    """Send raw JSON-RPC requests to the project's server."""
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(str(tasks_root(project) / task_fs.SERVER_SOCKET))
+        sock.sendall(b"".join(json.dumps(r).encode() + b"\n" for r in requests))
+        sock.shutdown(socket.SHUT_WR)
+        return [json.loads(line) for line in sock.makefile()]
+
+
+class TestServer:
+    def test_commands_forward_to_server(self, project, server):
+        run(project, "add", "First")
+        run(project, "add", "Second", "--deps", "01-first")
+        assert run(project, "next")["id"] == "01-first"
+        (response,) = rpc(project, {"jsonrpc": "2.0", "id": 3, "method": "list"})
+        assert response["id"] == 3
+        assert response["result"]["count"] == 2
+
+    def test_sees_external_edits(self, project, server):
+        run(project, "add", "First")
+        path = tasks_root(project) / "01-first.md"
+        path.write_text(path.read_text().replace("# First", "# Edited"))
+        assert run(project, "show", "01-first")["task"]["title"] == "Edited"
+
+    def test_errors(self, project, server):
+        assert run(project, "show", "99-missing") == {
+            "ok": False, "error": "Task not found: 99-missing",
+        }
+        unknown, bad = rpc(project, {"jsonrpc": "2.0", "id": 1, "method": "nope"}, "x")
+        assert unknown["error"]["code"] == -32601
+        assert bad["error"]["code"] == -32600
+
+    def test_stops_cleanly(self, project, server):
+        run(project, "list")
+        server.terminate()
+        stopped = json.loads(server.stdout.readline())
+        assert stopped["message"] == "Server stopped"
+        assert stopped["requests"] == 1
+        assert not (tasks_root(project) / task_fs.SERVER_SOCKET).exists()
+
+    def test_stale_socket_falls_back(self, project):
+        (tasks_root(project) / task_fs.SERVER_SOCKET).touch()
+        run(project, "add", "First")
+        assert run(project, "list")["count"] == 1
+
+
+# ---- profiling ----
+
+
+class TestProfile:
+    def test_timings_in_output(self, project):
+        assert "timings" not in run(project, "add", "First")
+        added = run(project, "--profile", "add", "Second", "--deps", "01-first")
+        timings = added["timings"]
+        assert timings["counters"]["files_written"] == 1
+        assert "fsyncs" not in timings["counters"]  # New files skip the journal
+        assert {"discover", "lock", "render", "command"} <= set(timings["phases"])
+
+        listed = run(project, "list", env={"TASK_PROFILE": "1"})
+        timings = listed["timings"]
+        assert timings["counters"]["files_read"] == 2
+        assert timings["counters"]["bytes_read"] == sum(
+            p.stat().st_size for p in tasks_root(project).glob("*.md")
+        )
+        assert timings["counters"]["regex_calls"] > 0
+        # Phases exclude the phases nested in them, so they add up
+        assert sum(timings["phases"].values()) == pytest.approx(timings["total_ms"], abs=0.1)
+
+    def test_profile_through_server(self, project, server):
+        run(project, "add", "First")
+        result = run(project, "--profile", "next")
+        assert result["id"] == "01-first"
+        assert "graph" in result["timings"]["phases"]
+        assert "timings" not in run(project, "next")
+
+
+# ---- benchmarks ----
+
+
+class TestBench:
+    def test_generated_tree(self, project):
+        from bench_tasks import generate_tree, tree_shape
+
+        assert tree_shape(7, breadth=2, depth=2) == [
+            "01-task-0", "02-task-1",
+            "01-task-0/01-task-2", "01-task-0/02-task-3",
+            "02-task-1/01-task-4", "02-task-1/02-task-5",
+            "03-task-6",
+        ]
+        generate_tree(tasks_root(project), 60, breadth=3, depth=3, deps=0.5)
+        assert run(project, "list")["count"] == 60
+        graph = run(project, "graph")
+        assert graph["acyclic"]
+        assert graph["edges"] > 0
+
+    def test_regressions(self):
+        from bench_tasks import find_regressions
+
+        def result(list_ms, walk_ms):
+            return {"tasks": 100, "backend": "markdown",
+                    "commands": {"list": list_ms}, "phases": {"walk_cold": walk_ms}}
+
+        baseline = [result(100, 10)]
+        assert find_regressions([result(120, 14)], baseline, 0.25, 5) == []
+        [regression] = find_regressions([result(200, 14)], baseline, 0.25, 5)
+        assert regression["timing"] == "commands.list"
+        assert find_regressions([result(200, 10)], [], 0.25, 5) == []
+
+    def test_memory(self):
+        import argparse
+
+        from bench_memory import bench
+
+        result = bench(200, argparse.Namespace(notes=2))
+        assert result["header_only_bytes_per_task"] < result["current_bytes_per_task"]
+        assert result["current_bytes_per_task"] < result["reference_bytes_per_task"]